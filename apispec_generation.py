@@ -37,6 +37,12 @@ def generate(app):
     with app.test_request_context():
         spec.path(view=blueprints.uk_who_blueprint.uk_who_calculation)
 
+    spec.components.schema(
+        "calculations",
+        schema=schemas.CalculationsResponseSchema)
+    with app.test_request_context():
+        spec.path(view=blueprints.uk_who_blueprint.uk_who_calculations)
+
     spec.components.schema(
         "chartData",
         schema=schemas.ChartDataResponseSchema)
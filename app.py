@@ -11,8 +11,9 @@ import controllers
 import blueprints
 import schemas
 import apispec_generation
-from rcpchgrowth.rcpchgrowth import create_uk_who_chart, create_trisomy_21_chart, create_turner_chart
+from rcpchgrowth.rcpchgrowth import preload
 from rcpchgrowth.rcpchgrowth.constants.parameter_constants import *
+from rcpchgrowth.rcpchgrowth.lms_lattice import build_lms_lattices, load_lms_lattices
 
 
 # Declare shell colour variables for pretty logging output
@@ -53,51 +54,42 @@ else:
     app.secret_key = urandom(16)
     print(f"{OKGREEN} * A new SECRET_KEY for Flask was automatically generated{ENDC}")
 
+# Load all the reference data now, rather than on the first request which needs each reference
+for reference, seconds in preload().items():
+    print(f"{OKGREEN} * {reference} reference data loaded in {seconds * 1000:.1f} ms{ENDC}")
+
+# Optionally precompute the LMS of every day of age, so single measurements skip interpolation.
+# LMS_LATTICE=build builds it at startup; LMS_LATTICE=<path to .npz> loads one saved at build time
+if "LMS_LATTICE" in environ:
+    if environ["LMS_LATTICE"] == "build":
+        lattice_report = build_lms_lattices()
+    else:
+        try:
+            lattice_report = load_lms_lattices(environ["LMS_LATTICE"])
+        except ValueError as error:
+            # a stale artifact would return the LMS of other reference data: build the lattice afresh instead
+            print(f"{WARNING} * {error} It is being rebuilt.{ENDC}")
+            lattice_report = build_lms_lattices()
+    print(f"{OKGREEN} * LMS lattice is ready: {lattice_report['lattices']} lattices, {lattice_report['total_bytes'] / 1e6:.2f} MB{ENDC}")
+
+# Load the chart data generated at build time (build_chart_data.py). Any chart which is missing, or was generated
+# from different reference data or code, is regenerated in the background rather than holding up startup
+missing_chart_data = controllers.load_chart_data(chart_data_folder)
+if missing_chart_data:
+    print(f"{WARNING} * {len(missing_chart_data)} charts are missing or stale and are being regenerated in the background{ENDC}")
+    controllers.regenerate_chart_data(missing_chart_data, chart_data_folder)
+else:
+    print(f"{OKGREEN} * Chart data was loaded from {chart_data_folder}{ENDC}")
+
+# serialise and compress the centile lines served by GET /uk-who/chart-coordinates, once the chart data is ready
+controllers.precompress_centile_values()
+
 from app import app     # position of this import is important. Don't allow it to be autoformatted alphabetically to the top of the imports!
 
 ##### END FLASK SETUP #####
 ###########################
 
 
-# create all the charts and store in chart_data: commenting out as builds locally but causes failure to deploy to azure.
-# try:  
-#   result = create_uk_who_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES)
-#   filename = "uk_who_chart_data.json"
-#   file_path = path.join(chart_data_folder, filename)
-#   with open(file_path, 'w') as file:
-#       print("now writing to file...")
-#       file.write(json.dumps(result, separators=(',', ':')))
-#       file.close()
-#       print(f" * {OKGREEN}New UK-WHO Chart Data has been generated.")
-# except:
-#   raise ValueError("Unable to create UK-WHO charts")
-
-# # Trisomy 21
-# try:  
-#   result = create_trisomy_21_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES)
-#   filename = "trisomy_21_chart_data.json"
-#   file_path = path.join(chart_data_folder, filename)
-#   with open(file_path, 'w') as file:
-#       print("now writing to file...")
-#       file.write(json.dumps(result, separators=(',', ':')))
-#       file.close()
-#       print(f" * {OKGREEN}New Trisomy 21 Chart Data has been generated.")
-# except:
-#   raise ValueError("Unable to create Trisomy 21 charts")
-
-# # Turner's Syndrome
-# try:  
-#   result = create_turner_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES)
-#   filename = "turners_chart_data.json"
-#   file_path = path.join(chart_data_folder, filename)
-#   with open(file_path, 'w') as file:
-#       print("now writing to file...")
-#       file.write(json.dumps(result, separators=(',', ':')))
-#       file.close()
-#       print(f" * {OKGREEN}New Turner's Syndrome Chart Data has been generated.")
-# except:
-#   raise ValueError("Unable to create Turner's Syndrome charts")
-
 # TODO #123 the spreadsheet endpoint probably needs to be deprecated
 @app.route("/uk-who/spreadsheet", methods=["POST"])
 def ukwho_spreadsheet():
@@ -123,7 +115,8 @@ def ukwho_spreadsheet():
     """
     csv_file = request.files["csv_file"]
     calculated_results = controllers.import_csv_file(csv_file)
-    return calculated_results
+    # each child's measurements are calculated before the response starts: only their serialisation is chunked
+    return controllers.streamed_response(calculated_results)
 
 
 # generate the API spec
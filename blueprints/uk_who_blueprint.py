@@ -26,6 +26,7 @@ def uk_who_calculation():
         * Gestational age correction will be applied automatically if appropriate according to the gestational age at birth data supplied.
         * Available `measurement_method`s are: `height`, `weight`, `bmi`, or `ofc` (OFC = occipitofrontal circumference = 'head circumference').
         * Note that BMI must be precalculated for the `bmi` function.
+        * Optionally, `fields` (such as `["sds", "centile"]` or `"sds,centile"`) limits the response to those fields, or groups of fields such as `measurement_dates`. Fields which are not asked for, such as the calendar ages and comments, are not calculated, so this is quicker for clients which only need numbers.
 
       requestBody:
         content:
@@ -51,32 +52,98 @@ def uk_who_calculation():
         req = request.get_json()
         print(req)
 
-        values = {
-            'birth_date': req["birth_date"],
-            'observation_date': req["observation_date"],
-            'measurement_method': req["measurement_method"],
-            'observation_value': req["observation_value"],
-            'sex': req["sex"],
-            'gestation_weeks': req["gestation_weeks"],
-            'gestation_days': req["gestation_days"]
-        }
+        values = {key: req[key] for key in ("birth_date", "observation_date", "measurement_method", "observation_value",
+                                            "sex", "gestation_weeks", "gestation_days") if key in req}
 
         pprint(values)
 
-        # Validate the request with Marshmallow
+        # Validate the request with Marshmallow: the calculation is made from the values it loads
         try:
-            CalculationRequestParameters().load(values)
+            values = CalculationRequestParameters().load(values)
+            response_fields = MeasurementFieldsParameters().load(
+                {key: req[key] for key in ("fields",) if key in req})["response_fields"]
         except ValidationError as err:
             pprint(err.messages)
             return json.dumps(err.messages), 422
 
-        calculation = controllers.perform_calculation(**values)
+        try:
+            calculation = controllers.perform_calculation(**values, fields=response_fields)
+        except ValueError as err:
+            # an observation_value out of range for its measurement_method, as the calculations endpoint returns it
+            return json.dumps({"_schema": [str(err)]}), 422
 
         return jsonify(calculation)
     else:
         return "Request body mimetype should be application/json", 400
 
 
+@uk_who.route("/calculations", methods=["POST"])
+def uk_who_calculations():
+    """
+    Centile calculations for many measurements.
+    ---
+    post:
+      summary: Centile and SDS Calculation route, for many measurements in one request.
+      description: |
+        * Returns a centile/SDS calculation for each of the `measurements`, such as all of a child's clinic visits, in the order they were sent.
+        * Each measurement has the same parameters as a request to the `calculation` endpoint, and its calculation is the same.
+        * The measurements are validated together, and their ages and SDS calculated together, so a whole history costs little more than a single calculation.
+        * A measurement which is invalid, such as one taken before birth or at an age the UK-WHO reference has no data for, returns its `errors` in its place: the others are still calculated.
+        * Optionally, `fields` limits every calculation to those fields, as for the `calculation` endpoint.
+
+      requestBody:
+        content:
+          application/json:
+            schema: CalculationsRequestParameters
+            example:
+                measurements:
+                  - birth_date: "2020-04-12"
+                    observation_date: "2020-06-12"
+                    observation_value: 60
+                    measurement_method: "height"
+                    sex: male
+                    gestation_weeks: 40
+                    gestation_days: 4
+                  - birth_date: "2020-04-12"
+                    observation_date: "2020-06-12"
+                    observation_value: 5.2
+                    measurement_method: "weight"
+                    sex: male
+                    gestation_weeks: 40
+                    gestation_days: 4
+
+      responses:
+        200:
+          description: "Centile calculations according to the supplied data were returned, or the errors of each measurement which could not be calculated"
+          content:
+            application/json:
+              schema: CalculationsResponseSchema
+    """
+    if request.is_json:
+        try:
+            parameters = CalculationsRequestParameters().load(request.get_json())
+        except ValidationError as err:
+            return json.dumps(err.messages), 422
+
+        # Load each measurement with Marshmallow: an invalid one returns its errors in its place
+        measurement_schema = CalculationRequestParameters()
+        loaded = []
+        for measurement in parameters["measurements"]:
+            try:
+                loaded.append(measurement_schema.load(measurement))
+            except ValidationError as err:
+                loaded.append(err)
+        calculated = iter(controllers.perform_calculations(
+            [measurement for measurement in loaded if not isinstance(measurement, ValidationError)],
+            fields=parameters["response_fields"]))
+
+        calculations = [{"errors": measurement.messages} if isinstance(measurement, ValidationError) else next(calculated) for measurement in loaded]
+        # every calculation is already built: only their serialisation is chunked
+        return controllers.streamed_response({"calculations": controllers.StreamedArray(calculations)})
+    else:
+        return "Request body mimetype should be application/json", 400
+
+
 @uk_who.route("/chart-coordinates", methods=["POST"])
 def uk_who_chart_coordinates():
     """
@@ -88,6 +155,9 @@ def uk_who_chart_coordinates():
         * Requires calculated child measurement results from a preceding call to the `uk-who/calculation` endpoint.
         * Pass these results back in as the JSON body payload.
         * Returns coordinates for constructing the lines of a traditional growth chart, in JSON format
+        * Optionally pass `age_min` and/or `age_max` (decimal years) to return only the part of each centile line in that age window, widened by `age_padding` years at each end.
+        * Optionally pass a list of `centiles` (such as `[0.1, 99.9]`) or of `sds` (such as `[-3, 3]`) to draw those lines instead of the nine centiles, within 4 SDS of the median.
+        * The centile lines are sent with each point as its own object, unless the `Accept` header asks for `application/vnd.rcpch.chart.columnar+json` (the ages of each reference, sex and measurement once, then the measurements of each line) or `application/vnd.rcpch.chart.columnar-delta+json` (the same, as delta-encoded integers scaled by 10000).
 
       requestBody:
         content:
@@ -103,7 +173,15 @@ def uk_who_chart_coordinates():
     """
 
     if request.is_json:
-        results = request.get_json()["results"]
+        req = request.get_json()
+        results = req["results"]
+
+        # the optional age window and custom centiles or SDS of the centile lines
+        try:
+            centile_lines = CentileLinesParameters().load(
+                {key: req[key] for key in ("age_min", "age_max", "age_padding", "centiles", "sds") if key in req})
+        except ValidationError as err:
+            return json.dumps(err.messages), 422
 
         # if the gestation is passed in as None this will be regarded as indicating Term
         if results[0]["birth_data"]["gestation_weeks"] is None and results[0]["birth_data"]["gestation_weeks"] > 0:
@@ -116,21 +194,73 @@ def uk_who_chart_coordinates():
             born_preterm = True
 
         # Get the X and Y values for the results
-        child_data = controllers.create_data_plots(results)
+        child_data = controllers.create_plottable_child_data(results)
 
-        # Create Centile Charts
-        centiles = controllers.create_centile_values(
-            sex=results[0]["birth_data"]["sex"], born_preterm=born_preterm)
+        # Centile lines come from the chart data loaded at boot: they are never computed while serving a request
+        try:
+            centiles = controllers.create_centile_values(
+                sex=results[0]["birth_data"]["sex"], born_preterm=born_preterm, **centile_lines)
+        except LookupError as error:
+            return str(error), 503
 
-        return jsonify({
+        # streamed one reference, sex and measurement at a time, rather than serialised whole before sending
+        response_format = controllers.chart_format(request.accept_mimetypes)
+        response = controllers.streamed_response({
             "sex": results[0]["birth_data"]["sex"],
             "child_data": child_data,
-            "centile_data": centiles
-        })
+            "centile_data": controllers.streamed_centile_values(centiles, response_format)
+        }, mimetype=response_format)
+        response.vary.add("Accept")
+        return response
     else:
         return "Request body should be application/json", 400
 
 
+@uk_who.route("/chart-coordinates", methods=["GET"])
+def uk_who_centile_coordinates():
+    """
+    Centile lines.
+    ---
+    get:
+      summary: UK-WHO centile line coordinates in plottable format, for one sex
+      description: |
+        * Returns the coordinates for constructing the centile lines of a traditional growth chart, in JSON format, without any child measurements.
+        * The lines depend only on `sex`, `born_preterm` (which adds the UK90 preterm lines) and the `centile_selection` (`cole_two_thirds_sds_nine_centiles` or `three_percent_centiles`).
+        * Optionally pass `age_min` and/or `age_max` (decimal years) to return only the part of each line in that age window, widened by `age_padding` years at each end. The lines are sliced from those held in memory, not recalculated.
+        * The lines are sent with each point as its own object, unless the `Accept` header asks for `application/vnd.rcpch.chart.columnar+json` (the ages of each reference, sex and measurement once, then the measurements of each line) or `application/vnd.rcpch.chart.columnar-delta+json` (the same, as delta-encoded integers scaled by 10000).
+        * Optionally pass `centiles` (such as `0.1,99.9`) or `sds` (such as `-3,-2,2,3`), separated by commas, to draw those lines instead of the `centile_selection`. Lines must lie within 4 SDS of the median. The lines of each collection are generated on its first request and then kept in memory.
+        * Responses carry an ETag and Cache-Control, and are compressed (gzip, or brotli where available) if the client accepts it. A request with a matching `If-None-Match` is answered `304 Not Modified`.
+
+      parameters:
+        - in: query
+          schema: CentileCoordinatesRequestParameters
+
+      responses:
+        200:
+          description: "Centile lines for plotting a traditional growth chart were returned"
+          content:
+            application/json:
+              schema: CentileCoordinatesResponseSchema
+        304:
+          description: "The centile lines are unchanged since the request's If-None-Match ETag"
+    """
+    try:
+        parameters = CentileCoordinatesRequestParameters().load(request.args)
+    except ValidationError as err:
+        return json.dumps(err.messages), 422
+
+    # served from memory: serialised and compressed once, never recomputed for a request
+    try:
+        encoded_response = controllers.centile_values_response(
+            chart_format=controllers.chart_format(request.accept_mimetypes), **parameters)
+    except LookupError as error:
+        return str(error), 503
+
+    response = controllers.cached_response(encoded_response)
+    response.vary.add("Accept")
+    return response
+
+
 @uk_who.route("/plottable-child-data", methods=["POST"])
 def uk_who_plottable_child_data():
     """
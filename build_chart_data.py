@@ -0,0 +1,24 @@
+"""
+Build step: generates the centile lines of every chart, for every centile collection, and writes them to
+chart_data/ with their content hashes (see controllers.chart_data). The server loads them at boot, and regenerates
+in the background any that are missing or were generated from different reference data or code.
+
+usage: `python build_chart_data.py [folder] [--processes N]`
+"""
+import argparse
+import os
+
+from controllers.chart_data import CHART_DATA_FOLDER, build_chart_data
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates the chart data the server loads at boot")
+    parser.add_argument("folder", nargs="?", default=CHART_DATA_FOLDER)
+    parser.add_argument("--processes", type=int, default=None,
+                        help="generate the lines of each chart in a pool of this many processes")
+    arguments = parser.parse_args()
+    folder = arguments.folder
+    manifest = build_chart_data(folder, processes=arguments.processes)
+    for reference, centile_selections in manifest["charts"].items():
+        for centile_selection, entry in centile_selections.items():
+            size = os.path.getsize(os.path.join(folder, entry["file"]))
+            print(f"wrote {entry['file']} ({size / 1e6:.2f} MB, sha256 {entry['sha256'][:12]})")
@@ -1,7 +1,11 @@
-from .calculations import perform_calculation, calculate_velocity_acceleration
+from .calculations import perform_calculation, perform_calculations, calculate_velocity_acceleration
 from .references import references
 from .temp_test_functions import test_sds_tim_term_heights, tim_tests_preterm
 from .upload import prepare_data_as_array_of_measurement_objects, import_csv_file
 from .fictional_child_data import generate_fictional_data
 from .fictional_children import generate_fictional_children_data
 from .plottable_child import create_plottable_child_data
+from .chart_data import load_chart_data, regenerate_chart_data
+from .cached_response import cached_response
+from .uk_who_chart import create_centile_values, centile_values_response, precompress_centile_values, chart_format, encode_centile_values
+from .json_stream import StreamedArray, StreamedObject, streamed_response, streamed_centile_values
@@ -0,0 +1,59 @@
+"""
+A least recently used cache bounded by the memory its values take up, rather than by how many there are, for
+values which are costly to make but of which there is no end, such as charts of custom centile collections.
+"""
+import threading
+from collections import OrderedDict
+
+
+class BoundedCache:
+    """
+    Maps keys to values, each stored with its size in bytes. Once the sizes add up to more than max_bytes, the
+    least recently used values are dropped. A value larger than max_bytes on its own is not stored at all.
+    Safe to share between the threads serving requests.
+    """
+
+    __slots__ = ("max_bytes", "total_bytes", "hits", "misses", "_entries", "_lock")
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the value stored for key, marking it as the most recently used, or None if there is none
+        """
+        with self._lock:
+            try:
+                value, size = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size: int):
+        """
+        Stores value for key, then drops the least recently used values until the cache is within max_bytes.
+        Returns the value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self.total_bytes -= self._entries.popitem(last=False)[1][1]
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"<BoundedCache {len(self)} values, {self.total_bytes} of {self.max_bytes} bytes, {self.hits} hits, {self.misses} misses>"
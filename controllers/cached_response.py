@@ -0,0 +1,82 @@
+"""
+Responses whose body depends only on the request parameters and the reference data, encoded once and then served
+from memory with HTTP caching: an ETag for each content coding, 304 Not Modified for a matching If-None-Match,
+Cache-Control, and the body precompressed with gzip and, if the brotli package is installed, brotli.
+"""
+import gzip
+import hashlib
+import threading
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# how long clients and shared caches may reuse a response before revalidating it with its ETag
+CACHE_CONTROL = "public, max-age=86400"
+
+
+class EncodedResponse:
+    """
+    A JSON body with its ETag, and each content coding of it. The ETag is derived from `version` (the hash of the
+    data the body was made from) and the parameters, so it is the same across restarts and servers.
+    Content codings are compressed once, when first asked for.
+    """
+
+    __slots__ = ("body", "etag", "mimetype", "_encoded", "_lock")
+
+    def __init__(self, body: bytes, version: str, parameters: tuple, mimetype: str = "application/json"):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(repr((version,) + tuple(parameters)).encode("utf-8")).hexdigest()[:32]
+        self._encoded = {"identity": body}
+        self._lock = threading.Lock()
+
+    def encodings(self) -> list:
+        """
+        The content codings this body can be sent in, most preferred first
+        """
+        return ["br", "gzip", "identity"] if brotli is not None else ["gzip", "identity"]
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            if encoding not in self._encoded:
+                if encoding == "br":
+                    self._encoded[encoding] = brotli.compress(self.body, quality=11)
+                elif encoding == "gzip":
+                    # no timestamp, so the same body always compresses to the same bytes
+                    self._encoded[encoding] = gzip.compress(self.body, compresslevel=9, mtime=0)
+                else:
+                    raise ValueError(f"{encoding} is not a supported content coding")
+            return self._encoded[encoding]
+
+    def precompress(self):
+        for encoding in self.encodings():
+            self.encoded(encoding)
+
+    def etag_for(self, encoding: str) -> str:
+        # each content coding is a different representation, so has its own ETag
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+
+def cached_response(encoded_response: EncodedResponse) -> Response:
+    """
+    Returns the response to the current request: the body in the best content coding the client accepts, or
+    304 Not Modified if the client already holds it
+    """
+    encoding = request.accept_encodings.best_match(encoded_response.encodings(), default="identity")
+    etag = encoded_response.etag_for(encoding)
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(encoded_response.encoded(encoding), mimetype=encoded_response.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
@@ -1,5 +1,6 @@
-from datetime import date, datetime
+from datetime import date
 from rcpchgrowth.rcpchgrowth.measurement import Measurement
+from rcpchgrowth.rcpchgrowth.measurement_result import measurement_fields
 from rcpchgrowth.rcpchgrowth.date_calculations import chronological_decimal_age
 from rcpchgrowth.rcpchgrowth.dynamic_growth import velocity, acceleration
 
@@ -10,8 +11,9 @@ def perform_calculation(*,
                         measurement_method: str,
                         observation_value: float,
                         sex: str,
-                        gestation_weeks: int,
-                        gestation_days: int):
+                        gestation_weeks: float = 0,
+                        gestation_days: float = 0,
+                        fields: list = None):
     """
     * This function takes a measurement_method as a string ('height', 'weight', 'bmi' or 'ofc') and returns a Measurement object with the calculated values.
     
@@ -19,18 +21,49 @@ def perform_calculation(*,
     
     * Note that measurement_method is a string passed by the form and is distinct from Measurement_Type which is a class relating to the same.
     
-    * Dates supplied as valid JSON Date strings, passing Marshmallow validation in the Flask app will be converted to Python DateTime objects for passing to the Python RCPCHgrowth package
+    * The parameters are those loaded by CalculationRequestParameters in the Flask app, so the dates supplied as valid JSON Date strings are Python date objects for passing to the Python RCPCHgrowth package. Having been loaded, the parameters are not validated again by the Measurement. A gestation which was not supplied is taken as term, as by the Measurement.
+
+    * If a list of fields (such as sds and centile) is given, only those fields are calculated and returned: see MeasurementResult.as_dict
     """
     return Measurement(
-        sex=str(sex),
-        birth_date=datetime.strptime(birth_date, "%Y-%m-%d"),
-        observation_date=datetime.strptime(observation_date,"%Y-%m-%d"),
-        measurement_method=str(measurement_method),
-        observation_value=float(observation_value),
-        gestation_weeks=gestation_weeks,
-        gestation_days=gestation_days,
-        reference="uk-who"
-    ).measurement
+        sex=sex,
+        birth_date=birth_date,
+        observation_date=observation_date,
+        measurement_method=measurement_method,
+        observation_value=observation_value,
+        gestation_weeks=whole_number(gestation_weeks),
+        gestation_days=whole_number(gestation_days),
+        reference="uk-who",
+        validated=True
+    ).result.as_dict(None if fields is None else measurement_fields(fields))
+
+
+def perform_calculations(measurements: list, fields: list = None) -> list:
+    """
+    * Calculates many measurements together (see Measurement.batch): each is a dict of the parameters of perform_calculation, as loaded by CalculationRequestParameters, so with its dates as Python date objects. Having been loaded, the parameters are not validated again by the Measurement.
+
+    * Returns, in the order of the measurements, the measurement object of each (only the fields asked for), or the `errors` of an observation_value which the Measurement rejects as out of range (a ValueError). Any other error is a fault, not the client's, and is raised. Each measurement object is built here, not as the response is streamed, so an error in it is raised before the response starts rather than cutting it short.
+    """
+    if fields is not None:
+        fields = measurement_fields(fields)
+    observations = [
+        dict(measurement, **{key: whole_number(measurement[key]) for key in ("gestation_weeks", "gestation_days") if key in measurement})
+        for measurement in measurements]
+    calculations = []
+    for result in Measurement.batch(observations, reference="uk-who", validated=True):
+        if isinstance(result, ValueError):
+            calculations.append({"errors": {"_schema": [str(result)]}})
+        elif isinstance(result, Exception):
+            raise result
+        else:
+            calculations.append(result.result.as_dict(fields))
+    return calculations
+
+
+def whole_number(value):
+    # Marshmallow loads every number as a float: whole numbers of weeks and days of gestation are passed on as ints,
+    # so they are returned, and written in the comments, as they were sent
+    return int(value) if isinstance(value, float) and value.is_integer() else value
 
 
 def calculate_velocity_acceleration(data):
@@ -0,0 +1,375 @@
+"""
+Chart data: the centile lines of each reference's chart, for each centile collection, generated once at build time
+and served from memory.
+
+`python build_chart_data.py` writes each chart to chart_data/ as compact JSON, with a manifest holding the SHA-256
+of each file and of the sources it was generated from (the reference data and the rcpchgrowth modules which draw
+the lines). At boot the server loads every chart whose file is intact and generated from the current sources; any
+missing or stale chart is regenerated in a background thread, so startup never fails or waits on it. Requests only
+ever read the charts held in memory. Where several server processes share the folder, one regenerates the charts
+at a time, and the others load what it has written rather than generating them again.
+
+Charts of custom collections of centiles or SDS are generated when first asked for, and kept in a least recently
+used cache bounded by the memory they take up.
+"""
+import bisect
+import fcntl
+import hashlib
+import inspect
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from rcpchgrowth.rcpchgrowth import create_uk_who_chart, create_trisomy_21_chart, create_turner_chart
+from rcpchgrowth.rcpchgrowth import global_functions, growth_reference, reference_table, uk_who, turner, trisomy_21
+from rcpchgrowth.rcpchgrowth.constants.parameter_constants import *
+from rcpchgrowth.rcpchgrowth.reference_table import REFERENCE_DATA_FILES
+from .bounded_cache import BoundedCache
+
+CHART_DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chart_data")
+CHART_DATA_MANIFEST = "manifest.json"
+# lock files, held while the manifest is rewritten and while a process regenerates charts
+CHART_DATA_MANIFEST_LOCK = "manifest.lock"
+CHART_DATA_REGENERATE_LOCK = "regenerate.lock"
+CHART_DATA_VERSION = 1
+
+# the function drawing the chart of each reference, and the centile collections every chart is generated for
+CHART_BUILDERS = {
+    UK_WHO: create_uk_who_chart,
+    TRISOMY_21: create_trisomy_21_chart,
+    TURNERS: create_turner_chart
+}
+CENTILE_SELECTIONS = (COLE_TWO_THIRDS_SDS_NINE_CENTILES, THREE_PERCENT_CENTILES)
+
+# seconds a request waits for a chart which is still being generated in the background
+CHART_DATA_WAIT_SECONDS = 30
+
+# the memory the charts of custom centile collections may take up. A chart held in memory takes about 9 bytes
+# for each byte of its JSON body
+CUSTOM_CHART_DATA_MAX_BYTES = 64 * 1024 * 1024
+CHART_MEMORY_PER_BODY_BYTE = 9
+
+
+class ChartData:
+    """
+    The chart of a reference for a centile collection: the chart itself and its compact JSON body, with the
+    SHA-256 of that body
+    """
+
+    __slots__ = ("reference", "centile_selection", "chart", "body", "sha256", "_line_ages")
+
+    def __init__(self, reference: str, centile_selection: str, chart: list, body: bytes):
+        self.reference = reference
+        self.centile_selection = centile_selection
+        self.chart = chart
+        self.body = body
+        self.sha256 = hashlib.sha256(body).hexdigest()
+        self._line_ages = None
+
+    @classmethod
+    def from_chart(cls, reference: str, centile_selection: str, chart: list):
+        return cls(reference, centile_selection, chart, json.dumps(chart, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_body(cls, reference: str, centile_selection: str, body: bytes):
+        return cls(reference, centile_selection, json.loads(body), body)
+
+    def line_ages(self) -> dict:
+        """
+        The ages of the points of every centile line, in order, keyed by (reference, sex, measurement_method):
+        a list for each centile. Built when first asked for, and shared by every window taken of the chart.
+        """
+        if self._line_ages is None:
+            self._line_ages = {
+                (reference, sex, measurement_method): [[point["x"] for point in line["data"]] for line in lines]
+                for segment in self.chart
+                for reference, sexes in segment.items()
+                for sex, measurement_methods in sexes.items()
+                for measurement_method, lines in measurement_methods.items()}
+        return self._line_ages
+
+    def window(self, reference: str, sex: str, age_min: float = None, age_max: float = None) -> dict:
+        """
+        The lines of a chart segment for one sex, each sliced to the points from age_min to age_max (either may be
+        None, for no bound), without recalculating them. A line which runs past either end of the window keeps its
+        point just beyond it, so it is drawn right to the edge. The lines are found by binary search of their ages,
+        and their points are shared with the chart, not copied.
+        Returns None if no line of the segment has a point in the window.
+        """
+        line_ages = self.line_ages()
+        lower = float("-inf") if age_min is None else age_min
+        upper = float("inf") if age_max is None else age_max
+        windowed = {}
+        any_points = False
+        for segment in self.chart:
+            if reference not in segment:
+                continue
+            for measurement_method, lines in segment[reference][sex].items():
+                windowed_lines = []
+                for line, ages in zip(lines, line_ages[(reference, sex, measurement_method)]):
+                    start, end = _window_indices(ages, lower, upper)
+                    any_points = any_points or end > start
+                    windowed_lines.append({"sds": line["sds"], "centile": line["centile"], "data": line["data"][start:end]})
+                windowed[measurement_method] = windowed_lines
+        return windowed if any_points else None
+
+    def __repr__(self):
+        return f"<ChartData {self.reference} {self.centile_selection}: {len(self.body)} bytes, {self.sha256[:12]}>"
+
+
+# (reference, centile_selection) -> ChartData, and an event set once each is ready (or has failed)
+CHART_DATA = {}
+# (reference, centile_selection) -> the error which stopped the chart being generated
+CHART_DATA_ERRORS = {}
+_chart_data_ready = {key: threading.Event() for key in
+                     ((reference, centile_selection) for reference in CHART_BUILDERS for centile_selection in CENTILE_SELECTIONS)}
+
+# (reference, normalized custom collection) -> ChartData
+CUSTOM_CHART_DATA = BoundedCache(CUSTOM_CHART_DATA_MAX_BYTES)
+
+
+def chart_data_file_name(reference: str, centile_selection: str) -> str:
+    return f"{reference}.{centile_selection}.json"
+
+
+def chart_data_source_hash() -> str:
+    """
+    SHA-256 of everything the charts are generated from: the reference data files and the source of the modules
+    which select the tables and draw the lines. A chart generated from any other sources is stale.
+    """
+    source_hash = hashlib.sha256(str(CHART_DATA_VERSION).encode("utf-8"))
+    source_files = [REFERENCE_DATA_FILES[reference] for reference in sorted(REFERENCE_DATA_FILES)]
+    source_files += [inspect.getsourcefile(module) for module in (
+        global_functions, growth_reference, reference_table, uk_who, turner, trisomy_21)]
+    for source_file in source_files:
+        with open(source_file, "rb") as source:
+            source_hash.update(hashlib.sha256(source.read()).digest())
+    return source_hash.hexdigest()
+
+
+def generate_chart_data(reference: str, centile_selection: str, executor=None) -> ChartData:
+    """
+    Generates the chart of a reference for a centile collection, its lines in parallel on the executor if one is passed
+    """
+    return ChartData.from_chart(reference, centile_selection, CHART_BUILDERS[reference](centile_selection, executor=executor))
+
+
+def write_chart_data(charts: list, folder: str = None, source_hash: str = None) -> dict:
+    """
+    Writes each ChartData to the folder and records it in the manifest, alongside any charts already there
+    which are still current. Files are written alongside and then moved into place, so a starting server never
+    reads a partly written one, and the manifest is read and rewritten under a file lock, so processes writing
+    charts at the same time never drop each other's.
+    Returns the manifest.
+    """
+    folder = folder or CHART_DATA_FOLDER
+    source_hash = source_hash or chart_data_source_hash()
+    os.makedirs(folder, exist_ok=True)
+    for chart_data in charts:
+        _replace_file(os.path.join(folder, chart_data_file_name(chart_data.reference, chart_data.centile_selection)), chart_data.body)
+    with _file_lock(os.path.join(folder, CHART_DATA_MANIFEST_LOCK)):
+        manifest = _read_manifest(folder)
+        if manifest.get("version") != CHART_DATA_VERSION or manifest.get("source") != source_hash:
+            manifest = {"version": CHART_DATA_VERSION, "source": source_hash, "charts": {}}
+        for chart_data in charts:
+            manifest["charts"].setdefault(chart_data.reference, {})[chart_data.centile_selection] = {
+                "file": chart_data_file_name(chart_data.reference, chart_data.centile_selection),
+                "sha256": chart_data.sha256
+            }
+        _replace_file(os.path.join(folder, CHART_DATA_MANIFEST), json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def build_chart_data(folder: str = None, processes: int = None) -> dict:
+    """
+    Build step: generates the chart of every reference for every centile collection and writes them to the folder.
+    If processes is given, the lines of each chart are generated in a pool of that many processes.
+    Returns the manifest.
+    """
+    if not processes:
+        charts = [generate_chart_data(reference, centile_selection) for reference, centile_selection in _chart_data_ready]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            charts = [generate_chart_data(reference, centile_selection, executor) for reference, centile_selection in _chart_data_ready]
+    return write_chart_data(charts, folder)
+
+
+def load_chart_data(folder: str = None) -> list:
+    """
+    Loads into memory every chart in the folder which is intact and generated from the current sources.
+    Returns the (reference, centile_selection) of each chart which is missing or stale.
+    """
+    folder = folder or CHART_DATA_FOLDER
+    manifest = _read_manifest(folder)
+    current = manifest.get("version") == CHART_DATA_VERSION and manifest.get("source") == chart_data_source_hash()
+    missing = []
+    for reference, centile_selection in _chart_data_ready:
+        chart_data = None
+        if current:
+            chart_data = _read_chart_data(folder, manifest, reference, centile_selection)
+        if chart_data is None:
+            missing.append((reference, centile_selection))
+        else:
+            _store(chart_data)
+    return missing
+
+
+def regenerate_chart_data(missing: list, folder: str = None) -> threading.Thread:
+    """
+    Generates the missing charts in a background thread, serving each as soon as it is ready and writing it to the
+    folder for the next boot. A folder which cannot be written to is reported and the charts are kept in memory only.
+    Only one process regenerates at a time: the others wait, then load any chart it wrote instead of generating it.
+    A chart which cannot be generated is reported and marked as failed, so requests for it fail at once rather
+    than waiting; the other charts are still generated.
+    Returns the thread.
+    """
+    def regenerate():
+        source_hash = chart_data_source_hash()
+        with _file_lock(os.path.join(folder or CHART_DATA_FOLDER, CHART_DATA_REGENERATE_LOCK)):
+            for reference, centile_selection in missing:
+                try:
+                    chart_data = _read_current_chart_data(folder, source_hash, reference, centile_selection)
+                    if chart_data is None:
+                        chart_data = generate_chart_data(reference, centile_selection)
+                        try:
+                            write_chart_data([chart_data], folder, source_hash)
+                        except OSError as error:
+                            print(f" * Chart data could not be saved to {folder or CHART_DATA_FOLDER}: {error}")
+                    _store(chart_data)
+                except Exception as error:
+                    print(f" * The {centile_selection} chart data for {reference} could not be generated: {error}")
+                    traceback.print_exc()
+                    _fail(reference, centile_selection, error)
+
+    thread = threading.Thread(target=regenerate, name="regenerate-chart-data", daemon=True)
+    thread.start()
+    return thread
+
+
+def chart_data(reference: str, centile_selection: str, wait_seconds: float = CHART_DATA_WAIT_SECONDS) -> ChartData:
+    """
+    Returns the chart of a reference for a centile collection, waiting for it if it is still being generated.
+    Raises a LookupError if there is no such chart, it is not ready in time or it could not be generated.
+    """
+    try:
+        ready = _chart_data_ready[(reference, centile_selection)]
+    except KeyError:
+        raise LookupError(f"There is no {centile_selection} chart data for {reference}.")
+    if not ready.wait(wait_seconds):
+        raise LookupError(f"The {centile_selection} chart data for {reference} is not ready yet.")
+    if (reference, centile_selection) in CHART_DATA_ERRORS:
+        raise LookupError(f"The {centile_selection} chart data for {reference} could not be generated.")
+    return CHART_DATA[(reference, centile_selection)]
+
+
+def _window_indices(ages: list, lower: float, upper: float) -> tuple:
+    """
+    The slice of a line's ages from lower to upper, taking in the age either side of the window if the line
+    runs past it. Empty if the line has no age in the window.
+    """
+    start = bisect.bisect_left(ages, lower)
+    end = bisect.bisect_right(ages, upper)
+    if start >= end:
+        return 0, 0
+    if start > 0 and ages[start] > lower:
+        start -= 1
+    if end < len(ages) and ages[end - 1] < upper:
+        end += 1
+    return start, end
+
+
+def custom_chart_data(reference: str, collection: tuple) -> ChartData:
+    """
+    Returns the chart of a reference for a custom collection of centile or SDS lines, normalized by
+    normalize_centile_collection, so every request for the same lines finds the same chart. It is generated on
+    the first request, then served from CUSTOM_CHART_DATA until it is the least recently used chart which will
+    not fit.
+    Raises a LookupError if there is no such reference.
+    """
+    if reference not in CHART_BUILDERS:
+        raise LookupError(f"There is no chart data for {reference}.")
+    key = (reference, collection)
+    cached = CUSTOM_CHART_DATA.get(key)
+    if cached is not None:
+        return cached
+    kind, values = collection
+    chart = CHART_BUILDERS[reference](
+        None, centiles=list(values) if kind == CUSTOM_CENTILES else None, sds=list(values) if kind == CUSTOM_SDS else None)
+    chart_data = ChartData.from_chart(reference, custom_centile_selection(collection), chart)
+    return CUSTOM_CHART_DATA.put(key, chart_data, len(chart_data.body) * CHART_MEMORY_PER_BODY_BYTE)
+
+
+def custom_centile_selection(collection: tuple) -> str:
+    """
+    Names a normalized custom collection, as a centile_selection names a collection, such as `sds:-3.0,3.0`
+    """
+    kind, values = collection
+    return f"{kind}:{','.join(str(value) for value in values)}"
+
+
+def _store(chart_data: ChartData):
+    key = (chart_data.reference, chart_data.centile_selection)
+    CHART_DATA[key] = chart_data
+    CHART_DATA_ERRORS.pop(key, None)
+    _chart_data_ready[key].set()
+
+
+def _fail(reference: str, centile_selection: str, error: Exception):
+    CHART_DATA_ERRORS[(reference, centile_selection)] = error
+    _chart_data_ready[(reference, centile_selection)].set()
+
+
+@contextmanager
+def _file_lock(file_path: str):
+    # an exclusive lock between processes, held while the block runs. Without a writable folder to hold the lock
+    # file there is nothing to share, so the block runs unlocked
+    try:
+        lock_file = open(file_path, "a")
+    except OSError:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_current_chart_data(folder: str, source_hash: str, reference: str, centile_selection: str):
+    # the chart as written to the folder (by another process) from the current sources, or None
+    manifest = _read_manifest(folder or CHART_DATA_FOLDER)
+    if manifest.get("version") != CHART_DATA_VERSION or manifest.get("source") != source_hash:
+        return None
+    return _read_chart_data(folder or CHART_DATA_FOLDER, manifest, reference, centile_selection)
+
+
+def _read_manifest(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, CHART_DATA_MANIFEST)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_chart_data(folder: str, manifest: dict, reference: str, centile_selection: str):
+    try:
+        entry = manifest["charts"][reference][centile_selection]
+        with open(os.path.join(folder, entry["file"]), "rb") as chart_file:
+            body = chart_file.read()
+    except (KeyError, TypeError, OSError):
+        return None
+    if hashlib.sha256(body).hexdigest() != entry.get("sha256"):
+        # a corrupt or partly copied file
+        return None
+    return ChartData.from_body(reference, centile_selection, body)
+
+
+def _replace_file(file_path: str, content: bytes):
+    temporary_file_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temporary_file_path, "wb") as temporary_file:
+        temporary_file.write(content)
+    os.replace(temporary_file_path, file_path)
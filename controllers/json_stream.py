@@ -0,0 +1,133 @@
+"""
+Streams large JSON responses in chunks as their parts are produced, rather than building the whole response and
+then serialising it into one more full-size string before the first byte is sent.
+
+Parts of a response which are produced one at a time are wrapped in StreamedArray (an iterable of items) or
+StreamedObject (an iterable of key, value pairs). Everything else is serialised with json.dumps as it is reached.
+Only the part being serialised, and at most STREAM_CHUNK_BYTES of output, are held at once.
+
+Once the first chunk is sent the status of the response can no longer change, so anything which can fail (such as
+calculations from a request's values) should be done before streaming starts, leaving only serialisation to the stream.
+The calculations of the calculations and upload endpoints are built in full for this reason: only their serialisation
+is chunked. The centile lines, read from chart data already in memory, are encoded as they are streamed.
+"""
+import json
+import traceback
+from datetime import date
+
+from flask import Response
+from werkzeug.http import http_date
+
+from rcpchgrowth.rcpchgrowth.chart_formats import columnar_lines
+from .uk_who_chart import LEGACY_CHART_FORMAT, COLUMNAR_DELTA_CHART_FORMAT
+
+# output is sent in chunks of about this size, so the server does not write a few bytes at a time
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class StreamedArray:
+    """
+    A JSON array whose items are read from an iterable (such as a generator) only as it is streamed
+    """
+
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+class StreamedObject:
+    """
+    A JSON object whose key, value pairs are read from an iterable (such as a generator) only as it is streamed
+    """
+
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+
+def iter_json(value, chunk_bytes: int = STREAM_CHUNK_BYTES):
+    """
+    Yields the compact JSON of value, as UTF-8, in chunks of about chunk_bytes.
+    An error while serialising is logged and raised again, so the server abandons the response rather than ending it
+    as though it were complete.
+    """
+    buffer = []
+    buffered = 0
+    try:
+        for piece in _json_pieces(value):
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= chunk_bytes:
+                yield "".join(buffer).encode("utf-8")
+                buffer = []
+                buffered = 0
+    except Exception as error:
+        print(f" * A streamed JSON response was cut short: {error}")
+        traceback.print_exc()
+        raise
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def streamed_response(value, mimetype: str = "application/json") -> Response:
+    """
+    A response which streams the JSON of value (see iter_json)
+    """
+    return Response(iter_json(value), mimetype=mimetype)
+
+
+def streamed_centile_values(centile_values: list, chart_format: str = LEGACY_CHART_FORMAT) -> StreamedArray:
+    """
+    Streams centile lines from create_centile_values in the chart_format, one reference, sex and measurement_method
+    at a time: each is encoded only as it is reached
+    """
+    def measurement_methods(lines_by_method):
+        for measurement_method, lines in lines_by_method.items():
+            if chart_format != LEGACY_CHART_FORMAT:
+                lines = columnar_lines(lines, fixed_point_delta=chart_format == COLUMNAR_DELTA_CHART_FORMAT)
+            yield measurement_method, lines
+
+    return StreamedArray(
+        StreamedObject(
+            (reference, StreamedObject((sex, StreamedObject(measurement_methods(lines_by_method))) for sex, lines_by_method in sexes.items()))
+            for reference, sexes in segment.items())
+        for segment in centile_values)
+
+
+def _json_pieces(value):
+    if isinstance(value, StreamedArray):
+        yield "["
+        for index, item in enumerate(value.items):
+            if index:
+                yield ","
+            yield from _json_pieces(item)
+        yield "]"
+    elif isinstance(value, StreamedObject):
+        yield "{"
+        for index, (key, item) in enumerate(value.pairs):
+            if index:
+                yield ","
+            yield _dumps(str(key))
+            yield ":"
+            yield from _json_pieces(item)
+        yield "}"
+    elif isinstance(value, dict) and any(isinstance(item, (StreamedArray, StreamedObject)) for item in value.values()):
+        yield from _json_pieces(StreamedObject(value.items()))
+    else:
+        yield _dumps(value)
+
+
+def _default(value):
+    # dates are serialised as jsonify serialises them
+    if isinstance(value, date):
+        return http_date(value.timetuple())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=_default)
+
+
+def _dumps(value) -> str:
+    return _encoder.encode(value)
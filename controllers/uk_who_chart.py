@@ -1,32 +1,163 @@
-import rcpchgrowth.rcpchgrowth as rcpchgrowth
-# from .calculations import create_measurement_object
-import numpy as np
-import os
-from datetime import datetime
-from flask import jsonify
+import json
+import threading
 
+from rcpchgrowth.rcpchgrowth.constants.parameter_constants import *
+from rcpchgrowth.rcpchgrowth.global_functions import normalize_centile_collection
+from rcpchgrowth.rcpchgrowth.chart_formats import columnar_chart
+from .bounded_cache import BoundedCache
+from .cached_response import EncodedResponse
+from .chart_data import CENTILE_SELECTIONS, chart_data, custom_chart_data
 
+# the formats centile lines are sent in, chosen by the client's Accept header: each point as its own object, or
+# columnar (see rcpchgrowth.chart_formats), optionally as delta-encoded fixed-point integers
+LEGACY_CHART_FORMAT = "application/json"
+COLUMNAR_CHART_FORMAT = "application/vnd.rcpch.chart.columnar+json"
+COLUMNAR_DELTA_CHART_FORMAT = "application/vnd.rcpch.chart.columnar-delta+json"
+CHART_FORMATS = [LEGACY_CHART_FORMAT, COLUMNAR_CHART_FORMAT, COLUMNAR_DELTA_CHART_FORMAT]
 
+# (sex, born_preterm, centile_selection[, chart_format]) -> EncodedResponse of the centile lines
+CENTILE_VALUES_RESPONSES = {}
+
+# the responses for custom collections and age windows, of which there is no end, keyed by all their parameters.
+# Each takes up about twice its body once compressed
+CUSTOM_CENTILE_VALUES_RESPONSES = BoundedCache(32 * 1024 * 1024)
+
+
+def create_centile_values(sex: str, born_preterm: bool = False, centile_selection: str = COLE_TWO_THIRDS_SDS_NINE_CENTILES, age_min: float = None, age_max: float = None, age_padding: float = 0, centiles: list = None, sds: list = None):
     """
+    Returns the UK-WHO centile lines for one sex, from the chart data generated at build time (see chart_data).
+    The UK90 preterm lines are only returned for children born preterm.
+    If a custom list of centiles or of SDS is given, those lines are returned instead of the centile_selection's,
+    from the chart generated for them on first request (see custom_chart_data).
+    If age_min or age_max is given, each line is sliced to the ages from age_min to age_max (widened by age_padding
+    years at each end), and only the references with lines in that window are returned.
+    Raises a LookupError if the chart data is not ready.
+
     Return object structure
 
     [
-        "height": [
-            {
-                sds: -2.666666,
-                uk90_child_data:[.....],
-                uk90_preterm_data: [...],
-                who_child_data: [...],
-                who_infant_data: [
-                    {
-                        label: 0.4, `this is the centile
-                        x: 4, `this is the decimal age
-                        y: 91.535  `this is the measurement
-                    }
-                ]
+        {
+            uk90_preterm: {
+                male: {
+                    height: [
+                        {
+                            sds: -2.67,
+                            centile: 0.4,
+                            data: [
+                                {
+                                    l: 0.4, `this is the centile
+                                    x: 4, `this is the decimal age
+                                    y: 91.535  `this is the measurement
+                                },
+                                ...
+                            ]
+                        },
+                        ...
+                    ],
+                    ... repeat for weight, bmi, ofc
+                }
             }
-        ],
-        ... repeat for weight, bmi, ofc, based on which measurements supplied. If only height data supplied, only height centile data returned
+        },
+        ... repeat for uk_who_infant, uk_who_child and uk90_child
     ]
 
     """
+    centile_chart_data = _centile_chart_data(centile_selection, normalize_centile_collection(centiles=centiles, sds=sds))
+    windowed = age_min is not None or age_max is not None
+    if age_min is not None:
+        age_min -= age_padding
+    if age_max is not None:
+        age_max += age_padding
+
+    centile_values = []
+    for segment in centile_chart_data.chart:
+        for reference, sexes in segment.items():
+            if reference == UK90_PRETERM and not born_preterm:
+                continue
+            if not windowed:
+                centile_values.append({reference: {sex: sexes[sex]}})
+                continue
+            # sliced from the lines held in memory, never recalculated
+            measurements = centile_chart_data.window(reference, sex, age_min, age_max)
+            if measurements is not None:
+                centile_values.append({reference: {sex: measurements}})
+    return centile_values
+
+
+def chart_format(accept_mimetypes) -> str:
+    """
+    The format of CHART_FORMATS best matching a request's Accept header (werkzeug's MIMEAccept). Clients which do
+    not ask for a columnar format get the legacy one.
+    """
+    return accept_mimetypes.best_match(CHART_FORMATS, default=LEGACY_CHART_FORMAT)
+
+
+def encode_centile_values(centile_values: list, chart_format: str = LEGACY_CHART_FORMAT) -> list:
+    """
+    Returns centile lines from create_centile_values in the chart_format
+    """
+    if chart_format == LEGACY_CHART_FORMAT:
+        return centile_values
+    return columnar_chart(centile_values, fixed_point_delta=chart_format == COLUMNAR_DELTA_CHART_FORMAT)
+
+
+def centile_values_response(sex: str, born_preterm: bool = False, centile_selection: str = COLE_TWO_THIRDS_SDS_NINE_CENTILES, age_min: float = None, age_max: float = None, age_padding: float = 0, centiles: list = None, sds: list = None, chart_format: str = LEGACY_CHART_FORMAT) -> EncodedResponse:
+    """
+    Returns the UK-WHO centile lines for one sex as an EncodedResponse in the chart_format, serialised once and then
+    reused. Its ETag is derived from the hash of the chart data and the parameters.
+    The responses for a centile_selection's whole lines are kept for good. Those for custom collections or age
+    windows (see create_centile_values), of which there is no end, are kept in a cache bounded by their size.
+    Raises a LookupError if the chart data is not ready.
+    """
+    collection = normalize_centile_collection(centiles=centiles, sds=sds)
+    windowed = age_min is not None or age_max is not None
+    key = (sex, born_preterm, centile_selection if collection is None else collection)
+    if windowed:
+        key += (age_min, age_max, age_padding)
+    if chart_format != LEGACY_CHART_FORMAT:
+        key += (chart_format,)
+    bounded = collection is not None or windowed
+
+    encoded_response = CUSTOM_CENTILE_VALUES_RESPONSES.get(key) if bounded else CENTILE_VALUES_RESPONSES.get(key)
+    if encoded_response is not None:
+        return encoded_response
+    centile_chart_data = _centile_chart_data(centile_selection, collection)
+    body = json.dumps({
+        "sex": sex,
+        "centile_data": encode_centile_values(
+            create_centile_values(sex=sex, born_preterm=born_preterm, centile_selection=centile_selection,
+                                  age_min=age_min, age_max=age_max, age_padding=age_padding, centiles=centiles, sds=sds),
+            chart_format)
+    }, separators=(",", ":")).encode("utf-8")
+    encoded_response = EncodedResponse(body, centile_chart_data.sha256, key, mimetype=chart_format)
+    if bounded:
+        return CUSTOM_CENTILE_VALUES_RESPONSES.put(key, encoded_response, 2 * len(body))
+    return CENTILE_VALUES_RESPONSES.setdefault(key, encoded_response)
+
+
+def precompress_centile_values() -> threading.Thread:
+    """
+    Serialises and compresses the centile lines of every sex, preterm status and centile collection, in every
+    chart format, in a background thread once the chart data is ready, so no request waits on compression.
+    Returns the thread.
+    """
+    def precompress():
+        for centile_selection in CENTILE_SELECTIONS:
+            for sex in SEXES:
+                for born_preterm in (False, True):
+                    try:
+                        for response_format in CHART_FORMATS:
+                            centile_values_response(sex, born_preterm, centile_selection, chart_format=response_format).precompress()
+                    except LookupError as error:
+                        print(f" * Centile lines were not precompressed: {error}")
+                        return
+
+    thread = threading.Thread(target=precompress, name="precompress-centile-values", daemon=True)
+    thread.start()
+    return thread
+
+
+def _centile_chart_data(centile_selection: str, collection: tuple):
+    if collection is None:
+        return chart_data(UK_WHO, centile_selection)
+    return custom_chart_data(UK_WHO, collection)
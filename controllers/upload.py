@@ -6,12 +6,14 @@ from datetime import date, datetime
 import json
 import urllib
 
+from .json_stream import StreamedArray
+
 
 def import_csv_file(file):
     """
     this receives an excel file, converts to a dataframe and returns the following object
     {
-        data: [an array of Measurement class objects]
+        data: [an array of Measurement class objects], calculated as it is streamed (see json_stream)
         unique_child: boolean - refers to whether data is from one child or many children
         valid: boolean - refers to whether imported data was valid for calculation
         error: string  - error message if invalid file
@@ -157,18 +159,17 @@ def return_calculated_data_as_measurement_objects(data_frame, unique=True):
         print('these are not all data from the same patient. They cannot be charted.')
         unique = False
 
-    # create measurement objects
-
+    # create measurement objects: all of them before the response starts, so an invalid row fails the request rather
+    # than cutting the response short. They are all held in memory: only their serialisation is chunked.
     measurement_object_array = []
-
     for index, row in data_frame.iterrows():
         # new_measurement_type = rcp chgrowth.Measurement_Type(measurement_method=row['measurement_method'], observation_value=row['observation_value'])
         new_measurement = rcpchgrowth.Measurement(sex=row['sex'], birth_date=row['birth_date'], observation_date=row['observation_date'], measurement_method=row['measurement_method'],
-                                                  observation_value=row['observation_value'], gestation_weeks=row['gestation_weeks'], gestation_days=row['gestation_days'], reference="UKWH)")
+                                                  observation_value=row['observation_value'], gestation_weeks=row['gestation_weeks'], gestation_days=row['gestation_days'], reference="uk-who")
         measurement_object_array.append(new_measurement.measurement)
 
     return {
-        'data': measurement_object_array,
+        'data': StreamedArray(measurement_object_array),
         'unique_child': unique
     }
 
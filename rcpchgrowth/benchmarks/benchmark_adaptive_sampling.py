@@ -0,0 +1,81 @@
+"""
+Samples every centile line of every chart adaptively (generate_adaptive_centiles) to the tolerances given, or
+ADAPTIVE_SAMPLING_TOLERANCES, and reports for each line its points before and after and its largest error, and for
+each chart its points and JSON size against the weekly then monthly lines.
+
+usage (from the rcpchgrowth folder): `python -m benchmarks.benchmark_adaptive_sampling [height weight ofc bmi tolerances]`
+"""
+import json
+import sys
+import time
+
+from rcpchgrowth.constants import (
+    ADAPTIVE_SAMPLING_TOLERANCES, COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, COLE_TWO_THIRDS_SDS_NINE_CENTILES,
+    MEASUREMENT_METHODS, SEXES,
+    TRISOMY_21, TURNERS, UK_WHO, UK_WHO_REFERENCES)
+from rcpchgrowth.global_functions import (
+    centile_zs, create_trisomy_21_chart, create_turner_chart, create_uk_who_chart, generate_adaptive_centiles)
+from rcpchgrowth.reference_table import REFERENCE_TABLES, preload
+from rcpchgrowth.uk_who import select_reference_data_for_uk_who_chart
+
+CHARTS = {UK_WHO: create_uk_who_chart, TRISOMY_21: create_trisomy_21_chart, TURNERS: create_turner_chart}
+
+
+def chart_tables():
+    """
+    the reference table of every line of every chart, as the chart functions select them
+    """
+    for measurement_method in MEASUREMENT_METHODS:
+        for sex in SEXES:
+            for segment in UK_WHO_REFERENCES:
+                yield UK_WHO, segment, measurement_method, sex, select_reference_data_for_uk_who_chart(segment, measurement_method, sex)
+            for reference in (TRISOMY_21, TURNERS):
+                if (reference, measurement_method, sex) in REFERENCE_TABLES:
+                    # the Turner chart draws its lines with the trisomy 21 reference, as create_turner_chart does
+                    yield reference, reference, measurement_method, sex, REFERENCE_TABLES[(reference, measurement_method, sex)]
+
+
+def chart_points(chart) -> int:
+    """
+    the number of points of all the lines in a chart
+    """
+    if isinstance(chart, dict):
+        if "data" in chart:
+            return len(chart["data"])
+        chart = chart.values()
+    return sum(chart_points(item) for item in chart) if isinstance(chart, (list, type({}.values()))) else 0
+
+
+if __name__ == "__main__":
+    tolerances = dict(ADAPTIVE_SAMPLING_TOLERANCES)
+    if len(sys.argv) > 1:
+        tolerances = dict(zip(MEASUREMENT_METHODS, (float(tolerance) for tolerance in sys.argv[1:])))
+    preload()
+    zs = centile_zs(COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, cole_method=True)
+
+    print(f"tolerances: {tolerances}")
+    print(f"{'line':58} {'daily':>6} {'kept':>5} {'reduction':>9} {'max error':>10}")
+    worst = 0.0
+    for reference, segment, measurement_method, sex, table in chart_tables():
+        curves, report = generate_adaptive_centiles(
+            zs=zs, centiles=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, measurement_method=measurement_method,
+            sex=sex, reference_table=table, reference=TRISOMY_21 if reference == TURNERS else reference,
+            tolerance=tolerances[measurement_method])
+        for line in report:
+            worst = max(worst, line["max_error"] / tolerances[measurement_method])
+            flag = "" if line["within_tolerance"] else "  EXCEEDS TOLERANCE"
+            print(f"{segment:16} {measurement_method:6} {sex:6} {line['centile']:>5} centile{'':15} {line['daily_points']:>6} "
+                  f"{line['points']:>5} {line['reduction']:>9.1%} {line['max_error']:>10.5f}{flag}")
+    print(f"largest error: {worst:.1%} of the tolerance\n")
+
+    for reference, create_chart in CHARTS.items():
+        start = time.perf_counter()
+        fixed = create_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES)
+        fixed_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        adaptive = create_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES, tolerances=tolerances)
+        adaptive_seconds = time.perf_counter() - start
+        fixed_bytes = len(json.dumps(fixed, separators=(",", ":")))
+        adaptive_bytes = len(json.dumps(adaptive, separators=(",", ":")))
+        print(f"{reference:16} weekly/monthly {chart_points(fixed):6} points {fixed_bytes / 1e3:7.0f} kB {fixed_seconds * 1e3:5.0f} ms"
+              f" | adaptive {chart_points(adaptive):6} points {adaptive_bytes / 1e3:7.0f} kB {adaptive_seconds * 1e3:5.0f} ms")
@@ -0,0 +1,41 @@
+"""
+Encodes every chart in each format (see rcpchgrowth.chart_formats) and reports its JSON size, raw and gzipped, and
+how long json.loads takes to parse it, as a client would.
+
+usage (from the rcpchgrowth folder): `python -m benchmarks.benchmark_chart_formats [repeats]`
+"""
+import gzip
+import json
+import sys
+import time
+
+from rcpchgrowth.chart_formats import columnar_chart
+from rcpchgrowth.constants import COLE_TWO_THIRDS_SDS_NINE_CENTILES, TRISOMY_21, TURNERS, UK_WHO
+from rcpchgrowth.global_functions import create_trisomy_21_chart, create_turner_chart, create_uk_who_chart
+from rcpchgrowth.reference_table import preload
+
+CHARTS = {UK_WHO: create_uk_who_chart, TRISOMY_21: create_trisomy_21_chart, TURNERS: create_turner_chart}
+FORMATS = {
+    "legacy": lambda chart: chart,
+    "columnar": lambda chart: columnar_chart(chart),
+    "columnar-delta": lambda chart: columnar_chart(chart, fixed_point_delta=True)
+}
+
+
+def parse_seconds(body: str, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        json.loads(body)
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    preload()
+    print(f"{'chart':16} {'format':15} {'bytes':>9} {'gzipped':>9} {'parse':>9}")
+    for reference, create_chart in CHARTS.items():
+        chart = create_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES)
+        for name, encode in FORMATS.items():
+            body = json.dumps(encode(chart), separators=(",", ":"))
+            gzipped = len(gzip.compress(body.encode("utf-8"), compresslevel=9))
+            print(f"{reference:16} {name:15} {len(body):9} {gzipped:9} {parse_seconds(body, repeats) * 1e3:6.2f} ms")
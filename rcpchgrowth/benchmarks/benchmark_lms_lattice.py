@@ -0,0 +1,55 @@
+"""
+Builds the per-day LMS lattice, reports its memory, checks every day of it against fetch_lms and
+compares the latency of an SDS calculation with and without it.
+If a file name is given, the lattice is saved there as an artifact for load_lms_lattices.
+
+usage (from the rcpchgrowth folder): `python -m benchmarks.benchmark_lms_lattice [lms_lattice.npz]`
+"""
+import sys
+import time
+import timeit
+
+from rcpchgrowth.global_functions import sds_for_measurement
+from rcpchgrowth.lms_lattice import build_lms_lattices, clear_lms_lattices, save_lms_lattices, verify_lms_lattices
+
+NUMBER = 5000
+REPEAT = 5
+
+# days of age, as decimal ages are calculated from dates
+AGES = {
+    "preterm (30 weeks)": -70 / 365.25,
+    "who infant (6 months)": 183 / 365.25,
+    "who child (3 y)": 1096 / 365.25,
+    "uk90 child (12 y)": 4383 / 365.25
+}
+
+
+def time_sds(age: float) -> float:
+    """
+    returns the best mean time in microseconds of one SDS calculation for weight at the age supplied
+    """
+    seconds = min(timeit.repeat(
+        lambda: sds_for_measurement(reference="uk-who", age=age, measurement_method="weight",
+                                    observation_value=10.0, sex="female", born_preterm=True),
+        number=NUMBER, repeat=REPEAT))
+    return seconds / NUMBER * 1e6
+
+
+if __name__ == "__main__":
+    clear_lms_lattices()
+    without_lattice = {label: time_sds(age) for label, age in AGES.items()}
+
+    start = time.perf_counter()
+    report = build_lms_lattices()
+    print(f"built {report['lattices']} lattices of {report['days_per_lattice']} days "
+          f"in {time.perf_counter() - start:.2f} s: {report['total_bytes'] / 1e6:.2f} MB")
+    print(f"checked {verify_lms_lattices()} days against fetch_lms: all identical")
+    with_lattice = {label: time_sds(age) for label, age in AGES.items()}
+
+    for label in AGES:
+        print(f"{label:<28}{without_lattice[label]:8.2f} us per SDS without the lattice, "
+              f"{with_lattice[label]:8.2f} us with it")
+
+    if len(sys.argv) > 1:
+        save_lms_lattices(sys.argv[1])
+        print(f"saved to {sys.argv[1]}")
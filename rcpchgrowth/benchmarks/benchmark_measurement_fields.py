@@ -0,0 +1,46 @@
+"""
+Benchmarks building the measurement object of a Measurement in full, against only the numeric fields a
+machine-to-machine client needs (sds and centile), for which the calendar ages, prematurity comments, corrected
+gestational age and centile band are never generated.
+
+usage (from the rcpchgrowth folder): `python -m benchmarks.benchmark_measurement_fields`
+"""
+import timeit
+from datetime import date
+
+from rcpchgrowth.measurement import Measurement
+from rcpchgrowth.measurement_result import measurement_fields
+
+NUMBER = 2000
+REPEAT = 5
+
+# a term and a preterm child: the preterm child also has an estimated date of delivery and corrected calendar age
+OBSERVATIONS = {
+    "term": dict(sex="female", birth_date=date(2019, 4, 12), observation_date=date(2020, 6, 12), measurement_method="weight",
+                 observation_value=9.5, gestation_weeks=40, gestation_days=2),
+    "preterm": dict(sex="male", birth_date=date(2019, 4, 12), observation_date=date(2020, 6, 12), measurement_method="height",
+                    observation_value=72.0, gestation_weeks=29, gestation_days=4)
+}
+
+FIELDS = {
+    "all fields": None,
+    "sds,centile": measurement_fields(["sds", "centile"])
+}
+
+
+def time_calculation(observation: dict, fields: frozenset) -> float:
+    """
+    returns the best mean time in microseconds of one Measurement and its measurement object with the fields supplied
+    """
+    seconds = min(timeit.repeat(
+        lambda: Measurement(reference="uk-who", **observation).result.as_dict(fields),
+        number=NUMBER, repeat=REPEAT))
+    return seconds / NUMBER * 1e6
+
+
+if __name__ == "__main__":
+    for name, observation in OBSERVATIONS.items():
+        timings = {label: time_calculation(observation, fields) for label, fields in FIELDS.items()}
+        for label, timing in timings.items():
+            print(f"{name:>8} {label:<12} {timing:7.2f} us per calculation")
+        print(f"{name:>8} {'speedup':<12} {timings['all fields'] / timings['sds,centile']:7.2f}x")
@@ -0,0 +1,46 @@
+"""
+Benchmarks the validation of a Measurement's parameters.
+
+Measurement used to load its parameters into the Marshmallow MeasurementClassSchema on every calculation (as a
+set, so the load always failed, and the error was ignored): that load is timed on its own for comparison. It is
+now replaced by plain checks of the parameters' types and values, which are skipped altogether for parameters
+already validated at the API (validated=True).
+
+usage (from the rcpchgrowth folder): `python -m benchmarks.benchmark_measurement_validation`
+"""
+import timeit
+from datetime import date
+
+from marshmallow import ValidationError
+
+from rcpchgrowth.measurement import Measurement
+from rcpchgrowth.schemas import MeasurementClassSchema
+
+NUMBER = 2000
+REPEAT = 5
+
+OBSERVATION = dict(sex="male", birth_date=date(2019, 4, 12), observation_date=date(2020, 6, 12), measurement_method="height",
+                   observation_value=72.0, gestation_weeks=29, gestation_days=4, reference="uk-who")
+
+
+def former_schema_load():
+    try:
+        MeasurementClassSchema().load(set(OBSERVATION.values()))
+    except ValidationError:
+        pass
+
+
+def best_microseconds(function) -> float:
+    """
+    returns the best mean time in microseconds of one call of the function
+    """
+    return min(timeit.repeat(function, number=NUMBER, repeat=REPEAT)) / NUMBER * 1e6
+
+
+if __name__ == "__main__":
+    schema_load = best_microseconds(former_schema_load)
+    checked = best_microseconds(lambda: Measurement(**OBSERVATION).result.sds)
+    validated = best_microseconds(lambda: Measurement(validated=True, **OBSERVATION).result.sds)
+    print(f"{'former Marshmallow load alone':<40} {schema_load:7.2f} us")
+    print(f"{'Measurement, library checks':<40} {checked:7.2f} us (formerly about {checked + schema_load:.2f} us)")
+    print(f"{'Measurement, validated=True':<40} {validated:7.2f} us")
@@ -0,0 +1,66 @@
+"""
+Benchmarks the single-measurement SDS path.
+
+Compares the latency of children whose ages fall in the first or last interval of a reference
+(where L, M and S are linearly interpolated) with children whose ages fall in the interior of
+a reference (where they are cubically interpolated). The two should now be the same.
+
+usage (from the rcpchgrowth folder): `python -m benchmarks.benchmark_sds`
+"""
+import timeit
+
+from scipy.interpolate import interp1d
+
+from rcpchgrowth.global_functions import sds_for_measurement
+
+NUMBER = 5000
+REPEAT = 5
+
+# ages (decimal years) in the linear intervals at the fringes of each UK-WHO reference
+EDGE_AGES = {
+    "uk90 preterm start (23 weeks)": -0.32,
+    "who infant end (2 y join)": 1.95,
+    "who child start (2 y join)": 2.04,
+    "who child end (4 y join)": 3.95,
+    "uk90 child start (4 y join)": 4.04,
+    "uk90 child end (20 y)": 19.95
+}
+
+# ages (decimal years) in the interior of each UK-WHO reference
+INTERIOR_AGES = {
+    "uk90 preterm": -0.2,
+    "who infant": 0.5,
+    "who child": 3.0,
+    "uk90 child": 11.1
+}
+
+
+def time_sds(age: float) -> float:
+    """
+    returns the best mean time in microseconds of one SDS calculation for weight at the age supplied
+    """
+    seconds = min(timeit.repeat(
+        lambda: sds_for_measurement(reference="uk-who", age=age, measurement_method="weight",
+                                    observation_value=10.0, sex="female", born_preterm=True),
+        number=NUMBER, repeat=REPEAT))
+    return seconds / NUMBER * 1e6
+
+
+def time_interp1d() -> float:
+    """
+    returns the best mean time in microseconds of the scipy interp1d construction and call previously made
+    for each of L, M and S at the fringes of a reference
+    """
+    seconds = min(timeit.repeat(lambda: interp1d([4.0, 4.0833], [1.2, 1.3])(4.04), number=NUMBER, repeat=REPEAT))
+    return seconds / NUMBER * 1e6
+
+
+if __name__ == "__main__":
+    for label, ages in (("edge", EDGE_AGES), ("interior", INTERIOR_AGES)):
+        timings = []
+        for name, age in ages.items():
+            timing = time_sds(age)
+            timings.append(timing)
+            print(f"{label:>8} {name:<32} {timing:6.2f} us per SDS")
+        print(f"{label:>8} {'mean':<32} {sum(timings) / len(timings):6.2f} us per SDS")
+    print(f"\n(for comparison, one interp1d build and call: {time_interp1d():.2f} us, previously made 3 times per edge SDS)")
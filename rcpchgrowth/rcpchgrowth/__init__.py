@@ -1,9 +1,12 @@
 from .date_calculations import decimal_age, chronological_decimal_age, corrected_decimal_age, chronological_calendar_age, estimated_date_delivery, corrected_gestational_age
 from .global_functions import centile, sds_for_measurement, measurement_from_sds, percentage_median_bmi, create_uk_who_chart, create_trisomy_21_chart, create_turner_chart
+from .reference_table import preload
+from .chart_formats import columnar_chart, legacy_chart
 from .centile_bands import centile_band_for_centile
 from .bmi_functions import bmi_from_height_weight, weight_for_bmi_height
 from .growth_interpretations import comment_prematurity_correction
 from .dynamic_growth import velocity, acceleration, correlate_weight, create_fictional_child
 from .measurement import Measurement
+from .measurement_result import MeasurementResult
 from .fictional_children import generate_fictional_children_data
 from .constants import *
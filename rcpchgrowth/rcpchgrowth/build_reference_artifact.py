@@ -0,0 +1,18 @@
+"""
+Build step: compiles the reference data in data_tables/*.json into the binary artifact the library
+memory-maps at load time (see reference_table.write_reference_artifact).
+Rerun whenever the reference data change: an artifact built from different JSON is ignored.
+
+usage (from the rcpchgrowth folder): `python -m rcpchgrowth.build_reference_artifact [file path]`
+"""
+import os
+import sys
+
+from . import uk_who, turner, trisomy_21  # each registers the JSON files of its references
+from .reference_table import REFERENCE_ARTIFACT_FILE, write_reference_artifact
+
+if __name__ == "__main__":
+    file_path = sys.argv[1] if len(sys.argv) > 1 else REFERENCE_ARTIFACT_FILE
+    header = write_reference_artifact(file_path)
+    print(f"wrote {len(header['tables'])} tables of {len(header['sources'])} references "
+          f"to {file_path} ({os.path.getsize(file_path) / 1e6:.2f} MB)")
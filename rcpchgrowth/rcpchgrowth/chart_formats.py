@@ -0,0 +1,117 @@
+"""
+Compact columnar encoding of the charts made by create_uk_who_chart, create_trisomy_21_chart and create_turner_chart.
+
+A chart lists each point of each centile line as its own {"l": centile, "x": age, "y": measurement} object. In the
+columnar encoding, the lines of each reference, sex and measurement_method (which all share the same ages) become
+one object: the ages once, and the measurements of each line as an array in the same order.
+
+    {
+        "sds": [-2.67, ...],            one for each line
+        "centile": [0.4, ...],
+        "x": [-0.3258, ...],            the ages, shared by every line
+        "y": [[42.281, ...], ...]       the measurements of each line, at each age: null where there is no data
+    }
+
+With fixed_point_delta, every age and measurement is scaled by COLUMNAR_FIXED_POINT_SCALE to an integer (they are
+rounded to 4 decimal places, so this is exact), and each array gives the first value and then the difference from
+the one before: a running sum decodes it. A null measurement stays null and is skipped by the running sum.
+Such cells also carry "scale".
+"""
+from .constants.parameter_constants import COLUMNAR_FIXED_POINT_SCALE
+
+
+def columnar_chart(chart, fixed_point_delta: bool = False):
+    """
+    Encodes a chart, or any list of its segments ({reference: {sex: {measurement_method: [lines]}}}), in the
+    columnar encoding. The structure above the lines is kept, so each segment, sex and measurement_method is
+    found where it was.
+    Raises a ValueError if the lines of a measurement_method do not share their ages.
+    """
+    if isinstance(chart, list):
+        return [columnar_chart(segment, fixed_point_delta) for segment in chart]
+    return {
+        reference: {
+            sex: {
+                measurement_method: columnar_lines(lines, fixed_point_delta)
+                for measurement_method, lines in measurement_methods.items()}
+            for sex, measurement_methods in sexes.items()}
+        for reference, sexes in chart.items()}
+
+
+def columnar_lines(lines: list, fixed_point_delta: bool = False) -> dict:
+    """
+    Encodes the lines of one reference, sex and measurement_method (see columnar_chart)
+    """
+    ages = [point["x"] for point in lines[0]["data"]] if lines else []
+    measurements = []
+    for line in lines:
+        if len(line["data"]) != len(ages) or any(point["x"] != age for point, age in zip(line["data"], ages)):
+            raise ValueError(f"The {line['centile']} centile line does not share the ages of the other lines.")
+        measurements.append([point["y"] for point in line["data"]])
+
+    cell = {"sds": [line["sds"] for line in lines], "centile": [line["centile"] for line in lines]}
+    if not fixed_point_delta:
+        cell.update(x=ages, y=measurements)
+        return cell
+    cell.update(
+        scale=COLUMNAR_FIXED_POINT_SCALE,
+        x=delta_encode(ages, COLUMNAR_FIXED_POINT_SCALE),
+        y=[delta_encode(line_measurements, COLUMNAR_FIXED_POINT_SCALE) for line_measurements in measurements])
+    return cell
+
+
+def delta_encode(values: list, scale: int) -> list:
+    """
+    Scales each value to an integer and returns the first, then the difference of each from the last which was
+    not None. None values are kept as they are.
+    """
+    encoded = []
+    previous = 0
+    for value in values:
+        if value is None:
+            encoded.append(None)
+            continue
+        fixed_point = round(value * scale)
+        encoded.append(fixed_point - previous)
+        previous = fixed_point
+    return encoded
+
+
+def delta_decode(encoded: list, scale: int) -> list:
+    """
+    The inverse of delta_encode
+    """
+    values = []
+    fixed_point = 0
+    for difference in encoded:
+        if difference is None:
+            values.append(None)
+            continue
+        fixed_point += difference
+        values.append(fixed_point / scale)
+    return values
+
+
+def legacy_chart(columnar):
+    """
+    Decodes a columnar chart (see columnar_chart) back to the chart it was encoded from
+    """
+    if isinstance(columnar, list):
+        return [legacy_chart(segment) for segment in columnar]
+    return {
+        reference: {
+            sex: {
+                measurement_method: legacy_lines(cell)
+                for measurement_method, cell in measurement_methods.items()}
+            for sex, measurement_methods in sexes.items()}
+        for reference, sexes in columnar.items()}
+
+
+def legacy_lines(cell: dict) -> list:
+    ages, measurements = cell["x"], cell["y"]
+    if "scale" in cell:
+        ages = delta_decode(ages, cell["scale"])
+        measurements = [delta_decode(line_measurements, cell["scale"]) for line_measurements in measurements]
+    return [
+        {"sds": sds, "centile": centile, "data": [{"l": centile, "x": age, "y": measurement} for age, measurement in zip(ages, line_measurements)]}
+        for sds, centile, line_measurements in zip(cell["sds"], cell["centile"], measurements)]
@@ -9,6 +9,7 @@ SEXES = ["male", "female"]
 MEASUREMENT_METHODS = ["height", "weight", "ofc", "bmi"]
 
 UK90_PRETERM = "uk90_preterm"
+UK90_TERM = "uk90_term"
 UK_WHO_INFANT = "uk_who_infant"
 UK_WHO_CHILD = "uk_who_child"
 UK90_CHILD = "uk90_child"
@@ -20,3 +21,15 @@ COLE_TWO_THIRDS_SDS_NINE_CENTILES = 'cole_two_thirds_sds_nine_centiles'
 THREE_PERCENT_CENTILE_COLLECTION = [3.0, 5.0, 10.0, 25.0, 50.0, 75.0, 90.0, 95.0, 97.0]
 COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION = [0.4, 2.0, 9.0, 25.0, 50.0, 75.0, 91, 98.0, 99.6]
 
+# custom collections of chart lines are given either as centiles or as SDS
+CUSTOM_CENTILES = 'centiles'
+CUSTOM_SDS = 'sds'
+MAXIMUM_CUSTOM_CHART_LINES = 25
+# custom chart lines lie within this many SDS of the median: beyond it the LMS curves are neither clinically meaningful nor always defined
+MAXIMUM_CUSTOM_CHART_SDS = 4
+
+# how closely adaptively sampled centile lines follow the curve, in the units of each measurement_method (cm, kg, kg/m²)
+ADAPTIVE_SAMPLING_TOLERANCES = {"height": 0.05, "weight": 0.01, "ofc": 0.05, "bmi": 0.01}
+
+# chart ages and measurements are rounded to 4 decimal places, so are exact as integers at this scale
+COLUMNAR_FIXED_POINT_SCALE = 10000
@@ -2,6 +2,7 @@ from datetime import date, datetime
 from datetime import timedelta
 from dateutil import relativedelta
 import math
+import numpy as np
 from .constants import TERM_PREGNANCY_LENGTH_DAYS, TERM_LOWER_THRESHOLD_LENGTH_DAYS, EXTREME_PREMATURITY_THRESHOLD_LENGTH_DAYS
 
 """
@@ -78,6 +79,27 @@ def corrected_decimal_age(birth_date: date, observation_date: date, gestation_we
         return uncorrected_age
 
 
+def decimal_ages(birth_dates: list, observation_dates: list, gestation_weeks: list, gestation_days: list) -> tuple:
+    """
+    Vectorised chronological_decimal_age and corrected_decimal_age, for lists of dates and gestations.
+    Returns two float arrays: the chronological and the corrected decimal ages, each exactly as the functions
+    give it for the same dates and gestation.
+    """
+    days_of_life = np.array([(observation_date - birth_date).days for birth_date, observation_date in zip(birth_dates, observation_dates)], dtype=np.float64)
+    gestation_weeks = np.asarray(gestation_weeks, dtype=np.float64)
+    gestation_days = np.asarray(gestation_days, dtype=np.float64)
+
+    chronological_ages = days_of_life / 365.25
+    pregnancy_length_days = np.where(
+        (gestation_weeks > 0) & (gestation_weeks < 37), (gestation_weeks * 7) + gestation_days, TERM_PREGNANCY_LENGTH_DAYS)
+    # the age from the estimated date of delivery
+    corrected_ages = (days_of_life - (TERM_PREGNANCY_LENGTH_DAYS - pregnancy_length_days)) / 365.25
+    corrected = (
+        ((pregnancy_length_days < EXTREME_PREMATURITY_THRESHOLD_LENGTH_DAYS) & (corrected_ages <= 2)) |
+        ((pregnancy_length_days < TERM_LOWER_THRESHOLD_LENGTH_DAYS) & (corrected_ages <= 1)))
+    return chronological_ages, np.where(corrected, corrected_ages, chronological_ages)
+
+
 def chronological_calendar_age(birth_date: date, observation_date: date) -> str:
     """
     returns age in years, months, weeks and days: to return a corrected calendar age use passes EDD instead of birth date
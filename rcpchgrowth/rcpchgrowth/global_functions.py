@@ -1,11 +1,16 @@
 import math
+from bisect import bisect_left
+import numpy as np
 import scipy.stats as stats
-from scipy.interpolate import interp1d
+from scipy import special
 # from scipy import interpolate  #see below, comment back in if swapping interpolation method
 # from scipy.interpolate import CubicSpline #see below, comment back in if swapping interpolation method
-from .uk_who import uk_who_lms_array_for_measurement_and_sex, select_reference_data_for_uk_who_chart
-from .turner import turner_lms_array_for_measurement_and_sex, select_reference_data_for_turners
-from .trisomy_21 import trisomy_21_lms_array_for_measurement_and_sex, select_reference_data_for_trisomy_21
+from .uk_who import select_reference_data_for_uk_who_chart
+from .turner import select_reference_data_for_turners
+from .trisomy_21 import select_reference_data_for_trisomy_21
+from .growth_reference import growth_reference
+from .reference_table import ReferenceTable
+from .lms_lattice import lattice_lms
 from .constants.parameter_constants import *
 import logging
 import json
@@ -15,6 +20,8 @@ def cubic_interpolation(age: float, age_one_below: float, age_two_below: float,
     """
     See sds function. This method tests if the age of the child (either corrected for prematurity or chronological) is at a threshold of the reference data
     This method is specific to the UK-WHO data set.
+    fetch_lms no longer calls this for every lookup: the same polynomial is precomputed for every interval of a
+    reference when it loads (see reference_table.cubic_coefficients). It is kept as the reference implementation.
     """
 
     cubic_interpolated_value = 0.0
@@ -69,37 +76,63 @@ def cubic_interpolation(age: float, age_one_below: float, age_two_below: float,
 def linear_interpolation(age: float, age_one_below: float, age_one_above: float, parameter_one_below: float, parameter_one_above: float) -> float:
     """
     See sds function. This method is to do linear interpolation of L, M and S values for children whose ages are at the threshold of the reference data, making cubic interpolation impossible
+    This is the closed form of the scipy interp1d linear interpolation previously used here, without building
+    an interpolator for every value. As with interp1d, ages outside the two reference ages raise a ValueError.
     """
 
-    linear_interpolated_value = 0.0
+    if age < age_one_below or age > age_one_above:
+        raise ValueError(
+            f"The age {age} is outside the interpolation range {age_one_below} to {age_one_above}.")
+    if age == age_one_above:
+        return parameter_one_above
+    return _linear_interpolation(age=age, age_one_below=age_one_below, age_one_above=age_one_above,
+                                 parameter_one_below=parameter_one_below, parameter_one_above=parameter_one_above)
 
-    # linear_interpolated_value = parameter_one_above + (((decimal_age - age_below)*parameter_one_above-parameter_one_below))/(age_above-age_below)
-    x_array = [age_one_below, age_one_above]
-    y_array = [parameter_one_below, parameter_one_above]
-    intermediate = interp1d(x_array, y_array)
-    linear_interpolated_value = intermediate(age)
-    return linear_interpolated_value
+
+def _linear_interpolation(age, age_one_below, age_one_above, parameter_one_below, parameter_one_above):
+    # the arithmetic of numpy.interp (which interp1d uses), shared by the scalar and vectorised lookups.
+    # Accepts python floats or numpy arrays.
+    slope = (parameter_one_above - parameter_one_below) / (age_one_above - age_one_below)
+    return slope * (age - age_one_below) + parameter_one_below
 
 
 def z_score(l: float, m: float, s: float, observation: float):
     """
     Converts the (age-specific) L, M and S parameters into a z-score
     """
-    sds = 0.0
     if l != 0.0:
-        sds = (((math.pow((observation / m), l)) - 1) / (l * s))
+        sds = _power_z_score(l=l, m=m, s=s, observation=observation)
     else:
-        sds = (math.log(observation / m) / s)
-    return sds
+        sds = _log_z_score(m=m, s=s, observation=observation)
+    return float(sds)
+
+
+def z_score_array(l: np.ndarray, m: np.ndarray, s: np.ndarray, observation: np.ndarray) -> np.ndarray:
+    """
+    Vectorised z_score: converts arrays of (age-specific) L, M and S parameters and observations
+    into z-scores, elementwise. Where L is 0 the log form of the LMS transform is used.
+    Values outside the domain of the transform return NaN.
+    """
+    l = np.asarray(l, dtype=np.float64)
+    observation = np.asarray(observation, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(l != 0.0, _power_z_score(l=l, m=m, s=s, observation=observation), _log_z_score(m=m, s=s, observation=observation))
 
 
 def centile(z_score: float):
     """
     Converts a Z Score to a p value (2-tailed) using the SciPy library, which it returns as a percentage
     """
+    return float(centile_array(float(z_score)))
 
-    centile = (stats.norm.cdf(z_score) * 100)
-    return centile
+
+def centile_array(z_score: np.ndarray) -> np.ndarray:
+    """
+    Vectorised centile: converts an array of Z Scores to centiles.
+    Calls the normal distribution function scipy.stats.norm.cdf uses internally directly,
+    avoiding the per-call overhead of the scipy.stats machinery.
+    """
+    return special.ndtr(np.asarray(z_score, dtype=np.float64)) * 100
 
 
 def measurement_for_z(z: float, l: float, m: float, s: float) -> float:
@@ -107,78 +140,109 @@ def measurement_for_z(z: float, l: float, m: float, s: float) -> float:
     Returns a measurement for a z score, L, M and S
     """
     if l != 0.0:
-        measurement_value = math.pow((1 + l * s * z), 1 / l) * m
+        measurement_value = _power_measurement_for_z(z=z, l=l, m=m, s=s)
     else:
-        measurement_value = math.exp(s * z) * m
-    return measurement_value
+        measurement_value = _log_measurement_for_z(z=z, m=m, s=s)
+    return float(measurement_value)
+
+
+def measurement_for_z_array(z: np.ndarray, l: np.ndarray, m: np.ndarray, s: np.ndarray) -> np.ndarray:
+    """
+    Vectorised measurement_for_z: returns measurements for arrays of z scores, L, M and S, elementwise.
+    Where L is 0 the log form of the LMS transform is used.
+    Values outside the domain of the transform return NaN.
+    """
+    l = np.asarray(l, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(l != 0.0, _power_measurement_for_z(z=z, l=l, m=m, s=s), _log_measurement_for_z(z=z, m=m, s=s))
+
+
+"""
+The LMS transform kernels shared by the scalar and vectorised functions above, so that both give identical results.
+They accept python floats or numpy arrays.
+"""
+
+
+def _power_z_score(l, m, s, observation):
+    return (np.power(observation / m, l) - 1) / (l * s)
+
+
+def _log_z_score(m, s, observation):
+    return np.log(observation / m) / s
+
+
+def _power_measurement_for_z(z, l, m, s):
+    return np.power(1 + l * s * z, 1 / l) * m
+
+
+def _log_measurement_for_z(z, m, s):
+    return np.exp(s * z) * m
 
 
 def nearest_lowest_index(
-    lms_array: list,
+    ages: np.ndarray,
     age: float
-) -> int:
+) -> (int, bool):
     """
-    loops through the array of LMS values and returns either 
-    the index of an exact match or the lowest nearest decimal age
+    Binary searches the (ascending) reference ages and returns either
+    the index of an exact match or the lowest nearest decimal age, and
+    a flag which is True if the match is exact.
+    Ages are compared rounded to 16 decimal places.
     """
-    lowest_index = 0
-    for num, lms_element in enumerate(lms_array):
-        reference_age = lms_element["decimal_age"]
-        if round(reference_age, 16) == round(age, 16):
-            lowest_index = num
-            break
-        else:
-            if lms_element["decimal_age"] < age:
-                lowest_index = num
-    return lowest_index
+    insertion_index = bisect_left(ages, age)
+    # the ages either side of the insertion point are the only candidates for an exact match
+    rounded_age = round(age, 16)
+    for candidate_index in (insertion_index - 1, insertion_index):
+        if 0 <= candidate_index < len(ages) and round(float(ages[candidate_index]), 16) == rounded_age:
+            return candidate_index, True
+    return max(insertion_index - 1, 0), False
 
 
-def fetch_lms(age: float, lms_value_array_for_measurement: list):
+def fetch_lms(age: float, reference_table: ReferenceTable):
     """
     Retuns the LMS for a given age. If there is no exact match in the reference
     an interpolated LMS is returned. Cubic interpolation is used except at the fringes of the 
     reference where linear interpolation is used.
-    It accepts the age and a python list of the LMS values for that measurement_method and sex.
+    It accepts the age and the ReferenceTable of LMS values for that measurement_method and sex.
     """
-    age_matched_index = nearest_lowest_index(
-        lms_value_array_for_measurement, age)  # returns nearest LMS for age
-    if round(lms_value_array_for_measurement[age_matched_index]["decimal_age"], 16) == round(age, 16):
+    ages = reference_table.ages
+    l_values = reference_table.l
+    m_values = reference_table.m
+    s_values = reference_table.s
+
+    age_matched_index, exact_match = nearest_lowest_index(
+        ages, age)  # returns nearest LMS for age
+    if exact_match:
         # there is an exact match in the data with the requested age
-        l = lms_value_array_for_measurement[age_matched_index]["L"]
-        m = lms_value_array_for_measurement[age_matched_index]["M"]
-        s = lms_value_array_for_measurement[age_matched_index]["S"]
+        l = float(l_values[age_matched_index])
+        m = float(m_values[age_matched_index])
+        s = float(s_values[age_matched_index])
     else:
         # there has not been an exact match in the reference data
         # Interpolation will be required.
         # The age_matched_index is one below the age supplied. There
         # needs to be a value below that, and two values above the supplied age,
         # for cubic interpolation to be possible.
-        age_one_below = lms_value_array_for_measurement[age_matched_index]["decimal_age"]
-        age_one_above = lms_value_array_for_measurement[age_matched_index + 1]["decimal_age"]
-        parameter_one_below = lms_value_array_for_measurement[age_matched_index]
-        parameter_one_above = lms_value_array_for_measurement[age_matched_index + 1]
-
-        if age_matched_index >= 1 and age_matched_index < len(lms_value_array_for_measurement) - 2:
-            # cubic interpolation is possible
-            age_two_below = lms_value_array_for_measurement[age_matched_index - 1]["decimal_age"]
-            age_two_above = lms_value_array_for_measurement[age_matched_index + 2]["decimal_age"]
-            parameter_two_below = lms_value_array_for_measurement[age_matched_index - 1]
-            parameter_two_above = lms_value_array_for_measurement[age_matched_index + 2]
-            
-            l = cubic_interpolation(age=age, age_one_below=age_one_below, age_two_below=age_two_below, age_one_above=age_one_above, age_two_above=age_two_above,
-                                    parameter_two_below=parameter_two_below["L"], parameter_one_below=parameter_one_below["L"], parameter_one_above=parameter_one_above["L"], parameter_two_above=parameter_two_above["L"])
-            m = cubic_interpolation(age=age, age_one_below=age_one_below, age_two_below=age_two_below, age_one_above=age_one_above, age_two_above=age_two_above,
-                                    parameter_two_below=parameter_two_below["M"], parameter_one_below=parameter_one_below["M"], parameter_one_above=parameter_one_above["M"], parameter_two_above=parameter_two_above["M"])
-            s = cubic_interpolation(age=age, age_one_below=age_one_below, age_two_below=age_two_below, age_one_above=age_one_above, age_two_above=age_two_above,
-                                    parameter_two_below=parameter_two_below["S"], parameter_one_below=parameter_one_below["S"], parameter_one_above=parameter_one_above["S"], parameter_two_above=parameter_two_above["S"])
+        one_below = age_matched_index
+        one_above = age_matched_index + 1
+        age_one_below = float(ages[one_below])
+        age_one_above = float(ages[one_above])
+
+        if age_matched_index >= 1 and age_matched_index < len(ages) - 2:
+            # cubic interpolation is possible: the cubic through the two reference ages either side
+            # has been precomputed for this interval, so only needs evaluating
+            u = age - age_one_below
+            l, m, s = (c0 + u * (c1 + u * (c2 + u * c3))
+                       for c0, c1, c2, c3 in reference_table.cubic_coefficients[age_matched_index].tolist())
         else:
             # we are at the thresholds of this reference. Only linear interpolation is possible
             l = linear_interpolation(age=age, age_one_below=age_one_below, age_one_above=age_one_above,
-                                     parameter_one_below=parameter_one_below["L"], parameter_one_above=parameter_one_above["L"])
+                                     parameter_one_below=float(l_values[one_below]), parameter_one_above=float(l_values[one_above]))
             m = linear_interpolation(age=age, age_one_below=age_one_below, age_one_above=age_one_above,
-                                     parameter_one_below=parameter_one_below["M"], parameter_one_above=parameter_one_above["M"])
+                                     parameter_one_below=float(m_values[one_below]), parameter_one_above=float(m_values[one_above]))
             s = linear_interpolation(age=age, age_one_below=age_one_below, age_one_above=age_one_above,
-                                     parameter_one_below=parameter_one_below["S"], parameter_one_above=parameter_one_above["S"])
+                                     parameter_one_below=float(s_values[one_below]), parameter_one_above=float(s_values[one_above]))
 
     return {
         "l": l,
@@ -187,6 +251,77 @@ def fetch_lms(age: float, lms_value_array_for_measurement: list):
     }
 
 
+def fetch_lms_batch(ages: np.ndarray, reference_table: ReferenceTable) -> dict:
+    """
+    Vectorised fetch_lms. Returns the LMS for an array of ages as arrays, in a single pass over the ages.
+    As in fetch_lms, exact matches return the reference values, otherwise cubic interpolation is used
+    except at the fringes of the reference where linear interpolation is used.
+    Ages outside the range of the reference return NaN.
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    reference_ages = reference_table.ages
+    # L, M and S as rows, so that all three are interpolated together
+    parameters = np.stack((reference_table.l, reference_table.m, reference_table.s))
+    number_of_reference_ages = len(reference_ages)
+
+    lms = np.full((3, len(ages)), np.nan)
+
+    insertion_index = np.searchsorted(reference_ages, ages, side="left")
+    exact_index = _exact_match_indices(reference_ages, ages, insertion_index)
+    exact = exact_index >= 0
+    lms[:, exact] = parameters[:, exact_index[exact]]
+
+    # every other age within the reference lies between one_below and one_above
+    one_below = insertion_index - 1
+    within_reference = ~exact & (one_below >= 0) & (insertion_index < number_of_reference_ages)
+    cubic = within_reference & (one_below >= 1) & (one_below < number_of_reference_ages - 2)
+    linear = within_reference & ~cubic
+
+    if cubic.any():
+        # Horner evaluation of the precomputed cubic for each interval
+        index = one_below[cubic]
+        coefficients = reference_table.cubic_coefficients[index].transpose(2, 1, 0)
+        u = ages[cubic] - reference_ages[index]
+        lms[:, cubic] = coefficients[0] + u * (coefficients[1] + u * (coefficients[2] + u * coefficients[3]))
+
+    if linear.any():
+        index = one_below[linear]
+        lms[:, linear] = _linear_interpolation(
+            age=ages[linear],
+            age_one_below=reference_ages[index],
+            age_one_above=reference_ages[index + 1],
+            parameter_one_below=parameters[:, index],
+            parameter_one_above=parameters[:, index + 1])
+
+    return {
+        "l": lms[0],
+        "m": lms[1],
+        "s": lms[2]
+    }
+
+
+def _exact_match_indices(reference_ages: np.ndarray, ages: np.ndarray, insertion_index: np.ndarray) -> np.ndarray:
+    """
+    Returns, for each age, the index of the reference age it matches when both are rounded
+    to 16 decimal places (as in nearest_lowest_index), or -1 if there is no match.
+    """
+    exact_index = np.full(len(ages), -1)
+    if len(reference_ages) == 0:
+        return exact_index
+    last_index = len(reference_ages) - 1
+    # the lower candidate is checked last so that it takes precedence, as in nearest_lowest_index
+    for candidate_index in (insertion_index, insertion_index - 1):
+        in_range = (candidate_index >= 0) & (candidate_index <= last_index)
+        candidate_index = np.clip(candidate_index, 0, last_index)
+        # ages which round to the same 16 decimal places are always within 1e-15 of each other:
+        # only those few are confirmed with python's round
+        near = in_range & (np.abs(reference_ages[candidate_index] - ages) <= 1e-15)
+        for position in np.flatnonzero(near):
+            if round(float(reference_ages[candidate_index[position]]), 16) == round(float(ages[position]), 16):
+                exact_index[position] = candidate_index[position]
+    return exact_index
+
+
 def measurement_from_sds(
     reference: str,
     requested_sds: float,
@@ -196,16 +331,19 @@ def measurement_from_sds(
     born_preterm: bool = False
 ) -> float:
 
-    try:
-        lms_value_array_for_measurement = lms_value_array_for_measurement_for_reference(
-            reference=reference, age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
-    except LookupError as err:
-        print(err)
-        return None
+    # ages on a whole day are looked up in the LMS lattice, if it has been built
+    lms = lattice_lms(reference=reference, age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+    if lms is None:
+        try:
+            lms_reference_table = lms_value_array_for_measurement_for_reference(
+                reference=reference, age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+        except LookupError as err:
+            print(err)
+            return None
 
-    # get LMS values from the reference: check for age match, interpolate if none
-    lms = fetch_lms(
-        age=age, lms_value_array_for_measurement=lms_value_array_for_measurement)
+        # get LMS values from the reference: check for age match, interpolate if none
+        lms = fetch_lms(
+            age=age, reference_table=lms_reference_table)
     l = lms["l"]
     m = lms["m"]
     s = lms["s"]
@@ -223,16 +361,19 @@ def sds_for_measurement(
     born_preterm: bool = False
 ) -> float:
 
-    try:
-        lms_value_array_for_measurement = lms_value_array_for_measurement_for_reference(
-            reference=reference, age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
-    except LookupError as err:
-        print(err)
-        return None
+    # ages on a whole day are looked up in the LMS lattice, if it has been built
+    lms = lattice_lms(reference=reference, age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+    if lms is None:
+        try:
+            lms_reference_table = lms_value_array_for_measurement_for_reference(
+                reference=reference, age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+        except LookupError as err:
+            print(err)
+            return None
 
-    # get LMS values from the reference: check for age match, interpolate if none
-    lms = fetch_lms(
-        age=age, lms_value_array_for_measurement=lms_value_array_for_measurement)
+        # get LMS values from the reference: check for age match, interpolate if none
+        lms = fetch_lms(
+            age=age, reference_table=lms_reference_table)
     l = lms["l"]
     m = lms["m"]
     s = lms["s"]
@@ -240,6 +381,26 @@ def sds_for_measurement(
     return z_score(l=l, m=m, s=s, observation=observation_value)
 
 
+def sds_for_measurements(
+    reference: str,
+    ages: np.ndarray,
+    measurement_method: str,
+    observation_values: np.ndarray,
+    sex: str,
+    born_preterm: bool = False
+) -> np.ndarray:
+    """
+    Vectorised sds_for_measurement, for arrays of ages and observation_values of the same measurement_method and
+    sex. The SDS is NaN for ages with no reference data, where sds_for_measurement returns None or raises a
+    ValueError. As lms_for_ages does, raises an IndexError for an age beyond the end of its table.
+    """
+    lms = lms_for_ages(reference=reference, ages=ages, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+    sds = np.full(len(lms["found"]), np.nan)
+    found = lms["found"]
+    sds[found] = z_score_array(l=lms["l"][found], m=lms["m"][found], s=lms["s"][found], observation=np.asarray(observation_values, dtype=np.float64)[found])
+    return sds
+
+
 def percentage_median_bmi(reference: str, age: float, actual_bmi: float, sex: str, born_preterm=False) -> float:
     """
     public method
@@ -248,21 +409,24 @@ def percentage_median_bmi(reference: str, age: float, actual_bmi: float, sex: st
     It accepts the reference ('uk-who', 'turners-syndrome' or 'trisomy-21')
     """
 
-    # fetch the LMS values for the requested measurement
-    try:
-        lms_value_array_for_measurement = lms_value_array_for_measurement_for_reference(
-            reference=reference, measurement_method="bmi", sex=sex, age=age, born_preterm=born_preterm)
-    except LookupError as err:
-        print(err)
-        return None
+    # ages on a whole day are looked up in the LMS lattice, if it has been built
+    lms = lattice_lms(reference=reference, age=age, measurement_method="bmi", sex=sex, born_preterm=born_preterm)
+    if lms is None:
+        # fetch the LMS values for the requested measurement
+        try:
+            lms_reference_table = lms_value_array_for_measurement_for_reference(
+                reference=reference, measurement_method="bmi", sex=sex, age=age, born_preterm=born_preterm)
+        except LookupError as err:
+            print(err)
+            return None
 
-    # get LMS values from the reference: check for age match, interpolate if none
-    try:
-        lms = fetch_lms(
-            age=age, lms_value_array_for_measurement=lms_value_array_for_measurement)
-    except LookupError as err:
-        print(err)
-        return None
+        # get LMS values from the reference: check for age match, interpolate if none
+        try:
+            lms = fetch_lms(
+                age=age, reference_table=lms_reference_table)
+        except LookupError as err:
+            print(err)
+            return None
 
     m = lms["m"]  # this is the median BMI
 
@@ -276,57 +440,66 @@ def lms_value_array_for_measurement_for_reference(
     measurement_method: str,
     sex: str,
     born_preterm: bool
-) -> list:
+) -> ReferenceTable:
     """
-    This is a private function which returns the LMS array for measurement_method and sex and reference
-    It accepts the reference ('uk-who', 'turners-syndrome' or 'trisomy-21')
+    This is a private function which returns the ReferenceTable of LMS values for measurement_method and sex and reference
+    It accepts the name of any registered reference ('uk-who', 'turners-syndrome' or 'trisomy-21': see growth_reference)
     """
 
-    if reference == "uk-who":
-        lms_value_array_for_measurement = uk_who_lms_array_for_measurement_and_sex(
-            age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
-    elif reference == "turners-syndrome":
-        lms_value_array_for_measurement = turner_lms_array_for_measurement_and_sex(
-            measurement_method=measurement_method, sex=sex, age=age)
-    elif reference == "trisomy-21":
-        lms_value_array_for_measurement = trisomy_21_lms_array_for_measurement_and_sex(
-            measurement_method=measurement_method, sex=sex, age=age)
-    else:
-        raise ValueError("Incorrect reference supplied")
-    return lms_value_array_for_measurement
+    return growth_reference(reference).lms_reference_table(
+        age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
 
 
-def generate_centile(z: float, centile: float, measurement_method: str, sex: str, lms_array_for_measurement: list, reference: str) -> list:
+def lms_for_ages(reference: str, ages: np.ndarray, measurement_method: str, sex: str, born_preterm: bool = False) -> dict:
     """
-    Generates a centile curve for a given reference. 
-    Takes the z-score equivalent of the centile, the centile to be used as a label, the sex and measurement method.
+    Vectorised lookup of the LMS measurement_from_sds uses, for an array of ages: each age is looked up in
+    the table the reference selects for it. Returns the arrays "l", "m" and "s", and "found", which is False
+    for ages where measurement_from_sds returns None or raises a ValueError (no reference data for that age).
+    As fetch_lms does, raises an IndexError for an age beyond the end of its table.
     """
-
-    min_age = lms_array_for_measurement[0]["decimal_age"]
-    max_age = lms_array_for_measurement[-1]["decimal_age"]
-
-    centile_measurements = []
+    ages = np.asarray(ages, dtype=np.float64)
+    lms = {
+        "l": np.full(len(ages), np.nan),
+        "m": np.full(len(ages), np.nan),
+        "s": np.full(len(ages), np.nan),
+        "found": np.zeros(len(ages), dtype=bool)
+    }
+    try:
+        tables, codes = growth_reference(reference).lms_reference_tables(
+            ages=ages, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+    except ValueError:
+        # an unknown reference
+        return lms
+
+    for code, table in enumerate(tables):
+        selected = np.flatnonzero(codes == code)
+        if len(selected) == 0:
+            continue
+        if len(table) == 0:
+            raise IndexError(f"There is no {measurement_method} reference data for {sex}s in {table.reference}.")
+        table_ages = ages[selected]
+        exact = _exact_match_indices(
+            table.ages, table_ages, np.searchsorted(table.ages, table_ages, side="left")) >= 0
+        if ((table_ages > table.ages[-1]) & ~exact).any():
+            raise IndexError(f"An age is beyond the end of the {table.reference} reference.")
+        # below the start of its table, fetch_lms raises a ValueError
+        within = selected[(table_ages >= table.ages[0]) | exact]
+        table_lms = fetch_lms_batch(ages[within], table)
+        for parameter in ("l", "m", "s"):
+            lms[parameter][within] = table_lms[parameter]
+        lms["found"][within] = True
+    return lms
+
+
+def centile_ages(min_age: float, max_age: float) -> list:
+    """
+    The ages at which centile curves are plotted from min_age to max_age:
+    weekly intervals until 2 y, then monthly
+    """
+    ages = []
     age = min_age
     while age <= max_age:
-        # loop through the reference in steps of 0.1y
-        try:
-            measurement = measurement_from_sds(
-                reference=reference, measurement_method=measurement_method, requested_sds=z, sex=sex, age=age, born_preterm=True)
-        except ValueError as err:
-            print(err)
-            measurement = None
-        # creates a data point
-        if measurement is not None:
-            rounded = round(measurement, 4)
-        else:
-            rounded = None
-        value = {
-            "l": centile,
-            "x": round(age,4),
-            "y": rounded
-        }
-        centile_measurements.append(value)
-
+        ages.append(age)
         ## weekly intervals until 2 y, then monthly 
         if age <=2:
             age += (7/365.25) # weekly intervals
@@ -337,33 +510,326 @@ def generate_centile(z: float, centile: float, measurement_method: str, sex: str
         # even after minifying, which are not practical. Weekly values makes plotting easier.
         # Here we have used weekly points from preterm to 2 y, monthly values after.    
         # age += (7/365.25) # weekly intervals
-    return centile_measurements
+    return ages
+
+
+def generate_centile(z: float, centile: float, measurement_method: str, sex: str, reference_table: ReferenceTable, reference: str) -> list:
+    """
+    Generates a centile curve for a given reference. 
+    Takes the z-score equivalent of the centile, the centile to be used as a label, the sex and measurement method.
+    See generate_centiles, which generates several centiles of the same reference together.
+    """
+    return generate_centiles(zs=[z], centiles=[centile], measurement_method=measurement_method, sex=sex, reference_table=reference_table, reference=reference)[0]
+
+
+def generate_centiles(zs: list, centiles: list, measurement_method: str, sex: str, reference_table: ReferenceTable, reference: str, tolerance: float = None) -> list:
+    """
+    Generates a centile curve for each z-score in zs (labelled with the matching centile in centiles) for a given reference.
+    The curves are calculated in one pass over their ages: the LMS of every age are looked up once, for all the
+    curves, and the measurements for every z-score calculated together. Each point is as measurement_from_sds gives it.
+    If a tolerance is given, the curves are sampled adaptively instead (see generate_adaptive_centiles).
+    Returns a list of curves, in the order of zs.
+    """
+
+    if tolerance is not None:
+        return generate_adaptive_centiles(zs=zs, centiles=centiles, measurement_method=measurement_method, sex=sex, reference_table=reference_table, reference=reference, tolerance=tolerance)[0]
+
+    if len(reference_table) == 0:
+        # there is no reference data for this measurement_method and sex
+        return [[] for z in zs]
+
+    ages = centile_ages(min_age=float(reference_table.ages[0]), max_age=float(reference_table.ages[-1]))
+    lms = lms_for_ages(reference=reference, ages=ages, measurement_method=measurement_method, sex=sex, born_preterm=True)
+    # one row of measurements for each z-score
+    measurements = measurement_for_z_array(z=np.asarray(zs, dtype=np.float64)[:, np.newaxis], l=lms["l"], m=lms["m"], s=lms["s"])
+
+    return centile_points(centiles=centiles, ages=ages, measurements=measurements, found=lms["found"])
+
+
+def centile_points(centiles: list, ages: list, measurements: np.ndarray, found: np.ndarray) -> list:
+    """
+    Returns the data points of each centile curve: one row of measurements per centile, at each of the ages.
+    Where found is False for an age there is no reference data, and its points have no measurement. Nor do
+    points outside the domain of the LMS transform, whose measurement is not finite.
+    """
+    rounded_ages = [round(age, 4) for age in ages]
+    found = np.asarray(found).tolist()
+    curves = []
+    for centile, centile_measurements in zip(centiles, measurements.tolist()):
+        # creates the data points
+        curves.append([
+            {
+                "l": centile,
+                "x": rounded_age,
+                "y": round(measurement, 4) if age_found and math.isfinite(measurement) else None
+            }
+            for rounded_age, measurement, age_found in zip(rounded_ages, centile_measurements, found)])
+    return curves
+
+
+def generate_adaptive_centiles(zs: list, centiles: list, measurement_method: str, sex: str, reference_table: ReferenceTable, reference: str, tolerance: float) -> tuple:
+    """
+    Generates the centile curves of generate_centiles, keeping only the points needed to draw every curve within
+    tolerance (in the units of the measurement_method) of its value on every day of age.
+    The curves are calculated daily from the first age of the reference table to its last, and the daily points
+    thinned by Ramer-Douglas-Peucker on the vertical error: where the straight line between two kept points strays
+    from any of the curves by more than the tolerance, the point furthest from it is kept too. Points are dense
+    where the curves bend, as at the start of a table where it joins the one before, and sparse where they are
+    nearly straight. All the curves share the ages kept. Ages without reference data are kept at each end of the gap.
+    Returns the curves and, for each curve, a report of its points before and after sampling and the largest
+    error of the line drawn through the points kept (rounded as they are returned) from the daily curve.
+    """
+
+    if len(reference_table) == 0:
+        # there is no reference data for this measurement_method and sex
+        return [[] for z in zs], []
+
+    min_age = float(reference_table.ages[0])
+    max_age = float(reference_table.ages[-1])
+    ages = min_age + np.arange(int((max_age - min_age) * 365.25) + 1) / 365.25
+    ages = ages[ages < max_age]
+    ages = np.append(ages, max_age)
+    lms = lms_for_ages(reference=reference, ages=ages, measurement_method=measurement_method, sex=sex, born_preterm=True)
+    measurements = measurement_for_z_array(z=np.asarray(zs, dtype=np.float64)[:, np.newaxis], l=lms["l"], m=lms["m"], s=lms["s"])
+
+    # points are returned to 4 decimal places, so they are sampled to within the tolerance less that rounding
+    kept = adaptive_sample_indices(
+        ages=ages, measurements=measurements, valid=lms["found"] & np.isfinite(measurements).all(axis=0),
+        tolerance=tolerance - 0.00005)
+    kept_ages = ages[kept]
+    kept_measurements = measurements[:, kept]
+    curves = centile_points(centiles=centiles, ages=kept_ages.tolist(), measurements=kept_measurements, found=lms["found"][kept])
+
+    report = []
+    for centile, curve, centile_measurements in zip(centiles, curves, measurements):
+        drawn = np.array([point["y"] if point["y"] is not None else np.nan for point in curve], dtype=np.float64)
+        drawn_found = np.isfinite(drawn)
+        if drawn_found.any():
+            errors = np.abs(np.interp(ages, kept_ages[drawn_found], drawn[drawn_found]) - centile_measurements)
+            max_error = float(np.nanmax(errors, initial=0.0))
+        else:
+            max_error = 0.0
+        report.append({
+            "reference": reference,
+            "measurement_method": measurement_method,
+            "sex": sex,
+            "centile": centile,
+            "daily_points": len(ages),
+            "points": len(curve),
+            "reduction": 1 - len(curve) / len(ages),
+            "max_error": max_error,
+            "within_tolerance": max_error <= tolerance
+        })
+    return curves, report
+
+
+def adaptive_sample_indices(ages: np.ndarray, measurements: np.ndarray, valid: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Returns the indices of the ages to keep so that straight lines between them are within tolerance of every
+    row of measurements (one row per curve) at every valid age.
+    Each run of valid ages keeps its first and last; each run of invalid ages keeps its first and last.
+    """
+    keep = np.zeros(len(ages), dtype=bool)
+    if len(ages) == 0:
+        return np.flatnonzero(keep)
+    # the first and last age of each run of valid or invalid ages
+    changes = np.flatnonzero(valid[1:] != valid[:-1])
+    keep[changes] = True
+    keep[changes + 1] = True
+    keep[0] = keep[-1] = True
+
+    runs = []
+    starts = np.concatenate(([0], changes + 1))
+    ends = np.concatenate((changes, [len(ages) - 1]))
+    for first, last in zip(starts.tolist(), ends.tolist()):
+        if valid[first]:
+            runs.append((first, last))
+
+    while runs:
+        first, last = runs.pop()
+        if last - first < 2:
+            continue
+        fraction = (ages[first + 1:last] - ages[first]) / (ages[last] - ages[first])
+        line = measurements[:, first, np.newaxis] + (measurements[:, last] - measurements[:, first])[:, np.newaxis] * fraction
+        errors = np.abs(measurements[:, first + 1:last] - line).max(axis=0)
+        furthest = int(np.argmax(errors))
+        if errors[furthest] > tolerance:
+            split = first + 1 + furthest
+            keep[split] = True
+            runs.append((first, split))
+            runs.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def centile_zs(centile_collection: list, cole_method: bool) -> list:
+    """
+    Returns the z for each centile of a collection.
+    if the Cole 9 centiles were selected, these are rounded,
+    so conversion to SDS is different
+    Otherwise standard conversation of centile to z is used
+    """
+    if cole_method:
+        return [rounded_sds_for_centile(centile) for centile in centile_collection]
+    return [sds_for_centile(centile) for centile in centile_collection]
+
+
+def normalize_centile_collection(centiles: list = None, sds: list = None) -> tuple:
+    """
+    Normalizes a custom collection of chart lines: either centiles (percentages, between 0 and 100 exclusive) or
+    SDS, but not both. The values are sorted, rounded to 4 decimal places and duplicates dropped, so the same lines
+    asked for in any order or precision give the same collection.
+    Returns (CUSTOM_CENTILES, values) or (CUSTOM_SDS, values), values being a tuple, or None if neither was passed.
+    Raises a ValueError for an empty, overlong or out of range collection, or one with lines further than
+    MAXIMUM_CUSTOM_CHART_SDS from the median.
+    """
+    if centiles is None and sds is None:
+        return None
+    if centiles is not None and sds is not None:
+        raise ValueError("Either centiles or sds may be given for a chart, not both.")
+    kind, values = (CUSTOM_CENTILES, centiles) if centiles is not None else (CUSTOM_SDS, sds)
+    values = tuple(sorted({round(float(value), 4) for value in values}))
+    if not values:
+        raise ValueError(f"At least one of the {kind} must be given.")
+    if len(values) > MAXIMUM_CUSTOM_CHART_LINES:
+        raise ValueError(f"No more than {MAXIMUM_CUSTOM_CHART_LINES} {kind} may be given.")
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError(f"The {kind} must be finite numbers.")
+    if kind == CUSTOM_CENTILES and not (0 < values[0] and values[-1] < 100):
+        raise ValueError("Centiles must be greater than 0 and less than 100.")
+    zs = centile_zs(centile_collection=values, cole_method=False) if kind == CUSTOM_CENTILES else values
+    if max(abs(z) for z in zs) > MAXIMUM_CUSTOM_CHART_SDS:
+        raise ValueError(f"The {kind} must lie within {MAXIMUM_CUSTOM_CHART_SDS} SDS of the median.")
+    return kind, values
+
+
+def chart_collection(centile_selection: str = COLE_TWO_THIRDS_SDS_NINE_CENTILES, centiles: list = None, sds: list = None) -> tuple:
+    """
+    Returns the centile which labels each line of a chart, and the z of each.
+    The lines are those of the centile_selection, unless a custom collection of centiles or SDS is passed
+    (see normalize_centile_collection). Lines drawn at an SDS are labelled with its centile.
+    """
+    collection = normalize_centile_collection(centiles=centiles, sds=sds)
+    if collection is None:
+        ## If the Cole method is selected, conversion between centile and SDS
+        ## is different as SDS is rounded to the nearest 2/3
+        if centile_selection == COLE_TWO_THIRDS_SDS_NINE_CENTILES:
+            return COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, centile_zs(centile_collection=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, cole_method=True)
+        return THREE_PERCENT_CENTILE_COLLECTION, centile_zs(centile_collection=THREE_PERCENT_CENTILE_COLLECTION, cole_method=False)
+    kind, values = collection
+    if kind == CUSTOM_CENTILES:
+        return list(values), centile_zs(centile_collection=values, cole_method=False)
+    return [round(centile(z), 4) for z in values], list(values)
+
+
+def generate_chart_lines(chart_centiles, cells: list, zs: list, centile_collection: list, tolerances: dict = None, executor=None):
+    """
+    Returns an iterator over the centiles of each cell of a chart, in the order of cells. chart_centiles is called for
+    each cell (its reference, sex and measurement_method, as the chart function names them) with the zs, the centile
+    collection and the tolerance for the measurement_method, if any.
+    If an executor is passed, the cells are generated on it in parallel: its map returns them in the order they were
+    submitted, so the chart is the same whichever finishes first.
+    """
+    arguments = [cell + (zs, centile_collection, tolerances[cell[-1]] if tolerances else None) for cell in cells]
+    if executor is None:
+        return (chart_centiles(*cell_arguments) for cell_arguments in arguments)
+    return iter(executor.map(chart_centiles, *zip(*arguments)))
+
+
+def chart_centile_list(zs: list, centile_collection: list, centile_curves: list) -> list:
+    ## Store each centile for a given measurement
+    return [{"sds": round(z*100)/100, "centile": centile, "data": centile_data} for z, centile, centile_data in zip(zs, centile_collection, centile_curves)]
 
-def create_uk_who_chart(centile_selection: str=COLE_TWO_THIRDS_SDS_NINE_CENTILES):
+
+def uk_who_chart_centiles(reference: str, sex: str, measurement_method: str, zs: list, centile_collection: list, tolerance: float = None) -> list:
+    """
+    The centiles of the UK-WHO chart for one of its references, a sex and a measurement_method
+    """
+    ## Collect the LMS values from the correct reference
+    lms_reference_table=select_reference_data_for_uk_who_chart(uk_who_reference=reference, measurement_method=measurement_method, sex=sex)
+
+    ## Generate all the centiles together. there will be nine of these if Cole method selected.
+    ## Some data does not exist at all ages, so any error reflects missing data.
+    ## If this happens, an empty list is returned for each centile.
+    try:
+        centile_curves = generate_centiles(zs=zs, centiles=centile_collection, measurement_method=measurement_method, sex=sex, reference_table=lms_reference_table, reference="uk-who", tolerance=tolerance)
+    except:
+        print(f"There is no data for {measurement_method} at this age.")
+        centile_curves = [[] for centile in centile_collection]
+
+    return chart_centile_list(zs, centile_collection, centile_curves)
+
+
+def trisomy_21_chart_centiles(sex: str, measurement_method: str, zs: list, centile_collection: list, tolerance: float = None) -> list:
+    """
+    The centiles of the trisomy 21 chart for a sex and a measurement_method
+    """
+    ## Collect the LMS values from the correct reference
+    lms_reference_table=select_reference_data_for_trisomy_21(measurement_method=measurement_method, sex=sex)
+    ## Generate all the centiles together. there will be nine of these if Cole method selected.
+    ## Some data does not exist at all ages, so any error reflects missing data.
+    ## If this happens, an empty list is returned for each centile.
+    try:
+        centile_curves = generate_centiles(zs=zs, centiles=centile_collection, measurement_method=measurement_method, sex=sex, reference_table=lms_reference_table, reference=TRISOMY_21, tolerance=tolerance)
+    except:
+        print(f"There is no data in {TRISOMY_21} for {measurement_method} at this age.")
+        centile_curves = [[] for centile in centile_collection]
+
+    return chart_centile_list(zs, centile_collection, centile_curves)
+
+
+def turner_chart_centiles(sex: str, measurement_method: str, zs: list, centile_collection: list, tolerance: float = None) -> list:
+    """
+    The centiles of the Turner chart for a sex and a measurement_method
+    """
+    ## Collect the LMS values from the correct reference
+    try:
+        lms_reference_table=select_reference_data_for_turners(measurement_method=measurement_method, sex=sex)
+    except LookupError:
+        # there is no data in the reference
+        lms_reference_table=[]
+
+    ## Generate all the centiles together. there will be nine of these if Cole method selected.
+    ## Some data does not exist at all ages, so any error reflects missing data.
+    ## If this happens, an empty list is returned for each centile.
+    try:
+        centile_curves = generate_centiles(zs=zs, centiles=centile_collection, measurement_method=measurement_method, sex=sex, reference_table=lms_reference_table, reference=TRISOMY_21, tolerance=tolerance)
+    except:
+        print(f"There is no data for {measurement_method} at this age.")
+        centile_curves = [[] for centile in centile_collection]
+
+    return chart_centile_list(zs, centile_collection, centile_curves)
+
+
+def create_uk_who_chart(centile_selection: str=COLE_TWO_THIRDS_SDS_NINE_CENTILES, tolerances: dict=None, executor=None, centiles: list=None, sds: list=None):
 
     ## user selects which centile collection they want
     ## If the Cole method is selected, conversion between centile and SDS
     ## is different as SDS is rounded to the nearest 2/3
     ## Cole method selection is stored in the cole_method flag.
     ## If no parameter is passed, default is the Cole method
-
-    centile_collection = []
-
-    if centile_selection == COLE_TWO_THIRDS_SDS_NINE_CENTILES:
-        centile_collection = COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION
-        cole_method = True
-    else:
-        centile_collection = THREE_PERCENT_CENTILE_COLLECTION
-        cole_method = False
+    ## If tolerances are passed (such as ADAPTIVE_SAMPLING_TOLERANCES), each line is sampled adaptively,
+    ## to within the tolerance for its measurement_method, rather than weekly then monthly
+    ## If an executor is passed (such as a concurrent.futures.ProcessPoolExecutor), the lines of each
+    ## reference, sex and measurement_method are generated in parallel on it
+    ## Any list of centiles (such as [0.1, 99.9]) or of SDS (such as [-3, 3]) may be passed instead
+    ## of a centile_selection: see normalize_centile_collection
+
+    ## we must create a z for each requested centile: the same for every reference, sex and measurement
+    centile_collection, zs = chart_collection(centile_selection=centile_selection, centiles=centiles, sds=sds)
     
     ##
     # iterate through the 4 references that make up UK-WHO
     # There will be a list for each one
     ##
     
+    ## each reference, sex and measurement_method has its own lines, generated independently of the others:
+    ## in this process, or in the worker processes of an executor. They are collected in this order.
+    segments = growth_reference(UK_WHO).chart_segments
+    chart_lines = generate_chart_lines(chart_centiles=uk_who_chart_centiles, cells=[(reference, sex, measurement_method) for reference in segments for sex in SEXES for measurement_method in MEASUREMENT_METHODS], zs=zs, centile_collection=centile_collection, tolerances=tolerances, executor=executor)
+
     reference_data = [] # all data for a given reference are stored here: this is returned to the user
 
-    for reference_index, reference in enumerate(UK_WHO_REFERENCES):
+    for reference_index, reference in enumerate(segments):
         sex_list: dict = {} # all the data for a given sex are stored here
         ## For each reference we have 2 sexes
         for sex_index, sex in enumerate(SEXES):
@@ -374,35 +840,8 @@ def create_uk_who_chart(centile_selection: str=COLE_TWO_THIRDS_SDS_NINE_CENTILES
             for measurement_index, measurement_method in enumerate(MEASUREMENT_METHODS):
                 ## for every measurement method we have as many centiles
                 ## as have been requested
+                centiles = next(chart_lines)
 
-                centiles=[] # all generated centiles for a selected centile collection are stored here
-
-                for centile_index, centile in enumerate(centile_collection):
-                    ## we must create a z for each requested centile
-                    ## if the Cole 9 centiles were selected, these are rounded,
-                    ## so conversion to SDS is different
-                    ## Otherwise standard conversation of centile to z is used
-                    if cole_method:
-                        z = rounded_sds_for_centile(centile)
-                    else:
-                        z = sds_for_centile(centile)
-                    
-                    ## Collect the LMS values from the correct reference
-                    lms_array_for_measurement=select_reference_data_for_uk_who_chart(uk_who_reference=reference, measurement_method=measurement_method, sex=sex)
-                    
-                    ## Generate a centile. there will be nine of these if Cole method selected.
-                    ## Some data does not exist at all ages, so any error reflects missing data.
-                    ## If this happens, an empty list is returned.
-                    try:
-                        centile_data = generate_centile(z=z, centile=centile, measurement_method=measurement_method, sex=sex, lms_array_for_measurement=lms_array_for_measurement, reference="uk-who")
-                    except:
-                        print(f"There is no data for {measurement_method} at this age.")
-                        centile_data = []
-
-                    ## Store this centile for a given measurement
-                    centiles.append({"sds": round(z*100)/100, "centile": centile, "data": centile_data})
-                    
-                ## this is the end of the centile_collection for loop
                 ## All the centiles for this measurement, sex and reference are added to the measurements list
                 measurements.update({measurement_method: centiles})
             
@@ -459,22 +898,26 @@ def create_uk_who_chart(centile_selection: str=COLE_TWO_THIRDS_SDS_NINE_CENTILES
     }
 
     """
-def create_trisomy_21_chart(centile_selection: str):
+def create_trisomy_21_chart(centile_selection: str, tolerances: dict=None, executor=None, centiles: list=None, sds: list=None):
    ## user selects which centile collection they want
     ## If the Cole method is selected, conversion between centile and SDS
     ## is different as SDS is rounded to the nearest 2/3
     ## Cole method selection is stored in the cole_method flag.
     ## If no parameter is passed, default is the Cole method
-
-    centile_collection = [] 
-
-    if centile_selection == COLE_TWO_THIRDS_SDS_NINE_CENTILES:
-        centile_collection = COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION
-        cole_method = True
-    else:
-        centile_collection = THREE_PERCENT_CENTILE_COLLECTION
-        cole_method = False
+    ## If tolerances are passed (such as ADAPTIVE_SAMPLING_TOLERANCES), each line is sampled adaptively,
+    ## to within the tolerance for its measurement_method, rather than weekly then monthly
+    ## If an executor is passed (such as a concurrent.futures.ProcessPoolExecutor), the lines of each
+    ## reference, sex and measurement_method are generated in parallel on it
+    ## Any list of centiles (such as [0.1, 99.9]) or of SDS (such as [-3, 3]) may be passed instead
+    ## of a centile_selection: see normalize_centile_collection
+
+    ## we must create a z for each requested centile: the same for every reference, sex and measurement
+    centile_collection, zs = chart_collection(centile_selection=centile_selection, centiles=centiles, sds=sds)
     
+    ## each sex and measurement_method has its own lines, generated independently of the others:
+    ## in this process, or in the worker processes of an executor. They are collected in this order.
+    chart_lines = generate_chart_lines(chart_centiles=trisomy_21_chart_centiles, cells=[(sex, measurement_method) for sex in SEXES for measurement_method in MEASUREMENT_METHODS], zs=zs, centile_collection=centile_collection, tolerances=tolerances, executor=executor)
+
     reference_data = {} # all data for a the reference are stored here: this is returned to the user 
     sex_list: dict = {}
 
@@ -486,34 +929,8 @@ def create_trisomy_21_chart(centile_selection: str):
         for measurement_index, measurement_method in enumerate(MEASUREMENT_METHODS):
             ## for every measurement method we have as many centiles
             ## as have been requested
+            centiles = next(chart_lines)
 
-            centiles=[] # all generated centiles for a selected centile collection are stored here
-
-            for centile_index, centile in enumerate(centile_collection):
-                ## we must create a z for each requested centile
-                ## if the Cole 9 centiles were selected, these are rounded,
-                ## so conversion to SDS is different
-                ## Otherwise standard conversation of centile to z is used
-                if cole_method:
-                    z = rounded_sds_for_centile(centile)
-                else:
-                    z = sds_for_centile(centile)
-                
-                ## Collect the LMS values from the correct reference
-                lms_array_for_measurement=select_reference_data_for_trisomy_21(measurement_method=measurement_method, sex=sex)
-                ## Generate a centile. there will be nine of these if Cole method selected.
-                ## Some data does not exist at all ages, so any error reflects missing data.
-                ## If this happens, an empty list is returned.
-                try:
-                    centile_data = generate_centile(z=z, centile=centile, measurement_method=measurement_method, sex=sex, lms_array_for_measurement=lms_array_for_measurement, reference=TRISOMY_21)
-                except:
-                    print(f"There is no data in {reference} for {measurement_method} at this age.")
-                    centile_data = []
-
-                ## Store this centile for a given measurement
-                centiles.append({"sds": round(z*100)/100, "centile": centile, "data": centile_data})
-                
-            ## this is the end of the centile_collection for loop
             ## All the centiles for this measurement, sex and reference are added to the measurements list
             measurements.update({measurement_method: centiles})
             
@@ -526,22 +943,26 @@ def create_trisomy_21_chart(centile_selection: str):
     reference_data={TRISOMY_21: sex_list}
     return reference_data
 
-def create_turner_chart(centile_selection: str):
+def create_turner_chart(centile_selection: str, tolerances: dict=None, executor=None, centiles: list=None, sds: list=None):
    ## user selects which centile collection they want
     ## If the Cole method is selected, conversion between centile and SDS
     ## is different as SDS is rounded to the nearest 2/3
     ## Cole method selection is stored in the cole_method flag.
     ## If no parameter is passed, default is the Cole method
-
-    centile_collection = []
-
-    if centile_selection == COLE_TWO_THIRDS_SDS_NINE_CENTILES:
-        centile_collection = COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION
-        cole_method = True
-    else:
-        centile_collection = THREE_PERCENT_CENTILE_COLLECTION
-        cole_method = False
+    ## If tolerances are passed (such as ADAPTIVE_SAMPLING_TOLERANCES), each line is sampled adaptively,
+    ## to within the tolerance for its measurement_method, rather than weekly then monthly
+    ## If an executor is passed (such as a concurrent.futures.ProcessPoolExecutor), the lines of each
+    ## reference, sex and measurement_method are generated in parallel on it
+    ## Any list of centiles (such as [0.1, 99.9]) or of SDS (such as [-3, 3]) may be passed instead
+    ## of a centile_selection: see normalize_centile_collection
+
+    ## we must create a z for each requested centile: the same for every reference, sex and measurement
+    centile_collection, zs = chart_collection(centile_selection=centile_selection, centiles=centiles, sds=sds)
     
+    ## each sex and measurement_method has its own lines, generated independently of the others:
+    ## in this process, or in the worker processes of an executor. They are collected in this order.
+    chart_lines = generate_chart_lines(chart_centiles=turner_chart_centiles, cells=[(sex, measurement_method) for sex in SEXES for measurement_method in MEASUREMENT_METHODS], zs=zs, centile_collection=centile_collection, tolerances=tolerances, executor=executor)
+
     reference_data = {} # all data for a the reference are stored here: this is returned to the user 
     sex_list: dict = {}
 
@@ -555,39 +976,8 @@ def create_turner_chart(centile_selection: str):
         for measurement_index, measurement_method in enumerate(MEASUREMENT_METHODS):
             ## for every measurement method we have as many centiles
             ## as have been requested
+            centiles = next(chart_lines)
 
-            centiles=[] # all generated centiles for a selected centile collection are stored here
-
-            for centile_index, centile in enumerate(centile_collection):
-                ## we must create a z for each requested centile
-                ## if the Cole 9 centiles were selected, these are rounded,
-                ## so conversion to SDS is different
-                ## Otherwise standard conversation of centile to z is used
-                if cole_method:
-                    z = rounded_sds_for_centile(centile)
-                else:
-                    z = sds_for_centile(centile)
-                
-                ## Collect the LMS values from the correct reference
-                try:
-                    lms_array_for_measurement=select_reference_data_for_turners(measurement_method=measurement_method, sex=sex)
-                except LookupError:
-                    # there is no data in the reference
-                    lms_array_for_measurement=[]
-                
-                ## Generate a centile. there will be nine of these if Cole method selected.
-                ## Some data does not exist at all ages, so any error reflects missing data.
-                ## If this happens, an empty list is returned.
-                try:
-                    centile_data = generate_centile(z=z, centile=centile, measurement_method=measurement_method, sex=sex, lms_array_for_measurement=lms_array_for_measurement, reference=TRISOMY_21)
-                except:
-                    print(f"There is no data for {measurement_method} at this age.")
-                    centile_data = []
-
-                ## Store this centile for a given measurement
-                centiles.append({"sds": round(z*100)/100, "centile": centile, "data": centile_data})
-                
-            ## this is the end of the centile_collection for loop
             ## All the centiles for this measurement, sex and reference are added to the measurements list
             measurements.update({measurement_method: centiles})
             
@@ -0,0 +1,133 @@
+"""
+Registry of the growth references the library calculates with.
+
+Each reference module (uk_who, turner, trisomy_21) registers itself once, when imported, under its public name
+(UK_WHO, TURNERS, TRISOMY_21 in parameter_constants): the function returning its ReferenceTable for an age,
+measurement_method, sex and preterm flag, and its chart segments. A reference which is made up of several source references, as UK-WHO is, has a
+chart segment for each, named as in parameter_constants and keyed to an age at which all its tables are valid.
+
+Dispatch is then one dict lookup, and adding a reference is one call to register_growth_reference.
+
+The age-segment and validity rules of a reference are chains of age comparisons. BoundaryIndex compiles such a
+chain, once, into its boundary ages and the result between each, so that it is evaluated for a whole array of
+ages with one searchsorted.
+"""
+import numpy as np
+
+
+class GrowthReference:
+    """
+    A registered growth reference. `lms_reference_table(age, measurement_method, sex, born_preterm)` returns the
+    ReferenceTable for a request or raises a LookupError. `chart_segments` names the source reference of each
+    segment of its charts, with an age at which all the segment's tables are valid. `selects_by_preterm` is True
+    if the table chosen depends on the preterm flag.
+    A reference may also register `lms_reference_tables`, a vectorised lms_reference_table for arrays of ages
+    (see GrowthReference.lms_reference_tables).
+    """
+
+    __slots__ = ("name", "lms_reference_table", "chart_segments", "selects_by_preterm", "vectorised_lms_reference_tables")
+
+    def __init__(self, name: str, lms_reference_table, chart_segments: dict, selects_by_preterm: bool = False,
+                 lms_reference_tables=None):
+        self.name = name
+        self.lms_reference_table = lms_reference_table
+        self.chart_segments = chart_segments
+        self.selects_by_preterm = selects_by_preterm
+        self.vectorised_lms_reference_tables = lms_reference_tables
+
+    def lms_reference_tables(self, ages: np.ndarray, measurement_method: str, sex: str, born_preterm: bool) -> tuple:
+        """
+        Returns a list of ReferenceTables and, for each age, the index in that list of the table lms_reference_table
+        returns for that age, or -1 where it raises a LookupError.
+        References which have not registered a vectorised version are looked up one age at a time.
+        """
+        if self.vectorised_lms_reference_tables is not None:
+            return self.vectorised_lms_reference_tables(
+                ages=ages, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+
+        tables = []
+        codes = np.full(len(ages), -1)
+        for index, age in enumerate(np.asarray(ages, dtype=np.float64).tolist()):
+            try:
+                table = self.lms_reference_table(
+                    age=age, measurement_method=measurement_method, sex=sex, born_preterm=born_preterm)
+            except LookupError:
+                continue
+            for code, known_table in enumerate(tables):
+                if known_table is table:
+                    break
+            else:
+                code = len(tables)
+                tables.append(table)
+            codes[index] = code
+        return tables, codes
+
+    def __repr__(self):
+        return f"<GrowthReference {self.name}: {', '.join(self.chart_segments)}>"
+
+
+GROWTH_REFERENCES = {}
+
+
+def register_growth_reference(name: str, lms_reference_table, chart_segments: dict, selects_by_preterm: bool = False,
+                              lms_reference_tables=None) -> GrowthReference:
+    """
+    Registers a growth reference under its name, replacing any registered before under that name
+    """
+    growth_reference = GrowthReference(
+        name=name,
+        lms_reference_table=lms_reference_table,
+        chart_segments=chart_segments,
+        selects_by_preterm=selects_by_preterm,
+        lms_reference_tables=lms_reference_tables)
+    GROWTH_REFERENCES[name] = growth_reference
+    return growth_reference
+
+
+def growth_reference(name: str) -> GrowthReference:
+    """
+    Returns the registered growth reference of that name. Raises a ValueError if there is none.
+    """
+    try:
+        return GROWTH_REFERENCES[name]
+    except (KeyError, TypeError):
+        raise ValueError("Incorrect reference supplied")
+
+
+class BoundaryIndex:
+    """
+    A function of age that is constant between a known set of boundary ages, compiled to its value between each.
+    Each interval runs from one boundary (included) to the next (excluded), so a comparison `age < x` has its
+    boundary at x, and `age > x` or `age <= x` has its boundary at the next float above x.
+    The function is evaluated once for each interval, and once for NaN (which no comparison is true for).
+    """
+
+    __slots__ = ("boundaries", "boundary_array", "values", "nan_value")
+
+    def __init__(self, function, boundaries: list):
+        self.boundaries = sorted(set(float(boundary) for boundary in boundaries))
+        self.boundary_array = np.array(self.boundaries)
+        below_first_boundary = float(np.nextafter(self.boundaries[0], -np.inf))
+        self.values = [function(age) for age in [below_first_boundary] + self.boundaries]
+        self.nan_value = function(float("nan"))
+
+    def intervals(self, ages: np.ndarray) -> np.ndarray:
+        """
+        Vectorised: returns the index in `values` of the interval of each age. NaN ages return len(values).
+        """
+        ages = np.asarray(ages, dtype=np.float64)
+        return np.where(np.isnan(ages), len(self.values), np.searchsorted(self.boundary_array, ages, side="right"))
+
+    def codes(self, ages: np.ndarray, code_for_value) -> np.ndarray:
+        """
+        Vectorised: returns, for each age, code_for_value of the function at that age
+        """
+        value_codes = np.array([code_for_value(value) for value in self.values + [self.nan_value]])
+        return value_codes[self.intervals(ages)]
+
+
+def above(age: float) -> float:
+    """
+    The boundary of a comparison `> age` or `<= age`: the next float above age
+    """
+    return float(np.nextafter(age, np.inf))
@@ -0,0 +1,253 @@
+"""
+Optional dense lattice of LMS values, one per day of age.
+
+Decimal ages in this service are whole days divided by 365.25 (see chronological_decimal_age and
+corrected_decimal_age), so between 23 weeks gestation and 20 years there are only some 7,400 possible ages.
+build_lms_lattices() evaluates the LMS for every reference, measurement_method, sex and preterm flag at each of
+those days, once. sds_for_measurement, measurement_from_sds and percentage_median_bmi then look up ages that
+fall on a day by array index, with no search or interpolation. Any other age (or one outside the reference data)
+falls through to the usual lookup, so results are the same whether or not the lattices are built.
+
+Lattices can be saved to and loaded from an .npz artifact. To build, check, time and save one:
+`python -m benchmarks.benchmark_lms_lattice lms_lattice.npz` (from the rcpchgrowth folder)
+The artifact records the SHA-256 of the reference data and code it was built from, and is refused by any other.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+from .constants import *
+from .growth_reference import GROWTH_REFERENCES
+
+DAYS_PER_YEAR = 365.25
+FIRST_DAY = (23 * 7) - (40 * 7)  # 23 weeks gestation, in days from term
+LAST_DAY = round(TWENTY_YEARS * DAYS_PER_YEAR)  # 20 years, in days from term
+
+
+class LmsLattice:
+    """
+    The LMS of one reference, measurement_method, sex and preterm flag at every day from FIRST_DAY to LAST_DAY.
+    `l`, `m` and `s` are read-only float64 arrays indexed by day - FIRST_DAY. `valid` is False for days the usual
+    lookup does not return LMS values for: those days are always looked up the usual way.
+    """
+
+    __slots__ = ("reference", "measurement_method", "sex", "born_preterm", "l", "m", "s", "valid")
+
+    def __init__(self, reference: str, measurement_method: str, sex: str, born_preterm: bool,
+                 l: np.ndarray, m: np.ndarray, s: np.ndarray, valid: np.ndarray):
+        self.reference = reference
+        self.measurement_method = measurement_method
+        self.sex = sex
+        self.born_preterm = born_preterm
+        self.l = _read_only_array(l, np.float64)
+        self.m = _read_only_array(m, np.float64)
+        self.s = _read_only_array(s, np.float64)
+        self.valid = _read_only_array(valid, np.bool_)
+
+    @property
+    def nbytes(self) -> int:
+        return self.l.nbytes + self.m.nbytes + self.s.nbytes + self.valid.nbytes
+
+    def __repr__(self):
+        return (f"<LmsLattice {self.reference} {self.measurement_method} {self.sex} "
+                f"born_preterm={self.born_preterm}: {int(self.valid.sum())} days>")
+
+
+LMS_LATTICES = {}
+
+
+def lattice_key(reference: str, measurement_method: str, sex: str, born_preterm: bool) -> tuple:
+    # references which do not choose their tables by the preterm flag share one lattice for both
+    registered = GROWTH_REFERENCES.get(reference)
+    selects_by_preterm = registered is not None and registered.selects_by_preterm
+    return (reference, measurement_method, sex, bool(born_preterm) if selects_by_preterm else False)
+
+
+def lattice_lms(reference: str, age: float, measurement_method: str, sex: str, born_preterm: bool):
+    """
+    Returns the LMS for an age from the lattices as a dict of "l", "m" and "s", as fetch_lms does.
+    Returns None if no lattices are built, or the age does not fall on a day the lattice holds.
+    """
+    if not LMS_LATTICES:
+        return None
+    try:
+        lattice = LMS_LATTICES.get(lattice_key(reference, measurement_method, sex, born_preterm))
+        if lattice is None:
+            return None
+        day = round(age * DAYS_PER_YEAR)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if day / DAYS_PER_YEAR != age or day < FIRST_DAY or day > LAST_DAY:
+        return None
+    index = day - FIRST_DAY
+    if not lattice.valid[index]:
+        return None
+    return {
+        "l": float(lattice.l[index]),
+        "m": float(lattice.m[index]),
+        "s": float(lattice.s[index])
+    }
+
+
+def lattice_ages() -> np.ndarray:
+    """
+    Returns the decimal age of each day of the lattice
+    """
+    return np.arange(FIRST_DAY, LAST_DAY + 1) / DAYS_PER_YEAR
+
+
+def build_lms_lattices() -> dict:
+    """
+    Evaluates and registers the lattice for every registered reference, measurement_method, sex and preterm flag.
+    Returns the memory report.
+    """
+    # imported here as global_functions looks LMS up in the lattices registered in this module
+    from .global_functions import lms_value_array_for_measurement_for_reference, fetch_lms_batch
+    from .reference_table import ReferenceTable
+
+    ages = lattice_ages()
+    lattices = {}
+    for reference in list(GROWTH_REFERENCES):
+        for measurement_method in MEASUREMENT_METHODS:
+            for sex in SEXES:
+                for born_preterm in (False, True):
+                    key = lattice_key(reference, measurement_method, sex, born_preterm)
+                    if key in lattices:
+                        continue
+                    # the reference table the usual lookup selects for each day, grouped by table
+                    days_for_table = {}
+                    for index, age in enumerate(ages.tolist()):
+                        try:
+                            table = lms_value_array_for_measurement_for_reference(
+                                reference=reference, age=age, measurement_method=measurement_method,
+                                sex=sex, born_preterm=born_preterm)
+                        except (LookupError, ValueError):
+                            continue
+                        if isinstance(table, ReferenceTable):
+                            days_for_table.setdefault(id(table), (table, []))[1].append(index)
+
+                    lms = np.full((3, len(ages)), np.nan)
+                    for table, indices in days_for_table.values():
+                        table_lms = fetch_lms_batch(ages[indices], table)
+                        lms[:, indices] = np.stack((table_lms["l"], table_lms["m"], table_lms["s"]))
+                    # fetch_lms_batch returns NaN for ages where fetch_lms raises: those days are left to fetch_lms
+                    valid = ~np.isnan(lms).any(axis=0)
+                    if valid.any():
+                        lattices[key] = LmsLattice(*key, l=lms[0], m=lms[1], s=lms[2], valid=valid)
+
+    LMS_LATTICES.clear()
+    LMS_LATTICES.update(lattices)
+    return lms_lattice_memory_report()
+
+
+def clear_lms_lattices():
+    """
+    Removes all the lattices, so that every lookup is made from the reference tables
+    """
+    LMS_LATTICES.clear()
+
+
+def verify_lms_lattices() -> int:
+    """
+    Checks every valid day of every lattice is exactly the LMS fetch_lms returns.
+    Returns the number of days checked, or raises a ValueError at the first difference.
+    """
+    from .global_functions import lms_value_array_for_measurement_for_reference, fetch_lms
+
+    ages = lattice_ages().tolist()
+    checked = 0
+    for lattice in LMS_LATTICES.values():
+        for index in np.flatnonzero(lattice.valid).tolist():
+            table = lms_value_array_for_measurement_for_reference(
+                reference=lattice.reference, age=ages[index], measurement_method=lattice.measurement_method,
+                sex=lattice.sex, born_preterm=lattice.born_preterm)
+            expected = fetch_lms(age=ages[index], reference_table=table)
+            actual = {"l": lattice.l[index], "m": lattice.m[index], "s": lattice.s[index]}
+            for parameter in ("l", "m", "s"):
+                if actual[parameter] != expected[parameter]:
+                    raise ValueError(
+                        f"{lattice!r} differs from fetch_lms at day {index + FIRST_DAY}: "
+                        f"{parameter} is {actual[parameter]!r}, not {expected[parameter]!r}.")
+            checked += 1
+    return checked
+
+
+def lms_lattice_memory_report() -> dict:
+    """
+    Returns the number of lattices, the days each holds and the bytes they occupy, in total and per lattice
+    """
+    return {
+        "lattices": len(LMS_LATTICES),
+        "days_per_lattice": LAST_DAY - FIRST_DAY + 1,
+        "total_bytes": sum(lattice.nbytes for lattice in LMS_LATTICES.values()),
+        "bytes": {"/".join(str(part) for part in key): lattice.nbytes for key, lattice in LMS_LATTICES.items()}
+    }
+
+
+def lattice_source_hashes() -> dict:
+    """
+    Returns the SHA-256 of the JSON file of each registered reference ("sources"), and of the code which looks up
+    the LMS the lattices hold ("code"), as recorded in a saved artifact
+    """
+    # imported here as global_functions looks LMS up in the lattices registered in this module
+    from . import global_functions, reference_table
+
+    sources = {}
+    for reference, source_file_path in sorted(reference_table.REFERENCE_DATA_FILES.items()):
+        with open(source_file_path, "rb") as json_file:
+            sources[reference] = hashlib.sha256(json_file.read()).hexdigest()
+
+    code_files = {global_functions.__file__, reference_table.__file__, __file__}
+    for growth_reference in GROWTH_REFERENCES.values():
+        code_files.add(sys.modules[growth_reference.lms_reference_table.__module__].__file__)
+    code_hash = hashlib.sha256()
+    for code_file in sorted(code_files, key=os.path.basename):
+        with open(code_file, "rb") as source:
+            code_hash.update(hashlib.sha256(source.read()).digest())
+    return {"sources": sources, "code": code_hash.hexdigest()}
+
+
+def save_lms_lattices(file_path: str):
+    """
+    Saves the registered lattices to an .npz artifact, with the hashes of the reference data and code they were
+    built from (lattice_source_hashes)
+    """
+    keys = list(LMS_LATTICES)
+    arrays = {}
+    for number, key in enumerate(keys):
+        lattice = LMS_LATTICES[key]
+        arrays[f"lms_{number}"] = np.stack((lattice.l, lattice.m, lattice.s))
+        arrays[f"valid_{number}"] = lattice.valid
+    header = {"first_day": FIRST_DAY, "last_day": LAST_DAY, "keys": keys, **lattice_source_hashes()}
+    np.savez(file_path, header=np.array(json.dumps(header)), **arrays)
+
+
+def load_lms_lattices(file_path: str) -> dict:
+    """
+    Registers the lattices of an .npz artifact written by save_lms_lattices. Returns the memory report.
+    Raises a ValueError if the artifact was built for a different range of days, or from different reference data
+    or code: its LMS would not be those of the current references, so it must be rebuilt.
+    """
+    with np.load(file_path) as artifact:
+        header = json.loads(str(artifact["header"]))
+        if header["first_day"] != FIRST_DAY or header["last_day"] != LAST_DAY:
+            raise ValueError(f"The LMS lattice artifact {file_path} does not cover days {FIRST_DAY} to {LAST_DAY}.")
+        source_hashes = lattice_source_hashes()
+        if header.get("sources") != source_hashes["sources"] or header.get("code") != source_hashes["code"]:
+            raise ValueError(f"The LMS lattice artifact {file_path} was built from different reference data or code.")
+        lattices = {}
+        for number, key in enumerate(header["keys"]):
+            lms = artifact[f"lms_{number}"]
+            lattices[tuple(key)] = LmsLattice(*key, l=lms[0], m=lms[1], s=lms[2], valid=artifact[f"valid_{number}"])
+    LMS_LATTICES.clear()
+    LMS_LATTICES.update(lattices)
+    return lms_lattice_memory_report()
+
+
+def _read_only_array(values, dtype) -> np.ndarray:
+    array = np.ascontiguousarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
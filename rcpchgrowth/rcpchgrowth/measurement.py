@@ -1,19 +1,22 @@
 from datetime import date
+from numbers import Real
 from pprint import pprint
 
-from marshmallow import ValidationError
+import numpy as np
 
-from .centile_bands import centile_band_for_centile
-from .date_calculations import chronological_decimal_age, corrected_decimal_age, chronological_calendar_age, estimated_date_delivery, corrected_gestational_age
+from .date_calculations import chronological_decimal_age, corrected_decimal_age, decimal_ages
 from .bmi_functions import bmi_from_height_weight, weight_for_bmi_height
-from .growth_interpretations import comment_prematurity_correction
-from .global_functions import sds_for_measurement, measurement_from_sds, centile
+from .measurement_result import MeasurementResult, child_observation_value, measurement_calculated_values
+from .global_functions import sds_for_measurement, sds_for_measurements, measurement_from_sds, centile
+from .growth_reference import GROWTH_REFERENCES
 from .constants import *
-from .schemas import *
 
 
 class Measurement:
 
+    __slots__ = ("sex", "birth_date", "observation_date", "measurement_method", "observation_value", "gestation_weeks",
+                 "gestation_days", "reference", "born_preterm", "result")
+
     def __init__(
         self,
         sex: str,
@@ -23,7 +26,8 @@ class Measurement:
         observation_value: float,
         reference: str,
         gestation_weeks: int = 0,
-        gestation_days: int = 0
+        gestation_days: int = 0,
+        validated: bool = False
     ):
         """
         The Measurement Class is the gatekeeper to all the functions in the RCPCHGrowth package, although the public
@@ -42,65 +46,92 @@ class Measurement:
         `gestation_weeks`: (integer) gestation at birth in weeks.
         `gestation_days`: (integer) supplemental days in addition to gestation_weeks at birth.
         `reference`: ENUM refering to which reference dataset to use: ['uk-who', 'turners-syndrome', 'trisomy-21']
-        """
-
-        self.sex = sex
-        self.birth_date = birth_date
-        self.observation_date = observation_date
-        self.measurement_method = measurement_method
-        self.observation_value = observation_value
-        self.gestation_weeks = gestation_weeks
-        self.gestation_days = gestation_days
-        self.reference = reference
+        `validated`: True if the parameters have already been validated (as by the API's CalculationRequestParameters),
+            in which case they are used as they are. Otherwise their types and values are checked first, raising a
+            TypeError or ValueError.
 
-        # Validate using the Marshmallow Schema
-        try:
-            MeasurementClassSchema().load({
-                sex,
-                birth_date,
-                observation_date,
-                measurement_method,
-                observation_value,
-                gestation_weeks,
-                gestation_days,
-                reference
-            })
-        except ValidationError as err:
-            pass  # pprint(err.messages)
+        The calculated numbers are kept in `result` (a MeasurementResult). The `measurement` object, with its text,
+        is generated from them only when it is read.
+        """
 
-        valid = self.__validate_measurement_method(
-            measurement_method=measurement_method, observation_value=observation_value)
+        valid = self.__set_observation(
+            sex=sex,
+            birth_date=birth_date,
+            observation_date=observation_date,
+            measurement_method=measurement_method,
+            observation_value=observation_value,
+            reference=reference,
+            gestation_weeks=gestation_weeks,
+            gestation_days=gestation_days,
+            validated=validated)
         if valid == False:
             return
 
-        if gestation_weeks < 37 and gestation_weeks >= 23:
-            self.born_preterm = True
-        else:
-            self.born_preterm = False
+        self.__calculate()
 
-        # the ages_object receives birth_data and measurement_dates objects
-        self.ages_object = self.__calculate_ages(
-            sex=self.sex,
-            birth_date=self.birth_date,
-            observation_date=self.observation_date,
-            gestation_weeks=self.gestation_weeks,
-            gestation_days=self.gestation_days)
-        # the calculate_measurements_object receives the child_observation_value and measurement_calculated_values objects
-        self.calculate_measurements_object = self.sds_and_centile_for_measurement_method(
-            sex=self.sex,
-            age=self.ages_object['measurement_dates']['corrected_decimal_age'],
-            measurement_method=self.measurement_method,
-            observation_value=self.observation_value,
-            born_preterm=self.born_preterm,
-            reference=self.reference
-        )
-
-        self.measurement = {
-            'birth_data': self.ages_object['birth_data'],
-            'measurement_dates': self.ages_object['measurement_dates'],
-            'child_observation_value': self.calculate_measurements_object['child_observation_value'],
-            'measurement_calculated_values': self.calculate_measurements_object['measurement_calculated_values']
-        }
+    @classmethod
+    def batch(cls, observations: list, reference: str, validated: bool = False) -> list:
+        """
+        Calculates many observations together, such as all of a child's clinic visits. Each observation is a dict
+        of the parameters of a Measurement other than the reference.
+        The decimal ages of all of them are calculated in one vectorised pass (decimal_ages), and the SDS of each
+        measurement_method, sex and preterm flag in another (sds_for_measurements). The rest of each Measurement is
+        built as usual, and is the same as a Measurement of that observation. As for a Measurement, the observations are
+        validated first unless they already have been.
+        Returns, in the order of the observations, the Measurement of each, or the exception which made it invalid.
+        """
+        results = [None] * len(observations)
+        measurements = []
+        for index, observation in enumerate(observations):
+            measurement = cls.__new__(cls)
+            try:
+                if not measurement.__set_observation(reference=reference, validated=validated, **observation):
+                    raise ValueError(f"{observation.get('measurement_method')} is not a measurement_method.")
+            except (TypeError, ValueError) as error:
+                results[index] = error
+                continue
+            measurements.append((index, measurement))
+
+        if measurements:
+            chronological_decimal_ages, corrected_decimal_ages = decimal_ages(
+                birth_dates=[measurement.birth_date for index, measurement in measurements],
+                observation_dates=[measurement.observation_date for index, measurement in measurements],
+                # as __calculate, a gestation of 0 weeks is taken as term
+                gestation_weeks=[measurement.gestation_weeks or 40 for index, measurement in measurements],
+                gestation_days=[measurement.gestation_days for index, measurement in measurements])
+        measurement_sds = np.full(len(measurements), np.nan)
+        groups = {}
+        for position, (index, measurement) in enumerate(measurements):
+            groups.setdefault((measurement.measurement_method, measurement.sex, measurement.born_preterm), []).append(position)
+        for (measurement_method, sex, born_preterm), positions in groups.items():
+            try:
+                measurement_sds[positions] = sds_for_measurements(
+                    reference=reference, ages=corrected_decimal_ages[positions], measurement_method=measurement_method,
+                    observation_values=[measurements[position][1].observation_value for position in positions],
+                    sex=sex, born_preterm=born_preterm)
+            except IndexError:
+                # an age beyond the reference: each is calculated on its own, so only that one reports the error
+                pass
+
+        for position, (index, measurement) in enumerate(measurements):
+            # where there is no vectorised SDS, the SDS is calculated (or its error raised) as for a single Measurement
+            sds = None if np.isnan(measurement_sds[position]) else float(measurement_sds[position])
+            try:
+                measurement.__calculate(
+                    decimal_ages=(float(chronological_decimal_ages[position]), float(corrected_decimal_ages[position])),
+                    measurement_sds=sds)
+            except (LookupError, TypeError, ValueError) as error:
+                results[index] = error
+                continue
+            results[index] = measurement
+        return results
+
+    @property
+    def measurement(self) -> dict:
+        """
+        The measurement object, generated from the result each time it is read (see MeasurementResult.as_dict)
+        """
+        return self.result.as_dict()
 
     """
     These are 2 public class methods
@@ -114,156 +145,148 @@ class Measurement:
         observation_value: float,
         reference: str,
         born_preterm: bool = False,
+        measurement_sds: float = None
     ):
 
         # returns sds for given measurement
         # bmi must be supplied precalculated
 
-        # calculate sds based on reference, age, measurement, sex and prematurity
-        measurement_sds = sds_for_measurement(reference=reference, age=age, measurement_method=measurement_method,
-                                              observation_value=observation_value, sex=sex, born_preterm=born_preterm)
+        # calculate sds based on reference, age, measurement, sex and prematurity, unless it has been already
+        if measurement_sds is None:
+            measurement_sds = sds_for_measurement(reference=reference, age=age, measurement_method=measurement_method,
+                                                  observation_value=observation_value, sex=sex, born_preterm=born_preterm)
 
-        measurement_centile = centile(z_score=measurement_sds)
-        centile_band = centile_band_for_centile(
-            sds=measurement_sds, measurement_method=measurement_method)
-        self.return_measurement_object = self.__create_measurement_object(
-            measurement_method=measurement_method,
-            observation_value=observation_value,
-            sds_value=measurement_sds,
-            centile_value=measurement_centile,
-            centile_band=centile_band
-        )
+        measurement_centile = self.__rounded_centile(centile(z_score=measurement_sds))
 
-        return self.return_measurement_object
+        return {
+            "child_observation_value": child_observation_value(measurement_method, observation_value),
+            "measurement_calculated_values": measurement_calculated_values(measurement_method, measurement_sds, measurement_centile)
+        }
 
     """
     These are all private class methods and are only accessed by this class on initialisation
     """
 
-    def __calculate_ages(
+    def __set_observation(
             self,
             sex: str,
             birth_date: date,
             observation_date: date,
+            measurement_method: str,
+            observation_value: float,
+            reference: str,
             gestation_weeks: int = 0,
-            gestation_days=0):
+            gestation_days: int = 0,
+            validated: bool = False):
+        # stores the parameters of the observation and returns whether it is valid
+
+        if not validated:
+            self.__validate_observation(
+                sex=sex,
+                birth_date=birth_date,
+                observation_date=observation_date,
+                measurement_method=measurement_method,
+                observation_value=observation_value,
+                reference=reference,
+                gestation_weeks=gestation_weeks,
+                gestation_days=gestation_days)
 
-        if gestation_weeks == 0:
-            # if gestation not specified, set to 40 weeks
-            gestation_weeks = 40
-        # calculate ages from dates and gestational ages at birth
-        self.corrected_decimal_age = corrected_decimal_age(
-            birth_date=birth_date,
-            observation_date=observation_date,
-            gestation_weeks=gestation_weeks,
-            gestation_days=gestation_days)
-        self.chronological_decimal_age = chronological_decimal_age(
-            birth_date=birth_date,
-            observation_date=observation_date)
-        self.chronological_calendar_age = chronological_calendar_age(
-            birth_date=birth_date,
-            observation_date=observation_date)
-        self.age_comments = comment_prematurity_correction(
-            chronological_decimal_age=self.chronological_decimal_age,
-            corrected_decimal_age=self.corrected_decimal_age,
-            gestation_weeks=gestation_weeks,
-            gestation_days=gestation_days)
-        self.lay_decimal_age_comment = self.age_comments['lay_comment']
-        self.clinician_decimal_age_comment = self.age_comments['clinician_comment']
-        self.corrected_gestational_age = corrected_gestational_age(
-            birth_date=birth_date,
-            observation_date=observation_date,
-            gestation_weeks=gestation_weeks,
-            gestation_days=gestation_days)  # return None if no correction necessary
-
-        if gestation_weeks < 37 and gestation_weeks >= 24:
-            # born preterm - may need correction (not if >32 weeks and >1 y, or <32 weeks and >2 y)
-            # decision to correct is made in the date_calculations module
-            # if baby is <42 weeks currently, decimal age reflects the corrected gestational age
-            self.estimated_date_delivery = estimated_date_delivery(
-                birth_date, gestation_weeks, gestation_days)
-            self.corrected_calendar_age = chronological_calendar_age(
-                self.estimated_date_delivery, observation_date)
-            self.estimated_date_delivery_string = self.estimated_date_delivery.strftime(
-                '%a %d %B, %Y')
-        else:
-            # term baby
-            self.estimated_date_delivery = None
-            self.estimated_date_delivery_string = None
-            self.corrected_calendar_age = self.chronological_calendar_age
-
-        birth_data = {
-            "birth_date": birth_date,
-            "gestation_weeks": gestation_weeks,
-            "gestation_days": gestation_days,
-            "estimated_date_delivery": self.estimated_date_delivery,
-            "estimated_date_delivery_string": self.estimated_date_delivery_string,
-            "sex": sex
-        }
+        self.sex = sex
+        self.birth_date = birth_date
+        self.observation_date = observation_date
+        self.measurement_method = measurement_method
+        self.observation_value = observation_value
+        self.gestation_weeks = gestation_weeks
+        self.gestation_days = gestation_days
+        self.reference = reference
 
-        measurement_dates = {
-            "observation_date": observation_date,
-            "chronological_decimal_age": self.chronological_decimal_age,
-            "corrected_decimal_age": self.corrected_decimal_age,
-            "chronological_calendar_age": self.chronological_calendar_age,
-            "corrected_calendar_age": self.corrected_calendar_age,
-            "corrected_gestational_age": {
-                "corrected_gestation_weeks": self.corrected_gestational_age["corrected_gestation_weeks"],
-                "corrected_gestation_days": self.corrected_gestational_age["corrected_gestation_days"],
-            },
-            "clinician_decimal_age_comment": self.clinician_decimal_age_comment,
-            "lay_decimal_age_comment": self.lay_decimal_age_comment
-        }
+        valid = self.__validate_measurement_method(
+            measurement_method=measurement_method, observation_value=observation_value)
 
-        child_age_calculations = {
-            "birth_data": birth_data,
-            "measurement_dates": measurement_dates
-        }
-        return child_age_calculations
+        if gestation_weeks < 37 and gestation_weeks >= 23:
+            self.born_preterm = True
+        else:
+            self.born_preterm = False
 
-    def __create_measurement_object(
-        self,
-        measurement_method: str,
-        observation_value: float,
-        sds_value: float,
-        centile_value: float,
-        centile_band: str,
-    ):
-        """
-        private class method
-        This is the end step, having calculated dates, SDS/Centiles and selected appropriate clinical advice,
-        to then create a bespoke json Measurement object with values relevant only to the measurement_method requested
-        @params: measurement_method: string accepting only 'height', 'weight', 'bmi', 'ofc' lowercase only
-        """
+        return valid
 
-        # Measurement object is made up of 4 JSON elements: "birth_data", "measurement_dates",
-        #  "child_observation_value" and "measurement_calculated_values"
-        # All Measurement objects return the "birth_data" and "measurement_dates" elements
-        # Only those calculations relevant to the measurement_method requested populate the final JSON
-        # object.
+    def __calculate(self, decimal_ages: tuple = None, measurement_sds: float = None):
+        # calculates the numbers of the result, from the chronological and corrected decimal ages and the SDS if they
+        # have already been calculated (see batch). The text of the measurement object is left to the result.
+
+        gestation_weeks = self.gestation_weeks
+        if gestation_weeks == 0:
+            # if gestation not specified, set to 40 weeks
+            gestation_weeks = 40
+        # calculate ages from dates and gestational ages at birth, unless they have been already
+        if decimal_ages is None:
+            decimal_ages = (
+                chronological_decimal_age(
+                    birth_date=self.birth_date,
+                    observation_date=self.observation_date),
+                corrected_decimal_age(
+                    birth_date=self.birth_date,
+                    observation_date=self.observation_date,
+                    gestation_weeks=gestation_weeks,
+                    gestation_days=self.gestation_days))
+        chronological_age, corrected_age = decimal_ages
+
+        # calculate sds based on reference, age, measurement, sex and prematurity, unless it has been already
+        if measurement_sds is None:
+            measurement_sds = sds_for_measurement(reference=self.reference, age=corrected_age, measurement_method=self.measurement_method,
+                                                  observation_value=self.observation_value, sex=self.sex, born_preterm=self.born_preterm)
+
+        self.result = MeasurementResult(
+            sex=self.sex,
+            birth_date=self.birth_date,
+            observation_date=self.observation_date,
+            gestation_weeks=gestation_weeks,
+            gestation_days=self.gestation_days,
+            measurement_method=self.measurement_method,
+            observation_value=self.observation_value,
+            chronological_decimal_age=chronological_age,
+            corrected_decimal_age=corrected_age,
+            sds=measurement_sds,
+            centile=self.__rounded_centile(centile(z_score=measurement_sds)))
 
+    def __rounded_centile(self, centile_value: float):
+        # centiles are returned to 1 decimal place at the extremes, and as whole numbers between
         if centile_value:
             if centile_value > 99 or centile_value < 1:
                 centile_value = round(centile_value, 1)
             else:
                 centile_value = int(centile_value)
+        return centile_value
 
-        measurement_calculated_values = {
-            "measurement_method": measurement_method,
-            "sds": sds_value,
-            "centile": centile_value,
-            "centile_band": centile_band
-        }
-
-        child_observation_value = {
-            "measurement_method": measurement_method,
-            "observation_value": observation_value
-        }
-
-        return {
-            "child_observation_value": child_observation_value,
-            "measurement_calculated_values": measurement_calculated_values
-        }
+    def __validate_observation(
+            self,
+            sex: str,
+            birth_date: date,
+            observation_date: date,
+            measurement_method: str,
+            observation_value: float,
+            reference: str,
+            gestation_weeks: int,
+            gestation_days: int):
+
+        # Private method which checks the types and values of the parameters of a Measurement which has not been
+        # validated already, raising a TypeError or ValueError. The observation_value is checked for its
+        # measurement_method by __validate_measurement_method.
+
+        if not isinstance(sex, str):
+            raise TypeError('sex must be a string: "male" or "female".')
+        if sex not in SEXES:
+            raise ValueError(f'{sex} is not a sex. Please pass "male" or "female".')
+        if not isinstance(birth_date, date) or not isinstance(observation_date, date):
+            raise TypeError('birth_date and observation_date must be Python date or datetime objects.')
+        if measurement_method not in MEASUREMENT_METHODS:
+            raise ValueError(f'{measurement_method} is not a measurement_method. Please pass "height", "weight", "bmi" or "ofc".')
+        if observation_value is not None and not isinstance(observation_value, Real):
+            raise TypeError('observation_value must be a number.')
+        if reference not in GROWTH_REFERENCES:
+            raise ValueError("Incorrect reference supplied")
+        if not isinstance(gestation_weeks, Real) or not isinstance(gestation_days, Real):
+            raise TypeError('gestation_weeks and gestation_days must be numbers.')
 
     def __validate_measurement_method(
             self,
@@ -0,0 +1,188 @@
+"""
+The result of a Measurement: the observation and the numbers calculated from it (decimal ages, SDS and centile)
+only. The text and nested dicts of the measurement object (calendar ages, prematurity comments, the corrected
+gestational age, the estimated date of delivery and the centile band) are generated from them only when it is
+serialised, so callers which only need the numbers never pay for them. Callers which only need some of the
+measurement object can ask for just those fields, and the text of the rest is never generated.
+"""
+from datetime import date
+
+from .centile_bands import centile_band_for_centile
+from .date_calculations import chronological_calendar_age, estimated_date_delivery, corrected_gestational_age
+from .growth_interpretations import comment_prematurity_correction
+
+# the groups of the measurement object, and the fields of each
+MEASUREMENT_FIELDS = {
+    "birth_data": ("birth_date", "gestation_weeks", "gestation_days", "estimated_date_delivery", "estimated_date_delivery_string", "sex"),
+    "measurement_dates": ("observation_date", "chronological_decimal_age", "corrected_decimal_age", "chronological_calendar_age",
+                          "corrected_calendar_age", "corrected_gestational_age", "clinician_decimal_age_comment", "lay_decimal_age_comment"),
+    "child_observation_value": ("measurement_method", "observation_value"),
+    "measurement_calculated_values": ("measurement_method", "sds", "centile", "centile_band")
+}
+
+
+class MeasurementResult:
+
+    __slots__ = ("sex", "birth_date", "observation_date", "gestation_weeks", "gestation_days", "measurement_method",
+                 "observation_value", "chronological_decimal_age", "corrected_decimal_age", "sds", "centile")
+
+    def __init__(
+        self,
+        sex: str,
+        birth_date: date,
+        observation_date: date,
+        gestation_weeks: int,
+        gestation_days: int,
+        measurement_method: str,
+        observation_value: float,
+        chronological_decimal_age: float,
+        corrected_decimal_age: float,
+        sds: float,
+        centile: float
+    ):
+        # gestation_weeks is as returned in birth_data: 40 if it was not specified
+        self.sex = sex
+        self.birth_date = birth_date
+        self.observation_date = observation_date
+        self.gestation_weeks = gestation_weeks
+        self.gestation_days = gestation_days
+        self.measurement_method = measurement_method
+        self.observation_value = observation_value
+        self.chronological_decimal_age = chronological_decimal_age
+        self.corrected_decimal_age = corrected_decimal_age
+        self.sds = sds
+        self.centile = centile
+
+    def as_dict(self, fields: frozenset = None) -> dict:
+        """
+        The measurement object: "birth_data", "measurement_dates", "child_observation_value" and
+        "measurement_calculated_values". It is built afresh on each call.
+        If fields (from measurement_fields) is given, only those fields are returned, in the groups they belong to,
+        and the text of any other field is never generated.
+        """
+        return dict(self.items(fields))
+
+    def items(self, fields: frozenset = None):
+        """
+        Yields the (group, fields) pairs of as_dict, building each group only as it is reached. An error in building
+        a group is raised only when it is reached too, so callers which cannot fail part way through, such as a
+        response already being sent, should build the whole measurement object with as_dict first.
+        """
+        for group, group_fields in MEASUREMENT_FIELDS.items():
+            if fields is None or not fields.isdisjoint(group_fields):
+                yield group, getattr(self, group)(fields)
+
+    def estimated_date_delivery(self) -> date:
+        # only babies born preterm have an estimated date of delivery distinct from their birth
+        if self.gestation_weeks < 37 and self.gestation_weeks >= 24:
+            return estimated_date_delivery(self.birth_date, self.gestation_weeks, self.gestation_days)
+        return None
+
+    def birth_data(self, fields: frozenset = None) -> dict:
+        wanted = MEASUREMENT_FIELDS["birth_data"] if fields is None else fields
+        values = {}
+        if "birth_date" in wanted:
+            values["birth_date"] = self.birth_date
+        if "gestation_weeks" in wanted:
+            values["gestation_weeks"] = self.gestation_weeks
+        if "gestation_days" in wanted:
+            values["gestation_days"] = self.gestation_days
+        if "estimated_date_delivery" in wanted or "estimated_date_delivery_string" in wanted:
+            edd = self.estimated_date_delivery()
+            if "estimated_date_delivery" in wanted:
+                values["estimated_date_delivery"] = edd
+            if "estimated_date_delivery_string" in wanted:
+                values["estimated_date_delivery_string"] = None if edd is None else edd.strftime('%a %d %B, %Y')
+        if "sex" in wanted:
+            values["sex"] = self.sex
+        return values
+
+    def measurement_dates(self, fields: frozenset = None) -> dict:
+        wanted = MEASUREMENT_FIELDS["measurement_dates"] if fields is None else fields
+        values = {}
+        if "observation_date" in wanted:
+            values["observation_date"] = self.observation_date
+        if "chronological_decimal_age" in wanted:
+            values["chronological_decimal_age"] = self.chronological_decimal_age
+        if "corrected_decimal_age" in wanted:
+            values["corrected_decimal_age"] = self.corrected_decimal_age
+        if "chronological_calendar_age" in wanted or "corrected_calendar_age" in wanted:
+            chronological_age = chronological_calendar_age(
+                birth_date=self.birth_date,
+                observation_date=self.observation_date)
+            if "chronological_calendar_age" in wanted:
+                values["chronological_calendar_age"] = chronological_age
+            if "corrected_calendar_age" in wanted:
+                edd = self.estimated_date_delivery()
+                values["corrected_calendar_age"] = chronological_age if edd is None else chronological_calendar_age(edd, self.observation_date)
+        if "corrected_gestational_age" in wanted:
+            gestational_age = corrected_gestational_age(
+                birth_date=self.birth_date,
+                observation_date=self.observation_date,
+                gestation_weeks=self.gestation_weeks,
+                gestation_days=self.gestation_days)
+            values["corrected_gestational_age"] = {
+                "corrected_gestation_weeks": gestational_age["corrected_gestation_weeks"],
+                "corrected_gestation_days": gestational_age["corrected_gestation_days"],
+            }
+        if "clinician_decimal_age_comment" in wanted or "lay_decimal_age_comment" in wanted:
+            age_comments = comment_prematurity_correction(
+                chronological_decimal_age=self.chronological_decimal_age,
+                corrected_decimal_age=self.corrected_decimal_age,
+                gestation_weeks=self.gestation_weeks,
+                gestation_days=self.gestation_days)
+            if "clinician_decimal_age_comment" in wanted:
+                values["clinician_decimal_age_comment"] = age_comments['clinician_comment']
+            if "lay_decimal_age_comment" in wanted:
+                values["lay_decimal_age_comment"] = age_comments['lay_comment']
+        return values
+
+    def child_observation_value(self, fields: frozenset = None) -> dict:
+        return child_observation_value(self.measurement_method, self.observation_value, fields)
+
+    def measurement_calculated_values(self, fields: frozenset = None) -> dict:
+        return measurement_calculated_values(self.measurement_method, self.sds, self.centile, fields)
+
+    def __repr__(self):
+        return f"<MeasurementResult {self.measurement_method} {self.observation_value} at {self.corrected_decimal_age}: sds={self.sds}, centile={self.centile}>"
+
+
+def child_observation_value(measurement_method: str, observation_value: float, fields: frozenset = None) -> dict:
+    values = {
+        "measurement_method": measurement_method,
+        "observation_value": observation_value
+    }
+    return values if fields is None else {field: value for field, value in values.items() if field in fields}
+
+
+def measurement_calculated_values(measurement_method: str, sds: float, centile: float, fields: frozenset = None) -> dict:
+    wanted = MEASUREMENT_FIELDS["measurement_calculated_values"] if fields is None else fields
+    values = {}
+    if "measurement_method" in wanted:
+        values["measurement_method"] = measurement_method
+    if "sds" in wanted:
+        values["sds"] = sds
+    if "centile" in wanted:
+        values["centile"] = centile
+    if "centile_band" in wanted:
+        values["centile_band"] = centile_band_for_centile(sds=sds, measurement_method=measurement_method)
+    return values
+
+
+def measurement_fields(names) -> frozenset:
+    """
+    The fields of the measurement object to return (see MeasurementResult.as_dict), from a list of the names of
+    fields, such as sds and centile, or of whole groups, such as measurement_dates.
+    Raises a ValueError if a name is neither, or if no names are given.
+    """
+    if not names:
+        raise ValueError("At least one field of the measurement object must be given.")
+    selected = set()
+    for name in names:
+        if name in MEASUREMENT_FIELDS:
+            selected.update(MEASUREMENT_FIELDS[name])
+        elif any(name in group_fields for group_fields in MEASUREMENT_FIELDS.values()):
+            selected.add(name)
+        else:
+            raise ValueError(f"{name} is not a field of the measurement object.")
+    return frozenset(selected)
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import numpy as np
+
+"""
+The LMS reference data are stored as JSON: for each reference, a nested dict of measurement_method and sex,
+each holding a list of {"decimal_age", "L", "M", "S"} dicts.
+Those lists are compiled here, once, when the reference data loads, into ReferenceTable objects: contiguous
+float64 arrays of ages, L, M and S. All LMS lookups in global_functions go through these tables.
+
+Tables are registered against (reference, measurement_method, sex), where reference is one of the names in
+parameter_constants (eg UK90_PRETERM, UK_WHO_INFANT, TRISOMY_21).
+
+Each reference registers its JSON file with register_reference_data when its module is imported, but the file
+is only loaded and compiled the first time one of its tables is asked for. Servers which want every reference
+ready before the first request can call preload(). The seconds each reference took to load are kept in
+REFERENCE_LOAD_SECONDS.
+
+The compiled tables of every reference can also be written, at build time, to a single binary artifact
+(see write_reference_artifact). If the artifact is present, references load from it instead of their JSON:
+the tables are then read-only views of the memory-mapped file, so processes on the same machine share one copy
+and nothing is parsed. To build it: `python -m rcpchgrowth.build_reference_artifact` (from the rcpchgrowth folder)
+"""
+
+
+class ReferenceTable:
+    """
+    The LMS values of one reference, for one measurement_method and sex.
+    `ages`, `l`, `m` and `s` are read-only float64 arrays of equal length, sorted by decimal age.
+    Missing values in the source data (stored in the JSON as empty strings) are held as NaN.
+
+    `cubic_coefficients` holds, for each interval from ages[i] to ages[i + 1], the coefficients of the
+    cubic interpolating L, M and S through ages[i - 1] to ages[i + 2] (see cubic_coefficients below).
+    They are computed from the LMS unless precomputed_coefficients are supplied (as from the binary artifact).
+    """
+
+    __slots__ = ("reference", "measurement_method", "sex", "ages", "l", "m", "s", "cubic_coefficients")
+
+    def __init__(
+        self,
+        reference: str,
+        measurement_method: str,
+        sex: str,
+        ages: np.ndarray,
+        l: np.ndarray,
+        m: np.ndarray,
+        s: np.ndarray,
+        precomputed_coefficients: np.ndarray = None
+    ):
+        self.reference = reference
+        self.measurement_method = measurement_method
+        self.sex = sex
+        self.ages = _read_only_float_array(ages)
+        self.l = _read_only_float_array(l)
+        self.m = _read_only_float_array(m)
+        self.s = _read_only_float_array(s)
+        if precomputed_coefficients is None:
+            precomputed_coefficients = cubic_coefficients(self.ages, np.stack((self.l, self.m, self.s)))
+        self.cubic_coefficients = _read_only_float_array(precomputed_coefficients)
+
+    @classmethod
+    def from_lms_array(cls, reference: str, measurement_method: str, sex: str, lms_array: list):
+        """
+        Builds a table from a list of {"decimal_age", "L", "M", "S"} dicts as stored in the reference JSON
+        """
+        return cls(
+            reference=reference,
+            measurement_method=measurement_method,
+            sex=sex,
+            ages=[_lms_float(lms_element["decimal_age"]) for lms_element in lms_array],
+            l=[_lms_float(lms_element["L"]) for lms_element in lms_array],
+            m=[_lms_float(lms_element["M"]) for lms_element in lms_array],
+            s=[_lms_float(lms_element["S"]) for lms_element in lms_array])
+
+    def __len__(self):
+        return len(self.ages)
+
+    def __repr__(self):
+        return f"<ReferenceTable {self.reference} {self.measurement_method} {self.sex}: {len(self)} ages>"
+
+
+REFERENCE_TABLES = {}
+REFERENCE_DATA_FILES = {}
+REFERENCE_LOAD_SECONDS = {}
+_reference_load_lock = threading.Lock()
+
+REFERENCE_ARTIFACT_FILE = os.path.join(os.path.dirname(__file__), "data_tables", "reference_tables.lms")
+REFERENCE_ARTIFACT_MAGIC = b"RCPCHLMS"
+REFERENCE_ARTIFACT_VERSION = 1
+# the artifact once opened: its file path, header and memory map
+_reference_artifact = {}
+
+
+def register_reference_data(reference: str, file_path: str):
+    """
+    Registers the JSON file holding the LMS data of a reference, to be loaded when first used
+    """
+    REFERENCE_DATA_FILES[reference] = file_path
+
+
+def load_reference_data(reference: str):
+    """
+    Loads the tables of a reference, if it has not been already, and records the time it took in
+    REFERENCE_LOAD_SECONDS. Tables come from the binary artifact if it holds the reference as compiled from its
+    current JSON file, otherwise the JSON file is loaded and compiled.
+    """
+    with _reference_load_lock:
+        if reference in REFERENCE_LOAD_SECONDS:
+            return
+        start = time.perf_counter()
+        artifact_tables = _reference_artifact_tables(reference)
+        if artifact_tables is not None:
+            REFERENCE_TABLES.update(artifact_tables)
+        else:
+            with open(REFERENCE_DATA_FILES[reference]) as json_file:
+                reference_data = json.load(json_file)
+            compile_reference_tables(reference, reference_data)
+        REFERENCE_LOAD_SECONDS[reference] = time.perf_counter() - start
+
+
+def preload() -> dict:
+    """
+    Loads every registered reference now, rather than on first use.
+    Returns the seconds each reference took to load.
+    """
+    for reference in list(REFERENCE_DATA_FILES):
+        load_reference_data(reference)
+    return dict(REFERENCE_LOAD_SECONDS)
+
+
+def compile_reference_tables(reference: str, reference_data: dict):
+    """
+    Compiles every measurement_method and sex in the JSON of a reference into a ReferenceTable and
+    registers it against (reference, measurement_method, sex).
+    """
+    for measurement_method, sexes in reference_data["measurement"].items():
+        for sex, lms_array in sexes.items():
+            REFERENCE_TABLES[(reference, measurement_method, sex)] = ReferenceTable.from_lms_array(
+                reference=reference, measurement_method=measurement_method, sex=sex, lms_array=lms_array)
+
+
+def reference_table(reference: str, measurement_method: str, sex: str) -> ReferenceTable:
+    """
+    Returns the compiled ReferenceTable for a reference, measurement_method and sex, loading the reference first
+    if it has not been used before.
+    Raises a LookupError if the reference has no data for that measurement_method and sex.
+    """
+    key = (reference, measurement_method, sex)
+    if key not in REFERENCE_TABLES and reference in REFERENCE_DATA_FILES:
+        load_reference_data(reference)
+    try:
+        return REFERENCE_TABLES[key]
+    except KeyError:
+        raise LookupError(f"There is no {measurement_method} reference data for {sex}s in {reference}.")
+
+
+def write_reference_artifact(file_path: str = None) -> dict:
+    """
+    Compiles the JSON file of every registered reference and writes all the tables to one binary artifact.
+    The file is an 8 byte magic number, the format version and header length (little-endian uint32s), a JSON
+    header and then, 64 byte aligned, the little-endian float64 data of each table in turn: ages, L, M and S,
+    followed by the cubic coefficients. The header lists each table with its length and offset, and the SHA-256
+    of each source JSON file, so that a stale artifact is never used.
+    Returns the header.
+    """
+    file_path = file_path or REFERENCE_ARTIFACT_FILE
+    sources = {}
+    tables = []
+    blocks = []
+    offset = 0
+    for reference, source_file_path in REFERENCE_DATA_FILES.items():
+        with open(source_file_path, "rb") as json_file:
+            source = json_file.read()
+        sources[reference] = hashlib.sha256(source).hexdigest()
+        for measurement_method, sexes in json.loads(source)["measurement"].items():
+            for sex, lms_array in sexes.items():
+                table = ReferenceTable.from_lms_array(
+                    reference=reference, measurement_method=measurement_method, sex=sex, lms_array=lms_array)
+                block = np.concatenate((table.ages, table.l, table.m, table.s, table.cubic_coefficients.ravel()))
+                blocks.append(block.astype("<f8"))
+                tables.append({
+                    "reference": reference,
+                    "measurement_method": measurement_method,
+                    "sex": sex,
+                    "length": len(table),
+                    "offset": offset
+                })
+                offset += block.nbytes
+
+    header = {"sources": sources, "tables": tables}
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix = REFERENCE_ARTIFACT_MAGIC + struct.pack("<II", REFERENCE_ARTIFACT_VERSION, len(header_bytes))
+    padding = -(len(prefix) + len(header_bytes)) % 64
+
+    # written alongside and then moved into place, so a running server never maps a partly written file
+    temporary_file_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temporary_file_path, "wb") as artifact:
+        artifact.write(prefix + header_bytes + b"\0" * padding)
+        for block in blocks:
+            artifact.write(block.tobytes())
+    os.replace(temporary_file_path, file_path)
+    return header
+
+
+def use_reference_artifact(file_path: str = None):
+    """
+    Sets the binary artifact references are loaded from (None to load them from JSON only).
+    Only references loaded after the call are affected.
+    """
+    global REFERENCE_ARTIFACT_FILE
+    with _reference_load_lock:
+        REFERENCE_ARTIFACT_FILE = file_path
+        _reference_artifact.clear()
+
+
+def _open_reference_artifact():
+    # maps the artifact, once. Returns None if there is no usable artifact
+    if _reference_artifact.get("file_path") != REFERENCE_ARTIFACT_FILE:
+        _reference_artifact.clear()
+        _reference_artifact["file_path"] = REFERENCE_ARTIFACT_FILE
+        if REFERENCE_ARTIFACT_FILE is None or not os.path.exists(REFERENCE_ARTIFACT_FILE):
+            return None
+        try:
+            buffer = np.memmap(REFERENCE_ARTIFACT_FILE, dtype=np.uint8, mode="r")
+            prefix_length = len(REFERENCE_ARTIFACT_MAGIC) + 8
+            magic = bytes(buffer[:len(REFERENCE_ARTIFACT_MAGIC)])
+            version, header_length = struct.unpack("<II", bytes(buffer[len(REFERENCE_ARTIFACT_MAGIC):prefix_length]))
+            if magic != REFERENCE_ARTIFACT_MAGIC or version != REFERENCE_ARTIFACT_VERSION:
+                print(f"{REFERENCE_ARTIFACT_FILE} is not a version {REFERENCE_ARTIFACT_VERSION} reference artifact: "
+                      f"loading reference data from JSON.")
+                return None
+            header = json.loads(bytes(buffer[prefix_length:prefix_length + header_length]))
+            data_start = prefix_length + header_length + (-(prefix_length + header_length) % 64)
+            # each table is 16 float64 columns (ages, L, M, S and 12 cubic coefficients) of its length
+            data_end = max((entry["offset"] + 16 * 8 * entry["length"] for entry in header["tables"]), default=0)
+            if len(buffer) < data_start + data_end:
+                raise ValueError("the file is shorter than its header describes")
+        except (struct.error, ValueError, KeyError, TypeError) as error:
+            # an empty, truncated or corrupt artifact: the reference data is still in its JSON
+            print(f"{REFERENCE_ARTIFACT_FILE} is not a readable reference artifact ({error}): "
+                  f"loading reference data from JSON.")
+            return None
+        _reference_artifact["header"] = header
+        _reference_artifact["data_start"] = data_start
+        _reference_artifact["buffer"] = buffer
+    return _reference_artifact.get("buffer")
+
+
+def _reference_artifact_tables(reference: str):
+    # returns the tables of a reference as views of the artifact, or None if the artifact
+    # is missing or does not hold the reference as compiled from its current JSON file
+    buffer = _open_reference_artifact()
+    if buffer is None:
+        return None
+    header = _reference_artifact["header"]
+    if reference not in header["sources"]:
+        return None
+    with open(REFERENCE_DATA_FILES[reference], "rb") as json_file:
+        if hashlib.sha256(json_file.read()).hexdigest() != header["sources"][reference]:
+            print(f"The reference artifact is out of date for {reference}: loading its reference data from JSON.")
+            return None
+
+    tables = {}
+    for entry in header["tables"]:
+        if entry["reference"] != reference:
+            continue
+        length = entry["length"]
+        block = np.frombuffer(
+            buffer, dtype="<f8", count=16 * length, offset=_reference_artifact["data_start"] + entry["offset"])
+        tables[(reference, entry["measurement_method"], entry["sex"])] = ReferenceTable(
+            reference=reference,
+            measurement_method=entry["measurement_method"],
+            sex=entry["sex"],
+            ages=block[:length],
+            l=block[length:2 * length],
+            m=block[2 * length:3 * length],
+            s=block[3 * length:4 * length],
+            precomputed_coefficients=block[4 * length:].reshape(length, 3, 4))
+    return tables
+
+
+def cubic_coefficients(ages: np.ndarray, parameters: np.ndarray) -> np.ndarray:
+    """
+    Precomputes the cubic interpolation of global_functions.cubic_interpolation for every interval of a reference.
+    For each interval from ages[i] to ages[i + 1] that has a reference age below it and two above it, returns the
+    coefficients c0..c3 of the Lagrange polynomial through ages[i - 1], ages[i], ages[i + 1] and ages[i + 2] of each
+    row of `parameters`, in powers of u = age - ages[i], so that interpolation is the Horner evaluation
+    c0 + u * (c1 + u * (c2 + u * c3)).
+    Returns an array of shape (len(ages), number of parameter rows, 4). Intervals where cubic interpolation is not
+    possible (the first, the last and beyond the end of the reference) are NaN.
+    """
+    coefficients = np.full((len(ages), len(parameters), 4), np.nan)
+    interval = np.arange(1, len(ages) - 2)
+    if len(interval) == 0:
+        return coefficients
+
+    # the four reference ages relative to the start of each interval
+    nodes = np.stack([ages[interval + offset] - ages[interval] for offset in (-1, 0, 1, 2)])
+    interval_coefficients = np.zeros((len(parameters), len(interval), 4))
+    for node in range(4):
+        roots = nodes[[other for other in range(4) if other != node]]
+        denominator = np.prod(nodes[node] - roots, axis=0)
+        weight = parameters[:, interval + node - 1] / denominator
+        # expand (u - r0)(u - r1)(u - r2) = u^3 - e1 u^2 + e2 u - e3
+        e1 = roots[0] + roots[1] + roots[2]
+        e2 = roots[0] * roots[1] + roots[0] * roots[2] + roots[1] * roots[2]
+        e3 = roots[0] * roots[1] * roots[2]
+        interval_coefficients[..., 0] -= weight * e3
+        interval_coefficients[..., 1] += weight * e2
+        interval_coefficients[..., 2] -= weight * e1
+        interval_coefficients[..., 3] += weight
+    # the polynomial passes through the reference value at the start of each interval
+    interval_coefficients[..., 0] = parameters[:, interval]
+
+    coefficients[interval] = interval_coefficients.transpose(1, 0, 2)
+    return coefficients
+
+
+def _lms_float(value) -> float:
+    # missing L, M or S values are stored in the reference JSON as empty strings
+    if value == "":
+        return np.nan
+    return float(value)
+
+
+def _read_only_float_array(values) -> np.ndarray:
+    array = np.ascontiguousarray(values, dtype=np.float64)
+    array.setflags(write=False)
+    return array
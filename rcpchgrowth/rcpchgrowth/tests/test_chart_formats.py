@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from ..chart_formats import columnar_chart, columnar_lines, legacy_chart, delta_encode, delta_decode
+from ..constants import ADAPTIVE_SAMPLING_TOLERANCES, COLE_TWO_THIRDS_SDS_NINE_CENTILES, THREE_PERCENT_CENTILES
+from ..global_functions import create_uk_who_chart, create_trisomy_21_chart, create_turner_chart
+
+
+@pytest.mark.parametrize("create_chart", [create_uk_who_chart, create_trisomy_21_chart, create_turner_chart])
+@pytest.mark.parametrize("fixed_point_delta", [False, True])
+def test_columnar_chart_decodes_to_the_chart(create_chart, fixed_point_delta):
+    chart = create_chart(COLE_TWO_THIRDS_SDS_NINE_CENTILES)
+    columnar = columnar_chart(chart, fixed_point_delta=fixed_point_delta)
+    # as a client would receive it
+    assert legacy_chart(json.loads(json.dumps(columnar))) == chart
+    assert len(json.dumps(columnar)) < len(json.dumps(chart)) / 3
+
+
+def test_columnar_adaptive_chart_decodes_to_the_chart():
+    chart = create_uk_who_chart(THREE_PERCENT_CENTILES, tolerances=ADAPTIVE_SAMPLING_TOLERANCES)
+    assert legacy_chart(columnar_chart(chart, fixed_point_delta=True)) == chart
+
+
+def test_delta_encode_skips_missing_values():
+    assert delta_encode([1.5, None, 1.25, 2.0], 10000) == [15000, None, -2500, 7500]
+    assert delta_decode([15000, None, -2500, 7500], 10000) == [1.5, None, 1.25, 2.0]
+
+
+def test_columnar_lines_must_share_their_ages():
+    lines = [
+        {"sds": -2.0, "centile": 2.0, "data": [{"l": 2.0, "x": 0.0, "y": 50.0}]},
+        {"sds": 2.0, "centile": 98.0, "data": [{"l": 98.0, "x": 0.1, "y": 55.0}]}]
+    with pytest.raises(ValueError):
+        columnar_lines(lines)
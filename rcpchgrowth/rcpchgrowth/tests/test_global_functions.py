@@ -0,0 +1,268 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from ..global_functions import (  # loads and compiles all the reference tables
+    cubic_interpolation, linear_interpolation, nearest_lowest_index, fetch_lms, fetch_lms_batch,
+    z_score, z_score_array, measurement_for_z, measurement_for_z_array, centile, centile_array,
+    measurement_from_sds, generate_centile, generate_centiles, generate_adaptive_centiles, centile_ages, centile_zs,
+    normalize_centile_collection, centile_points, chart_collection, create_uk_who_chart, create_trisomy_21_chart, create_turner_chart)
+from ..constants import ADAPTIVE_SAMPLING_TOLERANCES, COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, THREE_PERCENT_CENTILE_COLLECTION, THREE_PERCENT_CENTILES, CUSTOM_CENTILES, CUSTOM_SDS, MEASUREMENT_METHODS, SEXES, UK_WHO_REFERENCES, TRISOMY_21, TURNERS
+from ..reference_table import REFERENCE_TABLES, preload
+from ..uk_who import select_reference_data_for_uk_who_chart
+
+preload()
+
+
+def all_reference_tables():
+    return [table for table in REFERENCE_TABLES.values() if len(table) > 0]
+
+
+def reference_tables_with_distinct_ages():
+    # many measurement_methods and sexes share the same reference ages: test each set of ages once
+    tables = {}
+    for table in REFERENCE_TABLES.values():
+        if len(table) > 0:
+            tables.setdefault(tuple(table.ages.tolist()), table)
+    return list(tables.values())
+
+
+def linear_scan_nearest_lowest_index(reference_ages, age):
+    """
+    The original linear scan, kept here as the specification the binary search must match
+    """
+    lowest_index = 0
+    for num, reference_age in enumerate(reference_ages):
+        if round(reference_age, 16) == round(age, 16):
+            lowest_index = num
+            break
+        else:
+            if reference_age < age:
+                lowest_index = num
+    exact_match = round(reference_ages[lowest_index], 16) == round(age, 16)
+    return lowest_index, exact_match
+
+
+@pytest.mark.parametrize("table", reference_tables_with_distinct_ages(), ids=repr)
+def test_nearest_lowest_index_matches_linear_scan(table):
+    """
+    Compares the binary search with the linear scan at every reference age, between reference ages,
+    a few floating point steps either side of every reference age and beyond both ends of the reference.
+    """
+    ages = table.ages
+    reference_ages = ages.tolist()
+    test_ages = [reference_ages[0] - 1.0, reference_ages[-1] + 1.0]
+    for reference_age in reference_ages:
+        test_ages.append(reference_age)
+        below = above = reference_age
+        for _ in range(2):
+            below = float(np.nextafter(below, -np.inf))
+            above = float(np.nextafter(above, np.inf))
+            test_ages.extend([below, above])
+    test_ages.extend(((ages[:-1] + ages[1:]) / 2).tolist())
+
+    for age in test_ages:
+        assert nearest_lowest_index(ages, age) == linear_scan_nearest_lowest_index(reference_ages, age)
+
+
+@pytest.mark.parametrize("table", all_reference_tables(), ids=repr)
+def test_cubic_coefficients_match_cubic_interpolation(table):
+    """
+    The precomputed cubic of every interval of every reference, evaluated through the interval,
+    must agree with cubic_interpolation to within floating point rounding.
+    """
+    ages = table.ages.tolist()
+    for index in range(1, len(ages) - 2):
+        for fraction in (0.0, 0.001, 0.25, 0.5, 0.75, 0.999):
+            age = ages[index] + (ages[index + 1] - ages[index]) * fraction
+            u = age - ages[index]
+            for row, values in enumerate((table.l, table.m, table.s)):
+                c0, c1, c2, c3 = table.cubic_coefficients[index, row]
+                expected = cubic_interpolation(
+                    age=age,
+                    age_one_below=ages[index],
+                    age_two_below=ages[index - 1],
+                    age_one_above=ages[index + 1],
+                    age_two_above=ages[index + 2],
+                    parameter_two_below=values[index - 1],
+                    parameter_one_below=values[index],
+                    parameter_one_above=values[index + 1],
+                    parameter_two_above=values[index + 2])
+                assert c0 + u * (c1 + u * (c2 + u * c3)) == pytest.approx(expected, rel=1e-12, abs=1e-12, nan_ok=True)
+
+
+def test_linear_interpolation_matches_numpy_interp():
+    """
+    The closed-form linear interpolation must give exactly what scipy's interp1d (numpy.interp) gave,
+    including at both reference ages, and still refuse ages outside them.
+    """
+    random = np.random.default_rng(seed=6)
+    for _ in range(200):
+        age_one_below = random.uniform(-0.4, 20.0)
+        age_one_above = age_one_below + random.uniform(0.001, 0.1)
+        parameter_one_below, parameter_one_above = random.uniform(-3, 150, 2).tolist()
+        for age in (age_one_below, age_one_above, random.uniform(age_one_below, age_one_above)):
+            expected = np.interp(age, [age_one_below, age_one_above], [parameter_one_below, parameter_one_above])
+            assert linear_interpolation(age, age_one_below, age_one_above, parameter_one_below, parameter_one_above) == expected
+
+    with pytest.raises(ValueError):
+        linear_interpolation(1.5, 1.0, 1.25, 0.0, 1.0)
+
+
+@pytest.mark.parametrize("table", all_reference_tables(), ids=repr)
+def test_fetch_lms_batch_matches_fetch_lms(table):
+    """
+    Every reference age, one floating point step either side of it and points between reference ages
+    must return exactly the values fetch_lms returns. Ages outside the reference return NaN.
+    """
+    reference_ages = table.ages.tolist()
+    test_ages = list(reference_ages)
+    test_ages.extend(float(np.nextafter(age, np.inf)) for age in reference_ages[:-1])
+    test_ages.extend(float(np.nextafter(age, -np.inf)) for age in reference_ages[1:])
+    for age_below, age_above in zip(reference_ages, reference_ages[1:]):
+        test_ages.extend([(age_below + age_above) / 2, age_below + (age_above - age_below) / 10])
+
+    lms = fetch_lms_batch(np.array(test_ages), table)
+
+    for index, age in enumerate(test_ages):
+        expected = fetch_lms(age=age, reference_table=table)
+        for parameter in ("l", "m", "s"):
+            np.testing.assert_equal(lms[parameter][index], expected[parameter])
+
+    outside = fetch_lms_batch(np.array([reference_ages[0] - 0.1, reference_ages[-1] + 0.1]), table)
+    assert np.isnan(outside["l"]).all() and np.isnan(outside["m"]).all() and np.isnan(outside["s"]).all()
+
+
+def test_lms_transform_arrays_match_scalar_functions():
+    """
+    The vectorised z_score, measurement_for_z and centile must give exactly the scalar results,
+    including the log form of the transform where L is 0.
+    """
+    random = np.random.default_rng(seed=21)
+    l = random.uniform(-3, 3, 500)
+    l[::10] = 0.0
+    m = random.uniform(3, 150, 500)
+    s = random.uniform(0.02, 0.2, 500)
+    observation = m * random.uniform(0.7, 1.3, 500)
+    z = random.uniform(-4, 4, 500)
+
+    sds = z_score_array(l=l, m=m, s=s, observation=observation)
+    measurements = measurement_for_z_array(z=z, l=l, m=m, s=s)
+    centiles = centile_array(z)
+
+    for index in range(500):
+        np.testing.assert_equal(sds[index], z_score(l=l[index], m=m[index], s=s[index], observation=observation[index]))
+        np.testing.assert_equal(measurements[index], measurement_for_z(z=z[index], l=l[index], m=m[index], s=s[index]))
+        np.testing.assert_equal(centiles[index], centile(z[index]))
+
+
+def scalar_generate_centile(z, centile, measurement_method, sex, reference_table, reference):
+    """
+    The original point by point generate_centile, kept here as the specification the vectorised curve must match
+    """
+    centile_measurements = []
+    for age in centile_ages(min_age=float(reference_table.ages[0]), max_age=float(reference_table.ages[-1])):
+        try:
+            measurement = measurement_from_sds(
+                reference=reference, measurement_method=measurement_method, requested_sds=z, sex=sex, age=age, born_preterm=True)
+        except ValueError:
+            measurement = None
+        rounded = round(measurement, 4) if measurement is not None else None
+        centile_measurements.append({"l": centile, "x": round(age, 4), "y": rounded})
+    return centile_measurements
+
+
+def chart_curves():
+    curves = []
+    for measurement_method in MEASUREMENT_METHODS:
+        for sex in SEXES:
+            for segment in UK_WHO_REFERENCES:
+                table = select_reference_data_for_uk_who_chart(segment, measurement_method, sex)
+                if len(table) > 0:
+                    curves.append(("uk-who", measurement_method, sex, table))
+            if (TRISOMY_21, measurement_method, sex) in REFERENCE_TABLES:
+                curves.append((TRISOMY_21, measurement_method, sex, REFERENCE_TABLES[(TRISOMY_21, measurement_method, sex)]))
+    curves.append((TURNERS, "height", "female", REFERENCE_TABLES[(TURNERS, "height", "female")]))
+    return curves
+
+
+@pytest.mark.parametrize("reference,measurement_method,sex,table", chart_curves(), ids=repr)
+def test_generate_centile_matches_point_by_point(reference, measurement_method, sex, table):
+    for z, centile_label in ((-2.67, 0.4), (0.0, 50.0), (2.67, 99.6)):
+        assert generate_centile(
+            z=z, centile=centile_label, measurement_method=measurement_method, sex=sex, reference_table=table,
+            reference=reference) == scalar_generate_centile(z, centile_label, measurement_method, sex, table, reference)
+
+
+@pytest.mark.parametrize("reference,measurement_method,sex,table", chart_curves(), ids=repr)
+def test_generate_centiles_matches_generate_centile(reference, measurement_method, sex, table):
+    zs = centile_zs(centile_collection=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, cole_method=True)
+    curves = generate_centiles(
+        zs=zs, centiles=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, measurement_method=measurement_method, sex=sex,
+        reference_table=table, reference=reference)
+    assert curves == [
+        generate_centile(
+            z=z, centile=centile_label, measurement_method=measurement_method, sex=sex, reference_table=table,
+            reference=reference)
+        for z, centile_label in zip(zs, COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION)]
+
+
+@pytest.mark.parametrize("reference,measurement_method,sex,table", chart_curves(), ids=repr)
+def test_adaptive_centiles_are_within_tolerance(reference, measurement_method, sex, table):
+    zs = centile_zs(centile_collection=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, cole_method=True)
+    tolerance = ADAPTIVE_SAMPLING_TOLERANCES[measurement_method]
+    curves, report = generate_adaptive_centiles(
+        zs=zs, centiles=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, measurement_method=measurement_method, sex=sex,
+        reference_table=table, reference=reference, tolerance=tolerance)
+    fixed_curves = generate_centiles(
+        zs=zs, centiles=COLE_TWO_THIRDS_SDS_NINE_CENTILE_COLLECTION, measurement_method=measurement_method, sex=sex,
+        reference_table=table, reference=reference)
+
+    for curve, fixed_curve, line in zip(curves, fixed_curves, report):
+        assert line["within_tolerance"] and line["max_error"] <= tolerance
+        assert line["points"] == len(curve) < len(fixed_curve)
+        # each line runs from the start to the end of its table
+        assert curve[0]["x"] == round(float(table.ages[0]), 4)
+        assert curve[-1]["x"] == round(float(table.ages[-1]), 4)
+        # and is drawn within tolerance of the weekly then monthly points, allowing for their ages being rounded to
+        # 0.00005 y, over which the steepest preterm lines climb 0.001. The last of those points can fall a
+        # rounding error short of the end of the table, where another reference may take over, so is not compared
+        fixed_curve = [point for point in fixed_curve[:-1] if point["y"] is not None]
+        curve = [point for point in curve if point["y"] is not None]
+        drawn = np.interp([point["x"] for point in fixed_curve], [point["x"] for point in curve], [point["y"] for point in curve])
+        assert np.abs(drawn - [point["y"] for point in fixed_curve]).max() <= tolerance + 0.002
+
+
+def test_charts_generated_in_a_process_pool_are_the_same():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        for create_chart in (create_uk_who_chart, create_trisomy_21_chart, create_turner_chart):
+            assert create_chart(THREE_PERCENT_CENTILES, executor=executor) == create_chart(THREE_PERCENT_CENTILES)
+
+
+def test_normalize_centile_collection():
+    assert normalize_centile_collection() is None
+    assert normalize_centile_collection(centiles=[99.9, 0.1, 0.10001, 50]) == (CUSTOM_CENTILES, (0.1, 50.0, 99.9))
+    assert normalize_centile_collection(sds=[3, -3, 0]) == (CUSTOM_SDS, (-3.0, 0.0, 3.0))
+    assert normalize_centile_collection(sds=[-4, 4]) == (CUSTOM_SDS, (-4.0, 4.0))
+    for invalid in ({"centiles": [0.1], "sds": [3]}, {"centiles": []}, {"centiles": [0]}, {"centiles": [100]},
+                    {"sds": [float("nan")]}, {"sds": list(range(26))}, {"sds": [-5, 5]}, {"centiles": [0.0001]},
+                    {"centiles": [99.9999]}):
+        with pytest.raises(ValueError):
+            normalize_centile_collection(**invalid)
+
+
+def test_centile_points_outside_the_lms_domain_have_no_measurement():
+    curves = centile_points(centiles=[50.0], ages=[1.0, 2.0, 3.0], measurements=np.array([[10.0, np.nan, np.inf]]),
+                            found=np.array([True, True, False]))
+    assert [point["y"] for point in curves[0]] == [10.0, None, None]
+
+
+def test_custom_chart_collections():
+    assert chart_collection(THREE_PERCENT_CENTILES) == chart_collection(centiles=THREE_PERCENT_CENTILE_COLLECTION)
+    centiles, zs = chart_collection(sds=[-3, 3])
+    assert centiles == [0.135, 99.865] and zs == [-3.0, 3.0]
+    chart = create_trisomy_21_chart(THREE_PERCENT_CENTILES, sds=[3, -3])
+    lines = chart[TRISOMY_21]["male"]["height"]
+    assert [(line["sds"], line["centile"]) for line in lines] == [(-3.0, 0.135), (3.0, 99.865)]
+    assert create_trisomy_21_chart(THREE_PERCENT_CENTILES, centiles=THREE_PERCENT_CENTILE_COLLECTION) == create_trisomy_21_chart(THREE_PERCENT_CENTILES)
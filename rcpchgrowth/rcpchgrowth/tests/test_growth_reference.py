@@ -0,0 +1,35 @@
+import pytest
+
+from ..constants import UK_WHO, TURNERS, TRISOMY_21, UK_WHO_REFERENCES
+from ..global_functions import sds_for_measurement, lms_value_array_for_measurement_for_reference
+from ..growth_reference import GROWTH_REFERENCES, GrowthReference, growth_reference
+from ..reference_table import reference_table
+
+
+def test_references_are_registered():
+    assert {UK_WHO, TURNERS, TRISOMY_21} <= set(GROWTH_REFERENCES)
+    assert list(growth_reference(UK_WHO).chart_segments) == UK_WHO_REFERENCES
+    assert growth_reference(UK_WHO).selects_by_preterm
+    assert not growth_reference(TRISOMY_21).selects_by_preterm
+
+
+def test_unknown_reference_raises_value_error():
+    with pytest.raises(ValueError):
+        lms_value_array_for_measurement_for_reference(
+            reference="cdc", age=1.0, measurement_method="height", sex="male", born_preterm=False)
+
+
+def test_a_registered_reference_is_dispatched_to(monkeypatch):
+    # a new reference which borrows the trisomy 21 tables
+    def lms_reference_table(age, measurement_method, sex, born_preterm):
+        return reference_table(TRISOMY_21, measurement_method, sex)
+
+    monkeypatch.setitem(GROWTH_REFERENCES, "borrowed", GrowthReference(
+        name="borrowed",
+        lms_reference_table=lms_reference_table,
+        chart_segments={"borrowed": 1.0}))
+
+    assert sds_for_measurement(
+        reference="borrowed", age=5.0, measurement_method="height", observation_value=100.0, sex="female"
+    ) == sds_for_measurement(
+        reference=TRISOMY_21, age=5.0, measurement_method="height", observation_value=100.0, sex="female")
@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from ..global_functions import sds_for_measurement, measurement_from_sds, percentage_median_bmi
+from ..lms_lattice import (
+    LMS_LATTICES, build_lms_lattices, clear_lms_lattices, lattice_lms, load_lms_lattices, save_lms_lattices,
+    verify_lms_lattices)
+
+
+@pytest.fixture(scope="module")
+def lattices():
+    build_lms_lattices()
+    yield dict(LMS_LATTICES)
+    clear_lms_lattices()
+
+
+def test_lms_lattices_match_fetch_lms(lattices):
+    assert verify_lms_lattices() > 0
+
+
+def test_lms_lattices_save_and_load(lattices, tmp_path):
+    file_path = str(tmp_path / "lms_lattice.npz")
+    save_lms_lattices(file_path)
+    report = load_lms_lattices(file_path)
+    assert report["lattices"] == len(lattices)
+    for key, lattice in lattices.items():
+        for array in ("l", "m", "s", "valid"):
+            np.testing.assert_array_equal(getattr(LMS_LATTICES[key], array), getattr(lattice, array))
+
+
+def test_lms_lattices_refuse_a_stale_artifact(lattices, tmp_path):
+    file_path = str(tmp_path / "lms_lattice.npz")
+    save_lms_lattices(file_path)
+    with np.load(file_path) as artifact:
+        arrays = dict(artifact)
+    header = json.loads(str(arrays["header"]))
+    header["sources"]["uk-who"] = "0" * 64
+    arrays["header"] = np.array(json.dumps(header))
+    np.savez(file_path, **arrays)
+    with pytest.raises(ValueError):
+        load_lms_lattices(file_path)
+    assert len(LMS_LATTICES) == len(lattices)
+
+
+def test_lattice_only_holds_whole_days(lattices):
+    assert lattice_lms(reference="uk-who", age=100 / 365.25, measurement_method="weight", sex="male", born_preterm=False) is not None
+    assert lattice_lms(reference="uk-who", age=0.1, measurement_method="weight", sex="male", born_preterm=False) is None
+    assert lattice_lms(reference="uk-who", age=21.0, measurement_method="weight", sex="male", born_preterm=False) is None
+
+
+@pytest.mark.parametrize("reference,measurement_method,sex", [
+    ("uk-who", "height", "male"),
+    ("uk-who", "weight", "female"),
+    ("uk-who", "bmi", "female"),
+    ("uk-who", "ofc", "male"),
+    ("turners-syndrome", "height", "female"),
+    ("trisomy-21", "weight", "male")
+])
+def test_results_are_the_same_with_and_without_lattice(lattices, reference, measurement_method, sex):
+    days = list(range(-119, 7306, 37))
+    functions = [
+        lambda day, born_preterm: sds_for_measurement(
+            reference=reference, age=day / 365.25, measurement_method=measurement_method, observation_value=20.0,
+            sex=sex, born_preterm=born_preterm),
+        lambda day, born_preterm: measurement_from_sds(
+            reference=reference, requested_sds=1.5, measurement_method=measurement_method, sex=sex, age=day / 365.25,
+            born_preterm=born_preterm),
+        lambda day, born_preterm: percentage_median_bmi(
+            reference=reference, age=day / 365.25, actual_bmi=18.0, sex=sex, born_preterm=born_preterm)
+    ]
+
+    def results():
+        outcomes = []
+        for function in functions:
+            for day in days:
+                for born_preterm in (False, True):
+                    try:
+                        outcomes.append(function(day, born_preterm))
+                    except Exception as error:
+                        outcomes.append(type(error))
+        return outcomes
+
+    with_lattice = results()
+    clear_lms_lattices()
+    try:
+        without_lattice = results()
+    finally:
+        LMS_LATTICES.update(lattices)
+    assert with_lattice == without_lattice
@@ -4,6 +4,7 @@ from datetime import datetime
 
 import pytest
 from rcpchgrowth import Measurement
+from rcpchgrowth.measurement_result import MEASUREMENT_FIELDS, MeasurementResult, measurement_fields
 
 # the ACCURACY constant defines the accuracy of the test comparisons
 # owing to variations in statistical calculations it's impossible to get exact
@@ -77,3 +78,88 @@ def test_measurement_class_with_valid_data_set(line):
 #     )
 
     # Should raise a ValueError (sex must be "male" OR "female")
+
+
+def observation_for_line(line):
+    return {
+        "sex": str(line["sex"]),
+        "birth_date": datetime.strptime(line["birth_date"], "%Y-%m-%d"),
+        "observation_date": datetime.strptime(line["observation_date"], "%Y-%m-%d"),
+        "measurement_method": str(line["measurement_method"]),
+        "observation_value": float(line["observation_value"]),
+        "gestation_weeks": int(line["gestation_weeks"]),
+        "gestation_days": int(line["gestation_days"])
+    }
+
+
+def test_measurement_batch_matches_single_measurements():
+    observations = [observation_for_line(line) for line in load_valid_data_set()]
+    results = Measurement.batch(observations, reference="uk-who")
+    assert len(results) == len(observations)
+    for observation, result in zip(observations, results):
+        assert result.measurement == Measurement(reference="uk-who", **observation).measurement
+
+
+def test_measurement_batch_reports_errors_in_place():
+    valid = observation_for_line(load_valid_data_set()[0])
+    in_metres = dict(valid, measurement_method="height", observation_value=1.2)
+    unknown_method = dict(valid, measurement_method="arm_span")
+    results = Measurement.batch([in_metres, valid, unknown_method, valid], reference="uk-who")
+    assert isinstance(results[0], ValueError) and isinstance(results[2], ValueError)
+    assert results[1].measurement == results[3].measurement == Measurement(reference="uk-who", **valid).measurement
+
+
+def test_measurement_result_holds_the_numbers_of_the_measurement_object():
+    line = load_valid_data_set()[0]
+    measurement = Measurement(reference="uk-who", **observation_for_line(line))
+    result = measurement.result
+    assert not hasattr(result, "__dict__")
+    calculated_values = measurement.measurement["measurement_calculated_values"]
+    assert (result.sds, result.centile) == (calculated_values["sds"], calculated_values["centile"])
+    assert result.corrected_decimal_age == measurement.measurement["measurement_dates"]["corrected_decimal_age"]
+    assert result.as_dict() == measurement.measurement
+
+
+def test_measurement_result_returns_only_the_fields_asked_for():
+    measurement = Measurement(reference="uk-who", **observation_for_line(load_valid_data_set()[0]))
+    everything = measurement.measurement
+    assert measurement.result.as_dict(measurement_fields(["sds", "centile"])) == {
+        "measurement_calculated_values": {
+            "sds": everything["measurement_calculated_values"]["sds"],
+            "centile": everything["measurement_calculated_values"]["centile"]}}
+    assert measurement.result.as_dict(measurement_fields(["measurement_dates", "centile_band"])) == {
+        "measurement_dates": everything["measurement_dates"],
+        "measurement_calculated_values": {"centile_band": everything["measurement_calculated_values"]["centile_band"]}}
+    assert measurement.result.as_dict(measurement_fields(MEASUREMENT_FIELDS)) == everything
+    with pytest.raises(ValueError):
+        measurement_fields(["sds", "height_velocity"])
+    with pytest.raises(ValueError):
+        measurement_fields([])
+
+
+def test_measurement_result_of_invalid_parameters_raises_when_serialised():
+    result = Measurement(reference="uk-who", **observation_for_line(load_valid_data_set()[0])).result
+    invalid = MeasurementResult(**{name: getattr(result, name) for name in MeasurementResult.__slots__})
+    invalid.gestation_weeks, invalid.gestation_days = 30, "4"
+    # only the fields whose text is generated from the gestation fail
+    assert invalid.as_dict(measurement_fields(["sds", "centile"])) == result.as_dict(measurement_fields(["sds", "centile"]))
+    with pytest.raises(TypeError):
+        invalid.as_dict()
+    with pytest.raises(TypeError):
+        invalid.as_dict(measurement_fields(["estimated_date_delivery"]))
+
+
+@pytest.mark.parametrize("invalid, error", [
+    ({"sex": "males"}, ValueError),
+    ({"sex": 1}, TypeError),
+    ({"birth_date": "2020-04-01"}, TypeError),
+    ({"measurement_method": "arm_span"}, ValueError),
+    ({"observation_value": "5.0"}, TypeError),
+    ({"reference": "uk90"}, ValueError),
+    ({"gestation_weeks": None}, TypeError)
+])
+def test_measurement_validates_parameters_unless_already_validated(invalid, error):
+    observation = dict(observation_for_line(load_valid_data_set()[0]), reference="uk-who")
+    with pytest.raises(error):
+        Measurement(**dict(observation, **invalid))
+    assert Measurement(validated=True, **observation).measurement == Measurement(**observation).measurement
@@ -0,0 +1,100 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from .. import reference_table as reference_table_module, uk_who  # uk_who registers the UK-WHO reference data files
+from ..constants import UK90_CHILD
+from ..reference_table import (
+    REFERENCE_DATA_FILES, REFERENCE_LOAD_SECONDS, REFERENCE_TABLES, preload, reference_table, use_reference_artifact,
+    write_reference_artifact)
+
+
+@pytest.fixture
+def unloaded_references(monkeypatch):
+    # a state in which no reference has been loaded, restored afterwards
+    monkeypatch.setattr(reference_table_module, "REFERENCE_TABLES", {})
+    monkeypatch.setattr(reference_table_module, "REFERENCE_LOAD_SECONDS", {})
+
+
+def test_preload_loads_every_registered_reference():
+    load_seconds = preload()
+    assert set(load_seconds) == set(REFERENCE_DATA_FILES)
+    assert all(seconds >= 0 for seconds in load_seconds.values())
+
+
+def test_reference_loads_on_first_use(monkeypatch):
+    # start from a state in which UK90 child has not been loaded
+    monkeypatch.setattr(
+        reference_table_module, "REFERENCE_TABLES",
+        {key: table for key, table in REFERENCE_TABLES.items() if key[0] != UK90_CHILD})
+    monkeypatch.delitem(REFERENCE_LOAD_SECONDS, UK90_CHILD, raising=False)
+
+    table = reference_table(UK90_CHILD, "height", "male")
+
+    assert len(table) > 0
+    assert UK90_CHILD in REFERENCE_LOAD_SECONDS
+
+
+def test_missing_data_raises_lookup_error():
+    with pytest.raises(LookupError):
+        reference_table(UK90_CHILD, "wingspan", "male")
+
+
+def test_references_load_from_artifact(tmp_path, monkeypatch, unloaded_references):
+    preload()
+    compiled_from_json = dict(reference_table_module.REFERENCE_TABLES)
+    monkeypatch.setattr(reference_table_module, "REFERENCE_TABLES", {})
+    monkeypatch.setattr(reference_table_module, "REFERENCE_LOAD_SECONDS", {})
+
+    artifact_file_path = str(tmp_path / "reference_tables.lms")
+    write_reference_artifact(artifact_file_path)
+    # the artifact in use is restored afterwards
+    monkeypatch.setattr(reference_table_module, "REFERENCE_ARTIFACT_FILE", artifact_file_path)
+    use_reference_artifact(artifact_file_path)
+    preload()
+
+    buffer = reference_table_module._reference_artifact["buffer"]
+    assert set(reference_table_module.REFERENCE_TABLES) == set(compiled_from_json)
+    for key, table in reference_table_module.REFERENCE_TABLES.items():
+        if len(table) > 0:
+            assert np.shares_memory(table.ages, buffer)
+        for array in ("ages", "l", "m", "s", "cubic_coefficients"):
+            np.testing.assert_array_equal(getattr(table, array), getattr(compiled_from_json[key], array))
+
+
+def test_stale_artifact_is_not_used(tmp_path, monkeypatch, unloaded_references):
+    artifact_file_path = str(tmp_path / "reference_tables.lms")
+    write_reference_artifact(artifact_file_path)
+    # the artifact in use is restored afterwards
+    monkeypatch.setattr(reference_table_module, "REFERENCE_ARTIFACT_FILE", artifact_file_path)
+    use_reference_artifact(artifact_file_path)
+
+    # the JSON of UK90 child changes after the artifact was built
+    changed_json_file_path = str(tmp_path / "uk90_child.json")
+    shutil.copyfile(REFERENCE_DATA_FILES[UK90_CHILD], changed_json_file_path)
+    with open(changed_json_file_path, "a") as json_file:
+        json_file.write("\n")
+    monkeypatch.setitem(REFERENCE_DATA_FILES, UK90_CHILD, changed_json_file_path)
+
+    assert reference_table_module._reference_artifact_tables(UK90_CHILD) is None
+    assert reference_table_module._reference_artifact_tables(uk_who.UK90_PRETERM) is not None
+
+
+@pytest.mark.parametrize("truncated_to", ["empty", "prefix", "header", "data"])
+def test_truncated_artifact_is_not_used(tmp_path, monkeypatch, unloaded_references, truncated_to):
+    artifact_file_path = str(tmp_path / "reference_tables.lms")
+    write_reference_artifact(artifact_file_path)
+    with open(artifact_file_path, "rb") as artifact:
+        content = artifact.read()
+    prefix_length = len(reference_table_module.REFERENCE_ARTIFACT_MAGIC) + 8
+    length = {"empty": 0, "prefix": prefix_length - 2, "header": prefix_length + 10, "data": len(content) - 100}[truncated_to]
+    with open(artifact_file_path, "wb") as artifact:
+        artifact.write(content[:length])
+    # the artifact in use is restored afterwards
+    monkeypatch.setattr(reference_table_module, "REFERENCE_ARTIFACT_FILE", artifact_file_path)
+    use_reference_artifact(artifact_file_path)
+
+    assert reference_table_module._reference_artifact_tables(UK90_CHILD) is None
+    # the reference data is loaded from its JSON instead
+    assert len(reference_table(UK90_CHILD, "height", "male")) > 0
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from ..constants import MEASUREMENT_METHODS, SEXES
+from ..uk_who import (
+    REFERENCE_DATA_ABSENT_INDEX, UK_WHO_REFERENCE_INDEX, UK_WHO_SEGMENTS, reference_data_absent, uk_who_reference,
+    uk_who_reference_data_present, uk_who_segment_codes)
+
+
+def ages_around_boundaries(boundaries):
+    # every boundary, a few floating point steps either side of it, between boundaries and beyond both ends
+    ages = [-np.inf, np.inf, float("nan"), -1.0, 25.0]
+    for boundary in boundaries:
+        below = above = boundary
+        ages.append(boundary)
+        for _ in range(3):
+            below = float(np.nextafter(below, -np.inf))
+            above = float(np.nextafter(above, np.inf))
+            ages.extend([below, above])
+    ages.extend(((np.array(boundaries[:-1]) + np.array(boundaries[1:])) / 2).tolist())
+    ages.extend(np.arange(-119, 7400) / 365.25)
+    return ages
+
+
+@pytest.mark.parametrize("born_preterm", [False, True])
+def test_uk_who_segment_codes_match_uk_who_reference(born_preterm):
+    ages = ages_around_boundaries(UK_WHO_REFERENCE_INDEX[born_preterm].boundaries)
+    codes = uk_who_segment_codes(np.array(ages), born_preterm)
+    for age, code in zip(ages, codes.tolist()):
+        # uk_who_reference returns a ValueError instance for ages without a reference
+        reference = uk_who_reference(age, born_preterm)
+        assert code == (UK_WHO_SEGMENTS.index(reference) if isinstance(reference, str) else -1)
+
+
+@pytest.mark.parametrize("measurement_method", MEASUREMENT_METHODS)
+@pytest.mark.parametrize("sex", SEXES)
+def test_reference_data_present_matches_reference_data_absent(measurement_method, sex):
+    ages = ages_around_boundaries(REFERENCE_DATA_ABSENT_INDEX[(measurement_method, sex)].boundaries)
+    present = uk_who_reference_data_present(np.array(ages), measurement_method, sex)
+    for age, age_present in zip(ages, present.tolist()):
+        assert age_present == (not reference_data_absent(age, measurement_method, sex)[0])
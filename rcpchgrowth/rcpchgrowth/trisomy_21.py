@@ -1,6 +1,7 @@
-import json
 import pkg_resources
 from .constants import *
+from .reference_table import register_reference_data, reference_table
+from .growth_reference import register_growth_reference
 # from .global_functions import z_score, cubic_interpolation, linear_interpolation, centile, measurement_for_z, nearest_lowest_index, fetch_lms
 # import timeit #see below, comment back in if timing functions in this module
 
@@ -21,9 +22,9 @@ reference: reference data
 #load the reference data
 
 TRISOMY_21_DATA = pkg_resources.resource_filename(__name__, "/data_tables/trisomy_21.json")
-with open(TRISOMY_21_DATA) as json_file:
-            TRISOMY_21_DATA = json.load(json_file)
-            json_file.close()
+
+# the data are loaded on first use (see reference_table.preload)
+register_reference_data(TRISOMY_21, TRISOMY_21_DATA)
 
 def reference_data_absent( 
         age: float,
@@ -61,15 +62,26 @@ def reference_data_absent(
 def trisomy_21_lms_array_for_measurement_and_sex(
         measurement_method: str,
         sex: str,
-        age: float
+        age: float,
+        born_preterm: bool = False
     ):
+    # born_preterm is unused: the trisomy 21 reference does not include prematurity
 
     data_invalid, data_error = reference_data_absent(age=age, measurement_method=measurement_method, sex=sex)
 
     if data_invalid:
         raise LookupError(data_error)
     else:
-        return TRISOMY_21_DATA["measurement"][measurement_method][sex]
+        return reference_table(TRISOMY_21, measurement_method, sex)
 
 def select_reference_data_for_trisomy_21(measurement_method:str, sex:str):
-    return trisomy_21_lms_array_for_measurement_and_sex(measurement_method=measurement_method, sex=sex, age=1.0)
\ No newline at end of file
+    return trisomy_21_lms_array_for_measurement_and_sex(measurement_method=measurement_method, sex=sex, age=TRISOMY_21_CHART_SEGMENTS[TRISOMY_21])
+
+
+# the trisomy 21 chart is one segment, with an age at which all its tables are valid
+TRISOMY_21_CHART_SEGMENTS = {TRISOMY_21: 1.0}
+
+register_growth_reference(
+    TRISOMY_21,
+    lms_reference_table=trisomy_21_lms_array_for_measurement_and_sex,
+    chart_segments=TRISOMY_21_CHART_SEGMENTS)
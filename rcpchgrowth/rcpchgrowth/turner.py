@@ -1,6 +1,7 @@
-import json
 import pkg_resources
 from .constants import *
+from .reference_table import register_reference_data, reference_table
+from .growth_reference import register_growth_reference
 # import timeit #see below, comment back in if timing functions in this module
 
 """
@@ -20,15 +21,17 @@ reference: reference data
 #load the reference data
 
 TURNER_DATA = pkg_resources.resource_filename(__name__, "/data_tables/turner.json")
-with open(TURNER_DATA) as json_file:
-            TURNER_DATA = json.load(json_file)
-            json_file.close()
+
+# the data are loaded on first use (see reference_table.preload)
+register_reference_data(TURNERS, TURNER_DATA)
 
 def turner_lms_array_for_measurement_and_sex(
         measurement_method: str,    
         sex: str,  
-        age: float
+        age: float,
+        born_preterm: bool = False
     ):
+    # born_preterm is unused: the Turner reference is the same for all children
 
     invalid_data, data_error = reference_data_absent(age=age, measurement_method=measurement_method, sex=sex)
 
@@ -37,7 +40,7 @@ def turner_lms_array_for_measurement_and_sex(
 
     # Get the Turner reference data
     try:
-        return TURNER_DATA["measurement"][measurement_method][sex]
+        return reference_table(TURNERS, measurement_method, sex)
     except: # there is no reference for the age supplied
         raise LookupError("The Turner's syndrome reference cannot be found.")
     
@@ -74,4 +77,13 @@ def reference_data_absent(
         return False, "Valid Data"
 
 def select_reference_data_for_turners(measurement_method: str, sex: str):
-    return turner_lms_array_for_measurement_and_sex(measurement_method=measurement_method, sex=sex, age=1.0)
\ No newline at end of file
+    return turner_lms_array_for_measurement_and_sex(measurement_method=measurement_method, sex=sex, age=TURNER_CHART_SEGMENTS[TURNERS])
+
+
+# the Turner chart is one segment, with an age at which all its tables are valid
+TURNER_CHART_SEGMENTS = {TURNERS: 1.0}
+
+register_growth_reference(
+    TURNERS,
+    lms_reference_table=turner_lms_array_for_measurement_and_sex,
+    chart_segments=TURNER_CHART_SEGMENTS)
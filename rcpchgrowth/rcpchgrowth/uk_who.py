@@ -1,6 +1,8 @@
-import json
+import numpy as np
 import pkg_resources
 from .constants import *
+from .reference_table import ReferenceTable, register_reference_data, reference_table
+from .growth_reference import BoundaryIndex, above, register_growth_reference
 # from .global_functions import z_score, cubic_interpolation, linear_interpolation, centile, measurement_for_z, nearest_lowest_index, fetch_lms
 # import timeit #see below, comment back in if timing functions in this module
 
@@ -21,28 +23,37 @@ reference: reference data
 #load the reference data
 
 UK90_PRETERM_DATA = pkg_resources.resource_filename(__name__, "/data_tables/uk90_preterm.json") ## 23 - 42 weeks gestation
-with open(UK90_PRETERM_DATA) as json_file:
-            UK90_PRETERM_DATA = json.load(json_file)
-            json_file.close()
 UK90_TERM_DATA = pkg_resources.resource_filename(__name__, "/data_tables/uk90_term.json") ## 37-42 weeks gestation
-with open(UK90_TERM_DATA) as json_file:
-            UK90_TERM_DATA = json.load(json_file)
-            json_file.close()
 WHO_INFANTS_DATA = pkg_resources.resource_filename(__name__, "/data_tables/who_infants.json") ## 2 weeks to 2 years
-with open(WHO_INFANTS_DATA) as json_file:
-            WHO_INFANTS_DATA = json.load(json_file)
-            json_file.close()
 WHO_CHILD_DATA = pkg_resources.resource_filename(__name__, "/data_tables/who_children.json") ## 2 years to 4 years
-with open(WHO_CHILD_DATA) as json_file:
-            WHO_CHILD_DATA = json.load(json_file)
-            json_file.close()
 UK90_CHILD_DATA = pkg_resources.resource_filename(__name__, "/data_tables/uk90_child.json") ## 4 years to 20 years
-with open(UK90_CHILD_DATA) as json_file:
-            UK90_CHILD_DATA = json.load(json_file)
-            json_file.close()
+
+# the data are loaded on first use (see reference_table.preload)
+register_reference_data(UK90_PRETERM, UK90_PRETERM_DATA)
+register_reference_data(UK90_TERM, UK90_TERM_DATA)
+register_reference_data(UK_WHO_INFANT, WHO_INFANTS_DATA)
+register_reference_data(UK_WHO_CHILD, WHO_CHILD_DATA)
+register_reference_data(UK90_CHILD, UK90_CHILD_DATA)
 
 #public functions
 
+# CONSTANTS RELEVANT ONLY TO UK-WHO REFERENCE-SELECTION LOGIC
+# 23 weeks is the lowest decimal age available on the UK90 charts
+UK90_REFERENCE_LOWER_THRESHOLD = ((23 * 7) - (40*7)) / 365.25  # 23 weeks as decimal age
+UK90_TERM_REFERENCE_LOWER_THRESHOLD = ((37 * 7) - (40*7)) / 365.25  # 37 weeks as decimal age
+UK90_TERM_REFERENCE_UPPER_THRESHOLD = ((42 * 7) - (40*7)) / 365.25  # 42 weeks as decimal age
+# The WHO references change from measuring infants in the lying position to measuring children in the standing position at 2.0 years.
+WHO_CHILD_LOWER_THRESHOLD = 2.0  # 2 years as decimal age
+# The UK-WHO standard is complicated because it switches from the WHO references to UK90 references
+#  at the age of 4.0 years. This is because it was felt the reference data from breast fed infants
+#  from the WHO cohorts were more accurate than the UK90 cohorts for this age group.
+WHO_CHILDREN_UPPER_THRESHOLD = 4.0
+UK90_UPPER_THRESHOLD = 20
+
+# the references that make up UK-WHO, in age order. uk_who_segment_codes returns indices into this tuple.
+UK_WHO_SEGMENTS = (UK90_PRETERM, UK90_TERM, UK_WHO_INFANT, UK_WHO_CHILD, UK90_CHILD)
+
+
 def reference_data_absent( 
         age: float,
         measurement_method: str,
@@ -83,69 +94,103 @@ def reference_data_absent(
     else:
         return False, ""
 
+
+def uk_who_reference_data_present(ages: np.ndarray, measurement_method: str, sex: str) -> np.ndarray:
+    """
+    Vectorised reference_data_absent for batches: returns a boolean array, True for each age
+    which has reference data for the measurement_method and sex. One searchsorted of the compiled boundaries.
+    """
+    boundary_index = REFERENCE_DATA_ABSENT_INDEX.get((measurement_method, sex))
+    if boundary_index is None:
+        boundary_index = _reference_data_absent_index(measurement_method=measurement_method, sex=sex)
+    return boundary_index.codes(ages, lambda absent: not absent[0])
+
+
 def uk_who_reference(
         age: float, 
         born_preterm: bool = False
-    ) -> json:
+    ) -> str:
     """
     The purpose of this function is to choose the correct reference for calculation.
     The UK-WHO standard is an unusual case because it combines two different reference sources.
     - UK90 reference runs from 23 weeks to 20 y
     - WHO 2006 runs from 2 weeks to 4 years
     - UK90 then resumes from 4 years to 20 years
-    The function return the appropriate reference file as json
+    The function returns the name of the appropriate reference (see parameter constants)
     """
 
-    # CONSTANTS RELEVANT ONLY TO UK-WHO REFERENCE-SELECTION LOGIC
-    # 23 weeks is the lowest decimal age available on the UK90 charts
-    UK90_REFERENCE_LOWER_THRESHOLD = ((23 * 7) - (40*7)) / 365.25  # 23 weeks as decimal age
-    UK90_TERM_REFERENCE_LOWER_THRESHOLD = ((37 * 7) - (40*7)) / 365.25  # 37 weeks as decimal age
-    UK90_TERM_REFERENCE_UPPER_THRESHOLD = ((42 * 7) - (40*7)) / 365.25  # 42 weeks as decimal age
-    # The WHO references change from measuring infants in the lying position to measuring children in the standing position at 2.0 years.
-    WHO_CHILD_LOWER_THRESHOLD = 2.0  # 2 years as decimal age
-    # The UK-WHO standard is complicated because it switches from the WHO references to UK90 references
-    #  at the age of 4.0 years. This is because it was felt the reference data from breast fed infants
-    #  from the WHO cohorts were more accurate than the UK90 cohorts for this age group.
-    WHO_CHILDREN_UPPER_THRESHOLD = 4.0
-    UK90_UPPER_THRESHOLD = 20
-
     #These conditionals are to select the correct reference
     if age < UK90_REFERENCE_LOWER_THRESHOLD:
         # Below the range for which we have reference data, we can't provide a calculation.
         return ValueError("There is no reference data below 23 weeks gestation")
     elif age < UK90_TERM_REFERENCE_LOWER_THRESHOLD:
         # Below 37 weeks, the UK90 preterm data is always used
-        return UK90_PRETERM_DATA
+        return UK90_PRETERM
 
     elif age < UK90_TERM_REFERENCE_UPPER_THRESHOLD:
         # Below 42 weeks
         if born_preterm:
             # Preterm children should continue to be plotted using the preterm references
-            return UK90_PRETERM_DATA
+            return UK90_PRETERM
         else:
-            return UK90_TERM_DATA
+            return UK90_TERM
     
     elif age < WHO_CHILD_LOWER_THRESHOLD:
         # Children beyond 2 weeks but below 2 years are measured lying down using WHO data
-        return WHO_INFANTS_DATA
+        return UK_WHO_INFANT
         
     elif age < WHO_CHILDREN_UPPER_THRESHOLD:
         # Children 2 years and beyond but below 4 years are measured standing up using WHO data
-        return WHO_CHILD_DATA
+        return UK_WHO_CHILD
     
     elif age <= UK90_UPPER_THRESHOLD:
         # All children 4 years and above are measured using UK90 child data
-        return UK90_CHILD_DATA
+        return UK90_CHILD
 
     else:
         return ValueError("There is no reference data above the age of 20 years.")
 
+
+def uk_who_segment_codes(ages: np.ndarray, born_preterm: bool = False) -> np.ndarray:
+    """
+    Vectorised uk_who_reference for batches: returns, for each age, the index in UK_WHO_SEGMENTS
+    of the reference for that age, or -1 where there is no reference data for that age.
+    One searchsorted of the compiled boundaries.
+    """
+    boundary_index = UK_WHO_REFERENCE_INDEX[True] if born_preterm else UK_WHO_REFERENCE_INDEX[False]
+    return boundary_index.codes(
+        ages, lambda reference: UK_WHO_SEGMENTS.index(reference) if reference in UK_WHO_SEGMENTS else -1)
+
+
+def _reference_data_absent_index(measurement_method: str, sex: str) -> BoundaryIndex:
+    return BoundaryIndex(
+        lambda age: reference_data_absent(age=age, measurement_method=measurement_method, sex=sex),
+        boundaries=[TWENTY_THREE_WEEKS_GESTATION, TWENTY_FIVE_WEEKS_GESTATION, FORTY_TWO_WEEKS_GESTATION,
+                    above(SEVENTEEN_YEARS), above(EIGHTEEN_YEARS), above(TWENTY_YEARS)])
+
+
+def _uk_who_reference_index(born_preterm: bool) -> BoundaryIndex:
+    return BoundaryIndex(
+        lambda age: uk_who_reference(age=age, born_preterm=born_preterm),
+        boundaries=[UK90_REFERENCE_LOWER_THRESHOLD, UK90_TERM_REFERENCE_LOWER_THRESHOLD,
+                    UK90_TERM_REFERENCE_UPPER_THRESHOLD, WHO_CHILD_LOWER_THRESHOLD, WHO_CHILDREN_UPPER_THRESHOLD,
+                    above(UK90_UPPER_THRESHOLD)])
+
+
+# reference_data_absent and uk_who_reference compiled to their boundary ages, for batches of ages.
+# Single ages are quicker through the comparisons themselves.
+REFERENCE_DATA_ABSENT_INDEX = {
+    (measurement_method, sex): _reference_data_absent_index(measurement_method=measurement_method, sex=sex)
+    for measurement_method in MEASUREMENT_METHODS for sex in SEXES}
+UK_WHO_REFERENCE_INDEX = {born_preterm: _uk_who_reference_index(born_preterm) for born_preterm in (False, True)}
+
+
 def uk_who_lms_array_for_measurement_and_sex(
         age: float,
         measurement_method: str,
         sex: str,
         born_preterm
-    )->list:
+    )->ReferenceTable:
 
     ## selects the correct lms data array from the patchwork of references that make up UK-WHO
 
@@ -164,7 +209,30 @@ def uk_who_lms_array_for_measurement_and_sex(
     if invalid_data:
         raise LookupError(data_error)
     else:
-        return selected_reference["measurement"][measurement_method][sex]
+        return reference_table(selected_reference, measurement_method, sex)
+
+
+def uk_who_lms_arrays_for_measurement_and_sex(
+        ages: np.ndarray,
+        measurement_method: str,
+        sex: str,
+        born_preterm: bool
+    ) -> (list, np.ndarray):
+    """
+    Vectorised uk_who_lms_array_for_measurement_and_sex for batches of ages.
+    Returns the ReferenceTables of UK_WHO_SEGMENTS for the measurement_method and sex and, for each age, the index
+    of its table in that list, or -1 where uk_who_lms_array_for_measurement_and_sex raises a LookupError.
+    """
+    codes = uk_who_segment_codes(ages, born_preterm=born_preterm)
+    codes[~uk_who_reference_data_present(ages, measurement_method=measurement_method, sex=sex)] = -1
+    tables = []
+    for code, segment in enumerate(UK_WHO_SEGMENTS):
+        try:
+            tables.append(reference_table(segment, measurement_method, sex))
+        except LookupError:
+            tables.append(None)
+            codes[codes == code] = -1
+    return tables, codes
 
 
 def select_reference_data_for_uk_who_chart(uk_who_reference: str, measurement_method: str, sex: str):
@@ -172,45 +240,32 @@ def select_reference_data_for_uk_who_chart(uk_who_reference: str, measurement_me
     # takes a uk_who_reference name (see parameter constants), measurement_method and sex to return
     # reference data
 
-    if uk_who_reference == UK90_PRETERM:
-        try:
-            uk90_preterm_reference = uk_who_lms_array_for_measurement_and_sex(
-                age=-0.01,
-                measurement_method=measurement_method, 
-                sex=sex, 
-                born_preterm=True)
-        except:
-            uk90_preterm_reference = []
-        return uk90_preterm_reference
-    elif uk_who_reference == UK_WHO_INFANT:
-        try:
-            uk_who_infants_reference = uk_who_lms_array_for_measurement_and_sex(
-                age=0.04, 
-                measurement_method=measurement_method, 
-                sex=sex, 
-                born_preterm=True)
-        except:
-            uk_who_infants_reference = []
-        return uk_who_infants_reference
-    elif uk_who_reference == UK_WHO_CHILD:
-        try:
-            uk_who_children_reference = uk_who_lms_array_for_measurement_and_sex(
-                age=2.0, 
-                measurement_method=measurement_method, 
-                sex=sex, 
-                born_preterm=True)
-        except:
-            uk_who_children_reference = []
-        return uk_who_children_reference
-    elif uk_who_reference == UK90_CHILD:
-        try:
-            uk90_children_reference = uk_who_lms_array_for_measurement_and_sex(
-                age=4.0, 
-                measurement_method=measurement_method, 
-                sex=sex, 
-                born_preterm=True)
-        except:
-            uk90_children_reference=[]
-        return uk90_children_reference
-    else:
+    try:
+        chart_age = UK_WHO_CHART_SEGMENTS[uk_who_reference]
+    except KeyError:
         raise LookupError(f"No data found for {measurement_method} in {sex}s in {uk_who_reference}")
+
+    try:
+        return uk_who_lms_array_for_measurement_and_sex(
+            age=chart_age,
+            measurement_method=measurement_method,
+            sex=sex,
+            born_preterm=True)
+    except:
+        return []
+
+
+# the references that make up UK-WHO, in age order, each with an age at which all its tables are valid
+UK_WHO_CHART_SEGMENTS = {
+    UK90_PRETERM: -0.01,
+    UK_WHO_INFANT: 0.04,
+    UK_WHO_CHILD: 2.0,
+    UK90_CHILD: 4.0
+}
+
+register_growth_reference(
+    UK_WHO,
+    lms_reference_table=uk_who_lms_array_for_measurement_and_sex,
+    chart_segments=UK_WHO_CHART_SEGMENTS,
+    selects_by_preterm=True,
+    lms_reference_tables=uk_who_lms_arrays_for_measurement_and_sex)
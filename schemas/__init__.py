@@ -1,7 +1,7 @@
-from .chart_data_schemas import ChartDataRequestParameters, ChartDataResponseSchema
+from .chart_data_schemas import ChartAgeWindowParameters, CentileLinesParameters, ChartDataRequestParameters, ChartDataResponseSchema, CentileCoordinatesRequestParameters, CentileCoordinatesResponseSchema
 from .plottable_child_data_schemas import PlottableChildDataRequestParameters, PlottableChildDataResponseSchema
 from .fictional_child_schemas import FictionalChildRequestParameters, FictionalChildResponseSchema
 from .measurement_schemas import MeasurementResponseSchema
 from .openapi_schemas import OpenApiSchema
 from .references_schemas import ReferencesResponseSchema
-from .calculation_schemas import CalculationRequestParameters, CalculationResponseSchema
+from .calculation_schemas import MeasurementFieldsParameters, CalculationRequestParameters, CalculationResponseSchema, CalculationsRequestParameters, CalculationsResponseSchema
@@ -1,5 +1,9 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
 from .measurement_schemas import MeasurementResponseSchema
+from .chart_data_schemas import DelimitedStrings
+from rcpchgrowth.rcpchgrowth.measurement_result import measurement_fields
+from rcpchgrowth.rcpchgrowth.date_calculations import corrected_decimal_age
+from rcpchgrowth.rcpchgrowth.uk_who import reference_data_absent
 from rcpchgrowth.rcpchgrowth.constants.validation_constants import *
 
 
@@ -34,6 +38,58 @@ class CalculationRequestParameters(Schema):
     gestation_days = fields.Number(
         description="The number of additional days _beyond the completed weeks of gestation_ at which the patient was born. This enables Gestational Age correction if the child was not born at term. See also the other parameter `gestation_weeks` - both are usually required.")
 
+    @validates_schema
+    def validate_age(self, data, **kwargs):
+        # the measurement must be after birth, at an age the UK-WHO reference has data for
+        if data["observation_date"] < data["birth_date"]:
+            raise ValidationError("observation_date must not be before birth_date.", "observation_date")
+        age = corrected_decimal_age(
+            birth_date=data["birth_date"],
+            observation_date=data["observation_date"],
+            gestation_weeks=data.get("gestation_weeks", 0),
+            gestation_days=data.get("gestation_days", 0))
+        absent, reason = reference_data_absent(age=age, measurement_method=data["measurement_method"], sex=data["sex"])
+        if absent:
+            raise ValidationError(reason, "observation_date")
+
+
+# the most measurements one request to the calculations endpoint may hold
+MAXIMUM_BATCH_CALCULATIONS = 1000
+
+
+class MeasurementFieldsParameters(Schema):
+    """
+    Optionally limits the measurement object returned to some of its fields (such as sds,centile) or groups of
+    fields (such as measurement_calculated_values). The others are then never calculated.
+    """
+    response_fields = DelimitedStrings(
+        data_key="fields",
+        missing=None,
+        allow_none=True,
+        description="The fields of the measurement object to return, such as `sds,centile`: all of them if not given.")
+
+    @validates_schema
+    def validate_response_fields(self, data, **kwargs):
+        if data["response_fields"] is not None:
+            try:
+                measurement_fields(data["response_fields"])
+            except ValueError as error:
+                raise ValidationError(str(error), "fields")
+
+
+class CalculationsRequestParameters(MeasurementFieldsParameters):
+    """
+    Defines the schema of a request for many calculations together. Each measurement is loaded as a
+    CalculationRequestParameters on its own, so one which is invalid does not prevent the others being calculated:
+    see the calculations endpoint.
+    """
+
+    measurements = fields.List(
+        fields.Dict(),
+        required=True,
+        validate=validate.Length(min=1, max=MAXIMUM_BATCH_CALCULATIONS),
+        description="The measurements to calculate, each with the parameters of a single calculation. Usually all the measurements of one child.")
+
 
 class CalculationResponseSchema(Schema):
     """
@@ -41,3 +97,13 @@ class CalculationResponseSchema(Schema):
     """
 
     calculation = fields.Nested(MeasurementResponseSchema())
+
+
+class CalculationsResponseSchema(Schema):
+    """
+    Defines the schema of the response to a request for many calculations. This is compiled into the openAPI spec.
+    """
+
+    calculations = fields.List(
+        fields.Dict(),
+        description="For each measurement, in the order requested: its calculation, or `errors` if it could not be calculated.")
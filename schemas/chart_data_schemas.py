@@ -1,7 +1,68 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from rcpchgrowth.rcpchgrowth.constants.parameter_constants import SEXES, COLE_TWO_THIRDS_SDS_NINE_CENTILES, THREE_PERCENT_CENTILES
+from rcpchgrowth.rcpchgrowth.global_functions import normalize_centile_collection
 
 
-class ChartDataRequestParameters(Schema):
+class DelimitedFloats(fields.List):
+    """
+    A list of numbers, given either as a JSON array or, in a query string, separated by commas: `-3,-2,2,3`
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(fields.Float(), **kwargs)
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, str):
+            value = [item for item in value.split(",") if item.strip()]
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
+class DelimitedStrings(fields.List):
+    """
+    A list of names, given either as a JSON array or separated by commas: `sds,centile`
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(fields.String(), **kwargs)
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(",") if item.strip()]
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
+class ChartAgeWindowParameters(Schema):
+    """
+    Optionally limits the centile lines to the ages (decimal years; negative before term) from age_min to
+    age_max, widened by age_padding years at each end
+    """
+    age_min = fields.Float(missing=None, allow_none=True)
+    age_max = fields.Float(missing=None, allow_none=True)
+    age_padding = fields.Float(missing=0, validate=validate.Range(min=0))
+
+    @validates_schema
+    def validate_age_window(self, data, **kwargs):
+        if data["age_min"] is not None and data["age_max"] is not None and data["age_min"] > data["age_max"]:
+            raise ValidationError("age_min must not be after age_max.", "age_max")
+
+
+class CentileLinesParameters(ChartAgeWindowParameters):
+    """
+    Optionally draws the lines at any centiles (such as 0.1,99.9) or SDS (such as -3,3), within 4 SDS of the median,
+    instead of a centile_selection
+    """
+    centiles = DelimitedFloats(missing=None, allow_none=True)
+    sds = DelimitedFloats(missing=None, allow_none=True)
+
+    @validates_schema
+    def validate_centile_collection(self, data, **kwargs):
+        try:
+            normalize_centile_collection(centiles=data["centiles"], sds=data["sds"])
+        except ValueError as error:
+            raise ValidationError(str(error), "centiles" if data["centiles"] is not None else "sds")
+
+
+class ChartDataRequestParameters(CentileLinesParameters):
     results = fields.String()
 
 
@@ -9,3 +70,16 @@ class ChartDataResponseSchema(Schema):
     sex = fields.String()
     child_data = fields.String()
     centile_data = fields.String()
+
+
+class CentileCoordinatesRequestParameters(CentileLinesParameters):
+    sex = fields.String(required=True, validate=validate.OneOf(SEXES))
+    born_preterm = fields.Boolean(missing=False)
+    centile_selection = fields.String(
+        missing=COLE_TWO_THIRDS_SDS_NINE_CENTILES,
+        validate=validate.OneOf([COLE_TWO_THIRDS_SDS_NINE_CENTILES, THREE_PERCENT_CENTILES]))
+
+
+class CentileCoordinatesResponseSchema(Schema):
+    sex = fields.String()
+    centile_data = fields.String()
@@ -0,0 +1,26 @@
+"""
+Fixtures for the server's tests: a Flask app with the API's blueprints mounted as app.py mounts them, and the chart
+data generated once for the session into a temporary folder, so the tests neither read nor write the repository's
+chart_data folder.
+
+usage (from the repository root): `python -m pytest tests`
+"""
+import pytest
+from flask import Flask
+
+import blueprints
+import controllers
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    app = Flask(__name__)
+    app.register_blueprint(blueprints.uk_who_blueprint.uk_who, url_prefix="/uk-who")
+    chart_data_folder = str(tmp_path_factory.mktemp("chart_data"))
+    controllers.regenerate_chart_data(controllers.load_chart_data(chart_data_folder), chart_data_folder).join()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
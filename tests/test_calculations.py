@@ -0,0 +1,147 @@
+import json
+
+from rcpchgrowth.rcpchgrowth.measurement_result import MeasurementResult
+
+CALCULATION = {
+    "birth_date": "2020-04-12", "observation_date": "2020-06-12", "observation_value": 60, "measurement_method": "height",
+    "sex": "male", "gestation_weeks": 40, "gestation_days": 4}
+
+
+def strict_json(response):
+    # the whole body must be one JSON document: a stream cut short is not
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(response.get_data(), parse_constant=reject)
+
+
+def measurement(**changes) -> dict:
+    return {**CALCULATION, **changes}
+
+
+def test_batch_calculations_match_single_calculations(client):
+    measurements = [measurement(), measurement(observation_value=5.2, measurement_method="weight"),
+                    measurement(gestation_weeks=30, gestation_days=2, observation_date="2021-01-12")]
+    response = client.post("/uk-who/calculations", json={"measurements": measurements})
+    assert response.status_code == 200
+    calculations = strict_json(response)["calculations"]
+    assert calculations == [client.post("/uk-who/calculation", json=single).get_json() for single in measurements]
+
+
+def test_malformed_measurements_return_their_errors_in_their_place(client):
+    without_gestation = {key: value for key, value in CALCULATION.items() if key not in ("gestation_weeks", "gestation_days")}
+    measurements = [
+        measurement(),
+        without_gestation,
+        measurement(gestation_days="4"),
+        measurement(sex="other"),
+        measurement(birth_date="12/04/2020"),
+        measurement(observation_value=600),
+        measurement(measurement_method="weight", observation_value=5.2),
+    ]
+    response = client.post("/uk-who/calculations", json={"measurements": measurements})
+    assert response.status_code == 200
+    calculations = strict_json(response)["calculations"]
+    assert len(calculations) == len(measurements)
+
+    # a measurement without a gestation is taken as born at term, and a gestation sent as a string is read as a number
+    assert calculations[1]["birth_data"]["gestation_weeks"] == 40
+    assert calculations[1]["measurement_calculated_values"] == calculations[0]["measurement_calculated_values"]
+    assert calculations[2] == calculations[0]
+    assert calculations[3]["errors"] == {"sex": ["Must be one of: male, female."]}
+    assert "birth_date" in calculations[4]["errors"]
+    assert "_schema" in calculations[5]["errors"]
+    assert calculations[6]["measurement_calculated_values"]["measurement_method"] == "weight"
+
+
+def test_measurement_object_which_cannot_be_built_fails_before_the_response_starts(client, monkeypatch):
+    measurement_dates = MeasurementResult.measurement_dates
+
+    def failing_measurement_dates(result, fields=None):
+        if result.observation_value == 61:
+            raise TypeError("no calendar age")
+        return measurement_dates(result, fields)
+
+    monkeypatch.setattr(MeasurementResult, "measurement_dates", failing_measurement_dates)
+    # a fault is not returned as though it were the client's error, nor after a 200 has been sent
+    response = client.post("/uk-who/calculations", json={"measurements": [
+        measurement(), measurement(observation_value=61), measurement()]})
+    assert response.status_code == 500
+    assert client.post("/uk-who/calculation", json=measurement(observation_value=61)).status_code == 500
+
+
+def test_measurements_outside_the_reference_are_refused_by_both_endpoints(client):
+    cases = [
+        (measurement(birth_date="2020-07-12"), "observation_date must not be before birth_date."),
+        (measurement(birth_date="1990-01-01", observation_value=170), "UK-WHO data does not exist above 20 years."),
+        (measurement(birth_date="2002-01-01", measurement_method="ofc", observation_value=55),
+         "UK-WHO head circumference data does not exist in boys over 18 y of age."),
+        (measurement(measurement_method="bmi", observation_value=14, observation_date="2020-04-13"),
+         "UK-WHO BMI data does not exist below 2 weeks of age."),
+    ]
+    for case, message in cases:
+        single = client.post("/uk-who/calculation", json=case)
+        assert single.status_code == 422
+        assert json.loads(single.get_data()) == {"observation_date": [message]}
+        batch = client.post("/uk-who/calculations", json={"measurements": [case]})
+        assert strict_json(batch)["calculations"] == [{"errors": {"observation_date": [message]}}]
+
+
+def test_observation_value_out_of_range_is_refused_by_both_endpoints(client):
+    single = client.post("/uk-who/calculation", json=measurement(observation_value=600))
+    assert single.status_code == 422
+    batch = client.post("/uk-who/calculations", json={"measurements": [measurement(observation_value=600)]})
+    assert strict_json(batch)["calculations"] == [{"errors": json.loads(single.get_data())}]
+    assert "very high" in json.loads(single.get_data())["_schema"][0]
+
+
+def test_batch_without_measurements_is_unprocessable(client):
+    assert client.post("/uk-who/calculations", json={"measurements": []}).status_code == 422
+    assert client.post("/uk-who/calculations", json={}).status_code == 422
+    assert client.post("/uk-who/calculations", json={"measurements": ["height"]}).status_code == 422
+
+
+def test_single_calculation_is_made_from_the_loaded_values(client):
+    expected = client.post("/uk-who/calculation", json=CALCULATION).get_json()
+    assert client.post("/uk-who/calculation", json=measurement(gestation_days="4")).get_json() == expected
+    term = client.post("/uk-who/calculation", json={
+        key: value for key, value in CALCULATION.items() if key not in ("gestation_weeks", "gestation_days")})
+    assert term.status_code == 200
+    assert term.get_json()["birth_data"]["gestation_weeks"] == 40
+
+
+def test_invalid_single_calculation_is_unprocessable(client):
+    for invalid in (measurement(sex="other"), measurement(gestation_days="four"), measurement(birth_date="12/04/2020"),
+                    {key: value for key, value in CALCULATION.items() if key != "sex"}):
+        assert client.post("/uk-who/calculation", json=invalid).status_code == 422
+
+
+def test_fields_limit_the_measurement_object(client):
+    everything = client.post("/uk-who/calculation", json=CALCULATION).get_json()
+    for fields in (["sds", "centile"], "sds,centile"):
+        expected = {"measurement_calculated_values": {
+            "sds": everything["measurement_calculated_values"]["sds"],
+            "centile": everything["measurement_calculated_values"]["centile"]}}
+        assert client.post("/uk-who/calculation", json={**CALCULATION, "fields": fields}).get_json() == expected
+        response = client.post("/uk-who/calculations", json={"measurements": [CALCULATION, CALCULATION], "fields": fields})
+        assert strict_json(response)["calculations"] == [expected, expected]
+    grouped = client.post("/uk-who/calculation", json={**CALCULATION, "fields": ["birth_data"]}).get_json()
+    assert grouped == {"birth_data": everything["birth_data"]}
+
+
+def test_empty_or_unknown_fields_are_unprocessable(client):
+    for fields in ([], "", ["sds", "height_velocity"]):
+        assert client.post("/uk-who/calculation", json={**CALCULATION, "fields": fields}).status_code == 422
+        assert client.post("/uk-who/calculations", json={"measurements": [CALCULATION], "fields": fields}).status_code == 422
+
+
+def test_gestation_is_calculated_as_it_was_sent(client):
+    term = client.post("/uk-who/calculation", json=CALCULATION).get_json()
+    assert (term["birth_data"]["gestation_weeks"], term["birth_data"]["gestation_days"]) == (40, 4)
+    assert term["measurement_dates"]["lay_decimal_age_comment"].startswith("At 40+4,")
+    # a part week is neither truncated nor refused
+    preterm = client.post("/uk-who/calculation", json=measurement(gestation_weeks=30.5, gestation_days=0)).get_json()
+    assert preterm["birth_data"]["gestation_weeks"] == 30.5
+    for gestation_weeks in (10, 50):
+        assert client.post("/uk-who/calculation", json=measurement(gestation_weeks=gestation_weeks)).status_code == 422
+        response = client.post("/uk-who/calculations", json={"measurements": [measurement(gestation_weeks=gestation_weeks)]})
+        assert "gestation_weeks" in strict_json(response)["calculations"][0]["errors"]
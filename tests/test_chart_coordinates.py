@@ -0,0 +1,129 @@
+import gzip
+import json
+
+import pytest
+
+CENTILE_LINES = "/uk-who/chart-coordinates?sex=male"
+
+
+def test_centile_lines_carry_an_etag_and_cache_control(client):
+    response = client.get(CENTILE_LINES)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=86400"
+    assert response.get_etag()[0]
+    assert {"Accept", "Accept-Encoding"} <= set(response.vary)
+    centile_data = json.loads(response.get_data())["centile_data"]
+    assert [list(segment) for segment in centile_data] == [["uk_who_infant"], ["uk_who_child"], ["uk90_child"]]
+
+
+def test_matching_etag_is_not_modified(client):
+    etag = client.get(CENTILE_LINES).get_etag()[0]
+    response = client.get(CENTILE_LINES, headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert client.get(CENTILE_LINES, headers={"If-None-Match": '"another"'}).status_code == 200
+
+
+@pytest.mark.parametrize("encoding, decompress", [
+    ("gzip", gzip.decompress),
+    ("br", lambda body: pytest.importorskip("brotli").decompress(body))
+])
+def test_centile_lines_are_sent_in_the_content_coding_accepted(client, encoding, decompress):
+    identity = client.get(CENTILE_LINES)
+    response = client.get(CENTILE_LINES, headers={"Accept-Encoding": encoding})
+    assert response.headers["Content-Encoding"] == encoding
+    assert decompress(response.get_data()) == identity.get_data()
+    # each content coding is its own representation, with its own ETag
+    assert response.get_etag()[0] != identity.get_etag()[0]
+    etag = response.get_etag()[0]
+    assert client.get(CENTILE_LINES, headers={"Accept-Encoding": encoding, "If-None-Match": f'"{etag}"'}).status_code == 304
+
+
+def test_invalid_parameters_are_unprocessable(client):
+    assert client.get("/uk-who/chart-coordinates?sex=other").status_code == 422
+    assert client.get("/uk-who/chart-coordinates").status_code == 422
+
+
+def lines_of(centile_data: list) -> list:
+    return [lines for segment in centile_data for sexes in segment.values() for methods in sexes.values() for lines in methods.values()]
+
+
+def test_age_window_slices_each_line_to_the_window(client):
+    response = client.get(CENTILE_LINES + "&age_min=1.5&age_max=3")
+    assert response.status_code == 200
+    centile_data = json.loads(response.get_data())["centile_data"]
+    # the infant and child segments meet at 2 years: the child segment from 4 years is outside the window
+    assert [list(segment) for segment in centile_data] == [["uk_who_infant"], ["uk_who_child"]]
+    for lines in lines_of(centile_data):
+        for line in lines:
+            ages = [point["x"] for point in line["data"]]
+            # every point is in the window, but for the one either side of it which carries the line to its edge
+            assert all(1.5 <= age <= 3 for age in ages[1:-1])
+    whole = json.loads(client.get(CENTILE_LINES).get_data())["centile_data"]
+    assert sum(len(line["data"]) for lines in lines_of(centile_data) for line in lines) < \
+        sum(len(line["data"]) for lines in lines_of(whole) for line in lines)
+
+
+def test_age_window_is_widened_by_its_padding(client):
+    narrow = json.loads(client.get(CENTILE_LINES + "&age_min=5&age_max=6").get_data())["centile_data"]
+    padded = json.loads(client.get(CENTILE_LINES + "&age_min=5&age_max=6&age_padding=1").get_data())["centile_data"]
+    narrow_ages = [point["x"] for point in lines_of(narrow)[0][0]["data"]]
+    padded_ages = [point["x"] for point in lines_of(padded)[0][0]["data"]]
+    assert padded_ages[0] < narrow_ages[0] and padded_ages[-1] > narrow_ages[-1]
+    assert padded_ages[0] <= 4 and padded_ages[-1] >= 7
+
+
+def test_age_window_must_not_end_before_it_starts(client):
+    assert client.get(CENTILE_LINES + "&age_min=3&age_max=1").status_code == 422
+    assert client.get(CENTILE_LINES + "&age_padding=-1").status_code == 422
+
+
+def test_age_window_applies_to_the_lines_drawn_with_a_child(client):
+    calculation = client.post("/uk-who/calculation", json={
+        "birth_date": "2020-04-12", "observation_date": "2021-06-12", "observation_value": 75, "measurement_method": "height",
+        "sex": "male", "gestation_weeks": 40, "gestation_days": 0}).get_json()
+    response = client.post("/uk-who/chart-coordinates", json={"results": [calculation], "age_min": 1, "age_max": 1.5})
+    assert response.status_code == 200
+    centile_data = json.loads(response.get_data())["centile_data"]
+    assert [list(segment) for segment in centile_data] == [["uk_who_infant"]]
+    assert client.post("/uk-who/chart-coordinates", json={"results": [calculation], "age_min": 2, "age_max": 1}).status_code == 422
+
+
+def strict_json(response) -> dict:
+    # NaN and Infinity are not JSON, though the json module would read them
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(response.get_data(), parse_constant=reject)
+
+
+def test_custom_centiles_and_sds_draw_those_lines(client):
+    by_centile = strict_json(client.get(CENTILE_LINES + "&centiles=99.9,0.1"))["centile_data"]
+    assert all([line["centile"] for line in lines] == [0.1, 99.9] for lines in lines_of(by_centile))
+    by_sds = strict_json(client.get(CENTILE_LINES + "&sds=-4,4"))["centile_data"]
+    assert all([line["sds"] for line in lines] == [-4.0, 4.0] for lines in lines_of(by_sds))
+
+
+def test_custom_lines_far_from_the_median_are_unprocessable(client):
+    for parameters in ("&sds=-5,5", "&centiles=0.0001", "&centiles=99.9999", "&centiles=0.1&sds=3"):
+        response = client.get(CENTILE_LINES + parameters)
+        assert response.status_code == 422
+        strict_json(response)
+
+
+@pytest.mark.parametrize("mimetype", [
+    "application/json", "application/vnd.rcpch.chart.columnar+json", "application/vnd.rcpch.chart.columnar-delta+json"])
+def test_extreme_custom_lines_are_valid_json_in_every_format(client, mimetype):
+    response = client.get(CENTILE_LINES + "&sds=-4,4&born_preterm=true", headers={"Accept": mimetype})
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    strict_json(response)
+
+
+def test_custom_lines_are_drawn_with_a_child(client):
+    calculation = client.post("/uk-who/calculation", json={
+        "birth_date": "2020-04-12", "observation_date": "2021-06-12", "observation_value": 75, "measurement_method": "height",
+        "sex": "male", "gestation_weeks": 40, "gestation_days": 0}).get_json()
+    response = client.post("/uk-who/chart-coordinates", json={"results": [calculation], "sds": [-3, 3]})
+    assert response.status_code == 200
+    assert all([line["sds"] for line in lines] == [-3.0, 3.0] for lines in lines_of(strict_json(response)["centile_data"]))
+    assert client.post("/uk-who/chart-coordinates", json={"results": [calculation], "sds": [-5, 5]}).status_code == 422
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from controllers import chart_data
+from rcpchgrowth.rcpchgrowth.constants.parameter_constants import *
+
+FAILING = (TURNERS, THREE_PERCENT_CENTILES)
+REGENERATED = (TRISOMY_21, THREE_PERCENT_CENTILES)
+
+
+@pytest.fixture
+def unloaded_charts(app):
+    # takes two charts out of memory, as if they were missing at boot, and puts them back afterwards
+    saved = {key: chart_data.CHART_DATA.pop(key) for key in (FAILING, REGENERATED)}
+    for key in saved:
+        chart_data._chart_data_ready[key].clear()
+    yield saved
+    for key, saved_chart_data in saved.items():
+        chart_data._store(saved_chart_data)
+
+
+def test_a_chart_which_cannot_be_generated_fails_fast_without_stopping_the_others(unloaded_charts, monkeypatch, tmp_path):
+    generate_chart_data = chart_data.generate_chart_data
+
+    def generate_or_fail(reference, centile_selection, executor=None):
+        if (reference, centile_selection) == FAILING:
+            raise RuntimeError("the chart could not be drawn")
+        return generate_chart_data(reference, centile_selection, executor)
+
+    monkeypatch.setattr(chart_data, "generate_chart_data", generate_or_fail)
+    chart_data.regenerate_chart_data([FAILING, REGENERATED], str(tmp_path)).join()
+
+    with pytest.raises(LookupError, match="could not be generated"):
+        chart_data.chart_data(*FAILING, wait_seconds=0)
+    assert chart_data.chart_data(*REGENERATED, wait_seconds=0).sha256 == unloaded_charts[REGENERATED].sha256
+
+
+def test_charts_written_at_once_are_all_kept_in_the_manifest(app, tmp_path):
+    charts = [chart_data.chart_data(reference, centile_selection) for reference in (UK_WHO, TURNERS, TRISOMY_21)
+              for centile_selection in (COLE_TWO_THIRDS_SDS_NINE_CENTILES, THREE_PERCENT_CENTILES)]
+    writers = [threading.Thread(target=chart_data.write_chart_data, args=([chart],), kwargs={"folder": str(tmp_path)})
+               for chart in charts]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert chart_data.load_chart_data(str(tmp_path)) == []
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from rcpchgrowth.rcpchgrowth import legacy_chart
+
+CENTILE_LINES = "/uk-who/chart-coordinates?sex=female&born_preterm=true"
+COLUMNAR_FORMATS = ["application/vnd.rcpch.chart.columnar+json", "application/vnd.rcpch.chart.columnar-delta+json"]
+
+
+def child_calculation(client) -> dict:
+    return client.post("/uk-who/calculation", json={
+        "birth_date": "2020-04-12", "observation_date": "2021-06-12", "observation_value": 9, "measurement_method": "weight",
+        "sex": "female", "gestation_weeks": 32, "gestation_days": 0}).get_json()
+
+
+def test_centile_lines_are_legacy_json_unless_a_columnar_format_is_accepted(client):
+    for accept in (None, "*/*", "application/json", "text/html"):
+        response = client.get(CENTILE_LINES, headers={} if accept is None else {"Accept": accept})
+        assert response.status_code == 200
+        assert response.mimetype == "application/json"
+        assert "Accept" in response.vary
+
+
+@pytest.mark.parametrize("mimetype", COLUMNAR_FORMATS)
+def test_columnar_centile_lines_decode_to_the_legacy_lines(client, mimetype):
+    legacy = json.loads(client.get(CENTILE_LINES).get_data())
+    response = client.get(CENTILE_LINES, headers={"Accept": mimetype})
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert "Accept" in response.vary
+    columnar = json.loads(response.get_data())
+    assert len(response.get_data()) < len(client.get(CENTILE_LINES).get_data())
+    assert legacy_chart(columnar["centile_data"]) == legacy["centile_data"]
+
+
+@pytest.mark.parametrize("mimetype", COLUMNAR_FORMATS)
+def test_each_format_has_its_own_etag(client, mimetype):
+    legacy = client.get(CENTILE_LINES)
+    columnar = client.get(CENTILE_LINES, headers={"Accept": mimetype})
+    assert columnar.headers["ETag"] != legacy.headers["ETag"]
+    assert client.get(CENTILE_LINES, headers={"Accept": mimetype, "If-None-Match": legacy.headers["ETag"]}).status_code == 200
+
+
+@pytest.mark.parametrize("mimetype", COLUMNAR_FORMATS)
+def test_columnar_lines_drawn_with_a_child_decode_to_the_legacy_lines(client, mimetype):
+    body = {"results": [child_calculation(client)]}
+    legacy = json.loads(client.post("/uk-who/chart-coordinates", json=body).get_data())
+    response = client.post("/uk-who/chart-coordinates", json=body, headers={"Accept": mimetype})
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert "Accept" in response.vary
+    columnar = json.loads(response.get_data())
+    assert columnar["child_data"] == legacy["child_data"]
+    assert legacy_chart(columnar["centile_data"]) == legacy["centile_data"]
@@ -0,0 +1,27 @@
+import json
+from datetime import date
+
+import pytest
+
+from controllers.json_stream import StreamedArray, StreamedObject, iter_json
+
+
+def test_streamed_json_is_the_json_of_the_value():
+    value = {"dates": StreamedArray(iter([date(2020, 4, 12)])),
+             "values": StreamedObject(iter([("sds", 1.5), ("centile", StreamedArray(range(3)))]))}
+    chunks = list(iter_json(value, chunk_bytes=8))
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks)) == {"dates": ["Sun, 12 Apr 2020 00:00:00 GMT"], "values": {"sds": 1.5, "centile": [0, 1, 2]}}
+
+
+def test_error_while_streaming_is_logged_and_raised(capsys):
+    def failing_items():
+        yield 1
+        raise ValueError("no more items")
+
+    chunks = iter_json({"items": StreamedArray(failing_items())}, chunk_bytes=1)
+    with pytest.raises(ValueError):
+        list(chunks)
+    output = capsys.readouterr()
+    assert "no more items" in output.out
+    assert "Traceback" in output.err